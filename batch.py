@@ -0,0 +1,265 @@
+# batch.py
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from html_to_json import parse_html_to_json
+from excel_to_json import excel_to_json
+from compare_json import compare_data
+from utils import adjust_column_widths
+from vm_record import VmRecord
+
+# Имя файла сайзинга по умолчанию при обходе каталога
+DEFAULT_SIZING_FILE = 'data.xlsx'
+
+# Имя сводного отчета пакетной сверки
+SUMMARY_FILE = 'batch_summary.xlsx'
+
+# Данные сайзинга, уже загруженные текущим процессом-обработчиком: путь -> записи
+_sizing_cache: Dict[str, List[VmRecord]] = {}
+
+
+def load_manifest(manifest_file: str) -> List[Dict[str, str]]:
+    """
+    Загружает манифест пакетной сверки.
+
+    Манифест - JSON-список объектов с ключами 'passport' (HTML-файл паспорта),
+    'sizing' (Excel-файл сайзинга) и необязательным 'output' (файл отчета).
+    Относительные пути считаются от каталога манифеста.
+
+    :param manifest_file: Путь к JSON-файлу манифеста.
+    :return: Список пар паспорт/сайзинг.
+    :raises ValueError: Если в записи манифеста нет обязательных ключей.
+    """
+    with open(manifest_file, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    pairs: List[Dict[str, str]] = []
+    for idx, entry in enumerate(entries):
+        missing = [key for key in ('passport', 'sizing') if not entry.get(key)]
+        if missing:
+            raise ValueError(f"В записи манифеста №{idx + 1} отсутствуют ключи: {missing}")
+        pair = {key: os.path.join(base_dir, entry[key]) for key in ('passport', 'sizing')}
+        if entry.get('output'):
+            pair['output'] = os.path.join(base_dir, entry['output'])
+        pairs.append(pair)
+    return pairs
+
+
+def discover_pairs(directory: str, sizing_file: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Находит пары паспорт/сайзинг в каталоге.
+
+    Для каждого HTML-файла используется Excel-файл с тем же именем, а если его нет -
+    общий файл сайзинга (sizing_file или data.xlsx в каталоге).
+
+    :param directory: Каталог с HTML-файлами паспортов.
+    :param sizing_file: Общий Excel-файл сайзинга.
+    :return: Список пар паспорт/сайзинг.
+    :raises FileNotFoundError: Если для паспорта не найден файл сайзинга.
+    """
+    shared_sizing = sizing_file or os.path.join(directory, DEFAULT_SIZING_FILE)
+    pairs: List[Dict[str, str]] = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in ('.html', '.htm'):
+            continue
+        own_sizing = os.path.join(directory, f'{stem}.xlsx')
+        sizing = own_sizing if os.path.exists(own_sizing) else shared_sizing
+        if not os.path.exists(sizing):
+            raise FileNotFoundError(f"Не найден файл сайзинга для паспорта {name}: {sizing}")
+        pairs.append({'passport': os.path.join(directory, name), 'sizing': sizing})
+    return pairs
+
+
+def assign_report_paths(pairs: List[Dict[str, str]], output_dir: str) -> List[Dict[str, str]]:
+    """
+    Назначает уникальные пути отчетов парам, у которых они не заданы.
+
+    :param pairs: Пары паспорт/сайзинг.
+    :param output_dir: Каталог для отчетов.
+    :return: Пары с заполненным ключом 'output'.
+    """
+    used: Dict[str, int] = {}
+    result: List[Dict[str, str]] = []
+    for pair in pairs:
+        if pair.get('output'):
+            result.append(pair)
+            continue
+        stem = os.path.splitext(os.path.basename(pair['passport']))[0]
+        used[stem] = used.get(stem, 0) + 1
+        suffix = f'_{used[stem]}' if used[stem] > 1 else ''
+        result.append({**pair, 'output': os.path.join(output_dir, f'{stem}{suffix}_comparison.xlsx')})
+    return result
+
+
+def load_sizing_once(sizing_file: str, excel_engine: str = 'pandas',
+                     cache_dir: Optional[str] = None) -> List[VmRecord]:
+    """
+    Возвращает данные сайзинга, загружая каждый файл не более одного раза на процесс.
+
+    :param sizing_file: Путь к Excel-файлу сайзинга.
+    :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :return: Записи сайзинга.
+    """
+    key = os.path.abspath(sizing_file)
+    if key not in _sizing_cache:
+        _sizing_cache[key] = excel_to_json(sizing_file, engine=excel_engine, cache_dir=cache_dir)
+    return _sizing_cache[key]
+
+
+def init_worker(log_level: int) -> None:
+    """
+    Настраивает логирование в процессе-обработчике.
+
+    :param log_level: Уровень логирования.
+    """
+    logging.getLogger().setLevel(log_level)
+
+
+def reconcile_pair(pair: Dict[str, str], html_engine: str = 'bs4', excel_engine: str = 'pandas',
+                   cache_dir: Optional[str] = None, compare_engine: str = 'python') -> Dict[str, Any]:
+    """
+    Сверяет один паспорт с сайзингом и записывает отчет. Выполняется в процессе-обработчике.
+
+    :param pair: Пара с ключами 'passport', 'sizing' и 'output'.
+    :param html_engine: Движок парсинга HTML: 'bs4' или 'lxml'.
+    :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :param compare_engine: Движок сравнения: 'python' или 'pandas'.
+    :return: Строка сводки: пути, статус, итоги сравнения и время обработки.
+    """
+    start = time.perf_counter()
+    summary: Dict[str, Any] = {
+        'Паспорт': pair['passport'],
+        'Сайзинг': pair['sizing'],
+        'Отчет': pair['output'],
+        'Статус': 'OK',
+        'Ошибка': ''
+    }
+    try:
+        passport_data = parse_html_to_json(pair['passport'], engine=html_engine)
+        sizing_data = load_sizing_once(pair['sizing'], excel_engine, cache_dir)
+        summary.update(compare_data(passport_data, sizing_data, pair['output'], engine=compare_engine))
+    except Exception as e:
+        summary['Статус'] = 'Ошибка'
+        summary['Ошибка'] = str(e)
+    summary['Время, с'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_batch(pairs: List[Dict[str, str]], output_dir: str, workers: Optional[int] = None,
+              html_engine: str = 'bs4', excel_engine: str = 'pandas', cache_dir: Optional[str] = None,
+              compare_engine: str = 'python', log_level: int = logging.WARNING) -> List[Dict[str, Any]]:
+    """
+    Сверяет пары паспорт/сайзинг в пуле процессов и записывает сводный отчет.
+
+    :param pairs: Пары паспорт/сайзинг.
+    :param output_dir: Каталог для отчетов и сводки.
+    :param workers: Количество процессов; по умолчанию - число ядер.
+    :param html_engine: Движок парсинга HTML: 'bs4' или 'lxml'.
+    :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :param compare_engine: Движок сравнения: 'python' или 'pandas'.
+    :param log_level: Уровень логирования в процессах-обработчиках.
+    :return: Строки сводки в порядке входных пар.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pairs = assign_report_paths(pairs, output_dir)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(pairs)
+
+    logging.info(f"Пакетная сверка: {len(pairs)} пар, процессов: {workers or os.cpu_count()}")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(log_level,)) as executor:
+        futures = {
+            executor.submit(reconcile_pair, pair, html_engine, excel_engine, cache_dir, compare_engine): idx
+            for idx, pair in enumerate(pairs)
+        }
+        for future in as_completed(futures):
+            summary = future.result()
+            results[futures[future]] = summary
+            logging.info(f"{summary['Статус']}: {summary['Паспорт']} -> {summary['Отчет']} ({summary['Время, с']} с)")
+
+    summaries = [summary for summary in results if summary is not None]
+    save_summary(summaries, os.path.join(output_dir, SUMMARY_FILE))
+    return summaries
+
+
+def save_summary(summaries: List[Dict[str, Any]], summary_file: str) -> None:
+    """
+    Записывает сводный отчет пакетной сверки в Excel-файл.
+
+    :param summaries: Строки сводки.
+    :param summary_file: Путь к выходному Excel-файлу.
+    """
+    headers = [
+        'Паспорт', 'Сайзинг', 'Отчет', 'Статус',
+        'Совпадающие', 'С расхождениями', 'Отсутствуют в паспорте', 'Отсутствуют в сайзинге',
+        'Время, с', 'Ошибка'
+    ]
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Сводка'
+    ws.append(headers)
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    for summary in summaries:
+        ws.append([summary.get(header, '') for header in headers])
+
+    adjust_column_widths(ws)
+    wb.save(summary_file)
+    logging.info(f"Сводный отчет сохранен в файле {summary_file}")
+
+
+def main() -> None:
+    """
+    Точка входа пакетной сверки паспортов.
+    """
+    parser = argparse.ArgumentParser(description="Пакетная сверка паспортов с сайзингом")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--manifest', help="JSON-манифест со списком пар passport/sizing[/output]")
+    source.add_argument('--dir', help="Каталог с HTML-файлами паспортов")
+    parser.add_argument('--sizing', help="Общий Excel-файл сайзинга для режима --dir")
+    parser.add_argument('--output-dir', default='reports', help="Каталог для отчетов (по умолчанию reports)")
+    parser.add_argument('--workers', type=int, default=None, help="Количество процессов (по умолчанию - число ядер)")
+    parser.add_argument('--engine', choices=['bs4', 'lxml'], default='bs4', help="Движок парсинга HTML")
+    parser.add_argument('--excel-engine', choices=['pandas', 'openpyxl'], default='pandas', help="Движок чтения Excel")
+    parser.add_argument('--cache-dir', default=None, help="Каталог кэша разобранных файлов сайзинга")
+    parser.add_argument('--compare-engine', choices=['python', 'pandas'], default='python', help="Движок сравнения")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+    try:
+        pairs = load_manifest(args.manifest) if args.manifest else discover_pairs(args.dir, args.sizing)
+        summaries = run_batch(pairs, args.output_dir, workers=args.workers,
+                              html_engine=args.engine, excel_engine=args.excel_engine,
+                              cache_dir=args.cache_dir, compare_engine=args.compare_engine)
+        failed = [summary for summary in summaries if summary['Статус'] != 'OK']
+        logging.info(f"Обработано пар: {len(summaries)}, с ошибками: {len(failed)}")
+        if failed:
+            sys.exit(1)
+    except Exception as e:
+        logging.error(f"Произошла ошибка при пакетной сверке: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
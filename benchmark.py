@@ -0,0 +1,354 @@
+# benchmark.py
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from instrumentation import instrument_run
+
+# Количество ВМ в синтетических наборах по умолчанию (1M - через --scales 1000000)
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+
+# Файл с сохраненными базовыми замерами
+DEFAULT_BASELINE_FILE = 'benchmark_baseline.json'
+
+# Каталог сгенерированных паспортов и файлов сайзинга (повторно используются между запусками)
+DEFAULT_DATA_DIR = '.benchmark_data'
+
+# Допустимое замедление этапа относительно базового замера (0.25 - на 25%)
+DEFAULT_MAX_REGRESSION = 0.25
+
+# Этапы короче этого времени не проверяются: их разброс сопоставим с самим замером, с
+MIN_CHECKED_SECONDS = 0.05
+
+# Количество ВМ в одном разделе innerCell
+DEFAULT_VMS_PER_SECTION = 500
+
+# Доля строк с объединенными ячейками (rowspan IP-адреса, colspan сайзинга и примечания)
+DEFAULT_SPAN_DENSITY = 0.1
+
+# Варианты заголовков колонок имени, IP-адреса и сайзинга, встречающиеся в паспортах
+PASSPORT_HEADER_VARIANTS = [
+    ('Доменное имя', 'IP-адрес', 'Сайзинг'),
+    ('Имя сервера', 'IP address', 'Sizing'),
+    ('Доменное  имя', 'IP адрес', 'сайзинг'),
+]
+
+# Варианты сайзинга 'cpu/ram/hdd sys/hdd app'
+SIZING_VALUES = ['2/4/50/0', '4/16/50/100', '8/32/80/500', '16/64/100/1000']
+
+# Доли серверов сайзинга: совпадающих с паспортом, с другим сайзингом и отсутствующих в паспорте
+SIZING_OVERLAP = 0.9
+SIZING_MISMATCH = 0.05
+SIZING_EXTRA = 0.05
+
+
+def vm_name(idx: int) -> str:
+    """
+    :param idx: Номер ВМ.
+    :return: Имя ВМ синтетического набора.
+    """
+    return f'vm{idx:07d}.bench.local'
+
+
+def vm_ip(idx: int) -> str:
+    """
+    :param idx: Номер ВМ.
+    :return: IP-адрес ВМ синтетического набора.
+    """
+    return f'10.{idx // 65536 % 256}.{idx // 256 % 256}.{idx % 256}'
+
+
+def generate_passport_html(html_file: str, num_vms: int, vms_per_section: int = DEFAULT_VMS_PER_SECTION,
+                           span_density: float = DEFAULT_SPAN_DENSITY, seed: int = 0) -> None:
+    """
+    Генерирует HTML-паспорт: разделы innerCell с таблицами, где 'Наименование' и 'Роль'
+    объединены rowspan на группу ВМ, часть IP-адресов объединена rowspan на две строки,
+    часть сайзингов - colspan с колонкой примечания. Заголовки раздела выбираются
+    из PASSPORT_HEADER_VARIANTS по очереди.
+
+    Файл пишется по разделам, поэтому набор на 1M ВМ не строится в памяти целиком.
+
+    :param html_file: Путь к выходному HTML-файлу.
+    :param num_vms: Количество ВМ.
+    :param vms_per_section: Количество ВМ в разделе.
+    :param span_density: Доля строк с объединенными ячейками.
+    :param seed: Начальное значение генератора случайных чисел.
+    """
+    rng = random.Random(seed)
+    with open(html_file, 'w', encoding='utf-8') as file:
+        file.write('<html><head><meta charset="utf-8"></head><body>\n')
+        for section_idx, start in enumerate(range(0, num_vms, vms_per_section)):
+            variant = PASSPORT_HEADER_VARIANTS[section_idx % len(PASSPORT_HEADER_VARIANTS)]
+            server_header, ip_header, sizing_header = variant
+            parts = [f'<div class="innerCell"><h3>Приложение {section_idx}</h3><table>',
+                     f'<tr><td>Наименование</td><td>Роль</td><td>{server_header}</td>'
+                     f'<td>{ip_header}</td><td>{sizing_header}</td><td>Примечание</td></tr>']
+            end = min(start + vms_per_section, num_vms)
+            idx = start
+            previous_shared_ip = False
+            while idx < end:
+                group_size = min(rng.randint(1, 8), end - idx)
+                for position in range(group_size):
+                    cells = []
+                    if position == 0:
+                        cells.append(f'<td rowspan="{group_size}">Система {idx // 8}</td>'
+                                     f'<td rowspan="{group_size}">Роль {idx % 3}</td>')
+                    cells.append(f'<td>{vm_name(idx)}</td>')
+                    if position and previous_shared_ip:
+                        # Ячейка IP занята rowspan предыдущей строки
+                        shared_ip = False
+                    elif position + 1 < group_size and rng.random() < span_density:
+                        # Общий IP-адрес двух строк: следующая строка группы без ячейки IP
+                        cells.append(f'<td rowspan="2">{vm_ip(idx)}</td>')
+                        shared_ip = True
+                    else:
+                        cells.append(f'<td>{vm_ip(idx)}</td>')
+                        shared_ip = False
+                    sizing = SIZING_VALUES[idx % len(SIZING_VALUES)]
+                    if rng.random() < span_density:
+                        cells.append(f'<td colspan="2">{sizing}</td>')
+                    else:
+                        cells.append(f'<td>{sizing}</td><td></td>')
+                    parts.append('<tr>' + ''.join(cells) + '</tr>')
+                    previous_shared_ip = shared_ip
+                    idx += 1
+            parts.append('</table></div>\n')
+            file.write(''.join(parts))
+        file.write('</body></html>\n')
+
+
+def generate_sizing_workbook(excel_file: str, num_vms: int, seed: int = 0) -> None:
+    """
+    Генерирует Excel-файл сайзинга (лист 'Support'): большая часть ВМ паспорта, часть из них
+    с другим сайзингом, и серверы, отсутствующие в паспорте.
+
+    :param excel_file: Путь к выходному Excel-файлу.
+    :param num_vms: Количество ВМ в паспорте того же набора.
+    :param seed: Начальное значение генератора случайных чисел.
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Support')
+    sheet.append(['Имя сервера', 'IP адрес', 'Сайзинг\ncpu/ram/hdd sys/hdd app', 'Комментарий'])
+    for idx in range(num_vms):
+        if rng.random() >= SIZING_OVERLAP:
+            continue
+        sizing = SIZING_VALUES[idx % len(SIZING_VALUES)]
+        if rng.random() < SIZING_MISMATCH:
+            sizing = SIZING_VALUES[(idx + 1) % len(SIZING_VALUES)]
+        # Часть имен записана в верхнем регистре, как в реальных выгрузках
+        name = vm_name(idx).upper() if idx % 7 == 0 else vm_name(idx)
+        sheet.append([name, vm_ip(idx), sizing, None])
+    for idx in range(num_vms, num_vms + int(num_vms * SIZING_EXTRA)):
+        sheet.append([vm_name(idx), vm_ip(idx), SIZING_VALUES[idx % len(SIZING_VALUES)], 'Нет в паспорте'])
+    workbook.save(excel_file)
+
+
+def ensure_dataset(data_dir: str, num_vms: int, span_density: float, seed: int) -> Tuple[str, str]:
+    """
+    Возвращает пути к паспорту и сайзингу набора, генерируя отсутствующие файлы.
+
+    :param data_dir: Каталог синтетических наборов.
+    :param num_vms: Количество ВМ.
+    :param span_density: Доля строк с объединенными ячейками.
+    :param seed: Начальное значение генератора случайных чисел.
+    :return: Пути (HTML-файл паспорта, Excel-файл сайзинга).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    prefix = os.path.join(data_dir, f'vms{num_vms}_span{span_density:g}_seed{seed}')
+    html_file, excel_file = prefix + '.html', prefix + '.xlsx'
+    if not os.path.exists(html_file):
+        print(f"Генерация паспорта на {num_vms} ВМ: {html_file}", file=sys.stderr)
+        generate_passport_html(html_file, num_vms, span_density=span_density, seed=seed)
+    if not os.path.exists(excel_file):
+        print(f"Генерация сайзинга на {num_vms} ВМ: {excel_file}", file=sys.stderr)
+        generate_sizing_workbook(excel_file, num_vms, seed=seed)
+    return html_file, excel_file
+
+
+def run_stages(html_file: str, excel_file: str, work_dir: str, settings: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Прогоняет этапы сверки через промежуточные файлы и возвращает время каждого этапа
+    по отчету instrumentation ('parse_html', 'table_grid', 'excel_load', 'compare', 'report_write', 'extract').
+
+    :param html_file: HTML-файл паспорта.
+    :param excel_file: Excel-файл сайзинга.
+    :param work_dir: Каталог для промежуточных файлов и отчета.
+    :param settings: Движки: 'engine', 'excel_engine', 'compare_engine'.
+    :return: Время этапов, с.
+    """
+    from html_to_json import parse_html_to_json
+    from excel_to_json import excel_to_json
+    from compare_json import compare_json
+    from json_extractor import extract_data_from_json
+
+    passport_file = os.path.join(work_dir, 'passport.ndjson')
+    sizing_file = os.path.join(work_dir, 'sizing.ndjson')
+    with instrument_run() as report:
+        parse_html_to_json(html_file, passport_file, engine=settings['engine'])
+        excel_to_json(excel_file, sizing_file, engine=settings['excel_engine'])
+        compare_json(passport_file, sizing_file, os.path.join(work_dir, 'comparison.xlsx'),
+                     engine=settings['compare_engine'])
+        extract_data_from_json(passport_file)
+    return {name: stats.seconds for name, stats in report.stages.items()}
+
+
+def run_benchmarks(scales: List[int], settings: Dict[str, Any], data_dir: str, repeat: int,
+                   span_density: float, seed: int) -> Dict[str, Dict[str, float]]:
+    """
+    Замеряет этапы на наборах каждого размера; для каждого этапа берется лучшее время из повторов.
+
+    :param scales: Количество ВМ в наборах.
+    :param settings: Движки этапов.
+    :param data_dir: Каталог синтетических наборов.
+    :param repeat: Количество повторов.
+    :param span_density: Доля строк с объединенными ячейками.
+    :param seed: Начальное значение генератора случайных чисел.
+    :return: Время этапов по размерам наборов: {'1000': {'parse_html': 0.1, ...}, ...}.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    for num_vms in scales:
+        html_file, excel_file = ensure_dataset(data_dir, num_vms, span_density, seed)
+        best: Dict[str, float] = {}
+        with tempfile.TemporaryDirectory() as work_dir:
+            for _ in range(repeat):
+                for name, seconds in run_stages(html_file, excel_file, work_dir, settings).items():
+                    best[name] = min(best.get(name, seconds), seconds)
+        results[str(num_vms)] = best
+    return results
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                     max_regression: float) -> List[str]:
+    """
+    Сравнивает замеры с базовыми.
+
+    :param results: Текущие замеры.
+    :param baseline: Базовые замеры того же формата.
+    :param max_regression: Допустимое относительное замедление этапа.
+    :return: Описания этапов, замедлившихся сильнее допустимого.
+    """
+    regressions: List[str] = []
+    for scale, stages in results.items():
+        for name, seconds in stages.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None or seconds < MIN_CHECKED_SECONDS:
+                continue
+            if seconds > base * (1 + max_regression):
+                regressions.append(f"{scale} ВМ, этап {name}: {seconds:.3f} с при базовом {base:.3f} с "
+                                   f"(+{(seconds / base - 1) * 100:.0f}%)")
+    return regressions
+
+
+def load_baseline(baseline_file: str) -> Optional[Dict[str, Any]]:
+    """
+    Загружает базовые замеры.
+
+    :param baseline_file: Путь к файлу базовых замеров.
+    :return: Содержимое файла или None, если его нет.
+    """
+    if not os.path.exists(baseline_file):
+        return None
+    with open(baseline_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(baseline_file: str, settings: Dict[str, Any], results: Dict[str, Dict[str, float]]) -> None:
+    """
+    Сохраняет замеры как базовые.
+
+    :param baseline_file: Путь к файлу базовых замеров.
+    :param settings: Движки и параметры данных, с которыми выполнены замеры.
+    :param results: Замеры.
+    """
+    rounded = {scale: {name: round(seconds, 6) for name, seconds in stages.items()}
+               for scale, stages in results.items()}
+    with open(baseline_file, 'w', encoding='utf-8') as file:
+        json.dump({'settings': settings, 'results': rounded}, file, ensure_ascii=False, indent=4)
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    """
+    Выводит таблицу замеров с базовыми значениями.
+
+    :param results: Текущие замеры.
+    :param baseline: Базовые замеры (может быть пустым).
+    """
+    print(f"{'ВМ':>10} {'этап':>14} {'время, с':>10} {'база, с':>10}")
+    for scale, stages in results.items():
+        for name, seconds in stages.items():
+            base = baseline.get(scale, {}).get(name)
+            base_text = f"{base:>10.3f}" if base is not None else f"{'-':>10}"
+            print(f"{scale:>10} {name:>14} {seconds:>10.3f} {base_text}")
+
+
+def main() -> None:
+    """
+    Замеряет этапы сверки на синтетических данных и проверяет их относительно базовых замеров.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов сверки на синтетических паспортах и сайзинге")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Количество ВМ в наборах")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество повторов (берется лучшее время этапа)")
+    parser.add_argument('--engine', choices=['bs4', 'lxml'], default='bs4', help="Движок парсинга HTML")
+    parser.add_argument('--excel-engine', choices=['pandas', 'openpyxl'], default='pandas', help="Движок чтения Excel")
+    parser.add_argument('--compare-engine', choices=['python', 'pandas'], default='python', help="Движок сравнения")
+    parser.add_argument('--span-density', type=float, default=DEFAULT_SPAN_DENSITY,
+                        help="Доля строк паспорта с объединенными ячейками")
+    parser.add_argument('--seed', type=int, default=0, help="Начальное значение генератора данных")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Каталог сгенерированных наборов")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help="Файл базовых замеров")
+    parser.add_argument('--save-baseline', action='store_true', help="Сохранить замеры как базовые")
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Допустимое замедление этапа относительно базового (0.25 - на 25%%)")
+    args = parser.parse_args()
+
+    settings = {'engine': args.engine, 'excel_engine': args.excel_engine, 'compare_engine': args.compare_engine,
+                'span_density': args.span_density, 'seed': args.seed}
+
+    baseline_data = None if args.save_baseline else load_baseline(args.baseline)
+    if not args.save_baseline:
+        # Без базовых замеров проверка не выполняется, поэтому их отсутствие - ошибка, а не успешный запуск
+        if baseline_data is None:
+            print(f"Файл базовых замеров {args.baseline} не найден, проверка замедления невозможна. "
+                  f"Сохраните замеры на этой машине: python3 benchmark.py --save-baseline", file=sys.stderr)
+            sys.exit(2)
+        if baseline_data.get('settings') != settings:
+            print(f"Параметры базовых замеров {args.baseline} отличаются от текущих: {baseline_data.get('settings')}",
+                  file=sys.stderr)
+            sys.exit(2)
+        missing = [str(scale) for scale in args.scales if str(scale) not in baseline_data['results']]
+        if missing:
+            print(f"В базовых замерах {args.baseline} нет наборов: {', '.join(missing)} ВМ. "
+                  f"Сохраните замеры с теми же --scales", file=sys.stderr)
+            sys.exit(2)
+    baseline = baseline_data['results'] if baseline_data else {}
+
+    logging.disable(logging.CRITICAL)
+    results = run_benchmarks(args.scales, settings, args.data_dir, args.repeat, args.span_density, args.seed)
+    logging.disable(logging.NOTSET)
+
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, settings, results)
+        print(f"Базовые замеры сохранены в файле {args.baseline}")
+        return
+
+    regressions = find_regressions(results, baseline, args.max_regression)
+    if regressions:
+        print("Замедление относительно базовых замеров:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmark_table_grid.py
+
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+from table_grid import RawCell, build_grid
+
+# Размеры синтетических таблиц по умолчанию (количество строк)
+DEFAULT_SIZES = [10_000, 100_000, 500_000]
+
+
+def generate_raw_rows(num_rows: int, group_size: int = 4) -> List[List[RawCell]]:
+    """
+    Генерирует строки таблицы, похожей на приложение паспорта: 'Наименование' и 'Роль'
+    объединены через rowspan на группу строк, раз в группу встречается ячейка colspan+rowspan.
+
+    :param num_rows: Количество строк данных.
+    :param group_size: Количество строк в группе с общими 'Наименование' и 'Роль'.
+    :return: Строки таблицы с заголовком.
+    """
+    rows: List[List[RawCell]] = [[(header, 1, 1) for header in
+                                  ('Наименование', 'Роль', 'Доменное имя', 'IP-адрес', 'Сайзинг', 'Примечание')]]
+    for idx in range(num_rows):
+        position = idx % group_size
+        cells: List[RawCell] = []
+        if position == 0:
+            span = min(group_size, num_rows - idx)
+            cells.append((f'Система {idx // group_size}', 1, span))
+            cells.append((f'Роль {idx % 3}', 1, span))
+        cells.append((f'vm{idx}.example.ru', 1, 1))
+        if position == 1 and idx + 1 < num_rows and group_size > 2:
+            # Объединение IP-адреса и сайзинга на две строки
+            cells.append(('10.0.0.0/24', 2, 2))
+        elif position != 2:
+            cells.append((f'10.{idx % 256}.{idx // 256 % 256}.1', 1, 1))
+            cells.append(('4/16/50/100', 1, 1))
+        cells.append(('', 1, 1))
+        rows.append(cells)
+    return rows
+
+
+def generate_html_table(num_rows: int) -> str:
+    """
+    Генерирует HTML-страницу с одним разделом innerCell и таблицей из generate_raw_rows.
+
+    :param num_rows: Количество строк данных.
+    :return: HTML-код страницы.
+    """
+    parts = ['<html><body><div class="innerCell"><h3>Приложение</h3><table>']
+    for cells in generate_raw_rows(num_rows):
+        parts.append('<tr>')
+        for text, colspan, rowspan in cells:
+            parts.append(f'<td colspan="{colspan}" rowspan="{rowspan}">{text}</td>')
+        parts.append('</tr>')
+    parts.append('</table></div></body></html>')
+    return ''.join(parts)
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """
+    Возвращает лучшее время выполнения функции из нескольких повторов.
+
+    :param func: Измеряемая функция без аргументов.
+    :param repeat: Количество повторов.
+    :return: Лучшее время в секундах.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """
+    Замеряет построение матрицы таблицы на синтетических таблицах разного размера.
+    """
+    parser = argparse.ArgumentParser(description="Микробенчмарк построения матрицы таблицы с rowspan/colspan")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Количество строк таблиц")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество повторов каждого замера")
+    parser.add_argument('--html', action='store_true',
+                        help="Дополнительно замерить извлечение таблицы из HTML движками bs4 и lxml")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'строк':>10} {'этап':>12} {'время, с':>10} {'строк/с':>12}")
+    for size in args.sizes:
+        rows = generate_raw_rows(size)
+        elapsed = measure(lambda: build_grid(rows), args.repeat)
+        print(f"{size:>10} {'grid':>12} {elapsed:>10.3f} {size / elapsed:>12.0f}")
+
+        if args.html:
+            from bs4 import BeautifulSoup
+            from html_to_json import iter_sections_lxml, parse_html_table
+
+            html = generate_html_table(size)
+            soup = BeautifulSoup(io.StringIO(html), 'html.parser')
+            table = soup.find('table')
+            elapsed = measure(lambda: parse_html_table(table), args.repeat)
+            print(f"{size:>10} {'bs4 table':>12} {elapsed:>10.3f} {size / elapsed:>12.0f}")
+
+            # Страница удаляется вместе с каталогом, даже если замер прерван
+            with tempfile.TemporaryDirectory() as work_dir:
+                path = os.path.join(work_dir, 'page.html')
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(html)
+                elapsed = measure(lambda: list(iter_sections_lxml(path)), args.repeat)
+            print(f"{size:>10} {'lxml page':>12} {elapsed:>10.3f} {size / elapsed:>12.0f}")
+
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
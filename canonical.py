@@ -0,0 +1,254 @@
+# canonical.py
+
+import ipaddress
+import math
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    # numpy и pandas нужны только колоночному сравнению и импортируются в его функциях,
+    # чтобы построчное сравнение не тратило время запуска на их загрузку
+    import numpy as np
+
+# Поля сайзинга в порядке записи 'cpu/ram/hdd sys/hdd app'
+SIZING_FIELDS = ('cpu', 'ram', 'hdd_sys', 'hdd_app')
+
+# Разделители адресов в ячейке с несколькими IP
+IP_SEPARATOR_RE = re.compile(r'[\s,;]+')
+
+# IPv4-адрес из четырех десятичных октетов, в том числе с ведущими нулями (010.000.000.001)
+DOTTED_IPV4_RE = re.compile(r'^\d{1,3}(?:\.\d{1,3}){3}$')
+
+# Числовое значение поля сайзинга (допускается десятичная запятая)
+SIZING_NUMBER_RE = re.compile(r'^\d+(?:[.,]\d+)?$')
+
+# Пробельные символы, не влияющие на сравнение текстового сайзинга
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Размер кэша разобранных значений для построчного сравнения
+CANONICAL_CACHE_SIZE = 65536
+
+
+def value_text(value: Any) -> str:
+    """
+    Приводит значение ячейки к строке: пустые значения и NaN - пустая строка,
+    целые числа с плавающей точкой (например, 2.0 из pandas) - без дробной части.
+
+    :param value: Значение ячейки.
+    :return: Строковое значение без пробелов по краям.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_ip(value: Any) -> str:
+    """
+    Приводит ячейку IP-адресов к каноническому виду: адреса разделяются пробелами,
+    запятыми или точками с запятой, нормализуются и сортируются без повторов.
+
+    :param value: Значение ячейки IP-адреса.
+    :return: Отсортированные канонические адреса через пробел.
+    """
+    addresses = {canonical_address(token) for token in IP_SEPARATOR_RE.split(value_text(value)) if token}
+    return ' '.join(sorted(addresses))
+
+
+def canonical_address(token: str) -> str:
+    """
+    Приводит один адрес ячейки к каноническому виду.
+
+    :param token: Адрес, в том числе с длиной префикса (CIDR).
+    :return: Канонический адрес или адрес с префиксом (биты узла сохраняются: 10.0.0.1/24 и 10.0.0.2/24
+             различаются); значение, не являющееся адресом, - текст в нижнем регистре.
+    """
+    if DOTTED_IPV4_RE.match(token):
+        # Октеты с ведущими нулями (выравнивание в выгрузках) читаются как десятичные: ipaddress их не принимает
+        token = '.'.join(str(int(octet)) for octet in token.split('.'))
+    try:
+        return str(ipaddress.ip_address(token))
+    except ValueError:
+        pass
+    try:
+        return str(ipaddress.ip_interface(token))
+    except ValueError:
+        # Не адрес: сравнивается как текст
+        return token.lower()
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_sizing(value: Any) -> Tuple[Optional[Tuple[float, ...]], str]:
+    """
+    Разбирает сайзинг 'cpu/ram/hdd sys/hdd app' в числа.
+
+    Отсутствующие поля - NaN. Если значение не разбирается как числа через '/',
+    оно сравнивается как текст без пробелов в нижнем регистре.
+
+    :param value: Значение ячейки сайзинга.
+    :return: Пара (числа по полям SIZING_FIELDS или None, канонический текст).
+    """
+    text = WHITESPACE_RE.sub('', value_text(value)).lower()
+    if not text:
+        return None, text
+
+    parts = text.split('/')
+    if len(parts) > len(SIZING_FIELDS) or not all(SIZING_NUMBER_RE.match(part) for part in parts):
+        return None, text
+
+    numbers = [float(part.replace(',', '.')) for part in parts]
+    numbers.extend([math.nan] * (len(SIZING_FIELDS) - len(numbers)))
+    return tuple(numbers), text
+
+
+def sizing_tolerance_vector(tolerances: Optional[Dict[str, float]] = None) -> Tuple[float, ...]:
+    """
+    Преобразует допуски по полям сайзинга в вектор.
+
+    :param tolerances: Допустимая абсолютная разница по полям SIZING_FIELDS (по умолчанию 0).
+    :return: Вектор допусков в порядке SIZING_FIELDS.
+    :raises ValueError: Если указано неизвестное поле или отрицательный допуск.
+    """
+    tolerances = tolerances or {}
+    unknown = set(tolerances) - set(SIZING_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля допусков сайзинга: {sorted(unknown)}. Допустимые значения: {SIZING_FIELDS}")
+    vector = tuple(float(tolerances.get(field, 0)) for field in SIZING_FIELDS)
+    if any(value < 0 for value in vector):
+        raise ValueError(f"Допуски сайзинга не могут быть отрицательными: {tolerances}")
+    return vector
+
+
+def ip_differs(value1: Any, value2: Any) -> bool:
+    """
+    Сравнивает две ячейки IP-адресов по каноническому виду.
+
+    :param value1: IP-адреса из паспорта.
+    :param value2: IP-адреса из сайзинга.
+    :return: True, если наборы адресов различаются.
+    """
+    return canonical_ip(value1) != canonical_ip(value2)
+
+
+def sizing_differs(value1: Any, value2: Any, tolerance: Sequence[float]) -> bool:
+    """
+    Сравнивает две ячейки сайзинга по полям с учетом допусков.
+
+    :param value1: Сайзинг из паспорта.
+    :param value2: Сайзинг из сайзинга.
+    :param tolerance: Вектор допусков из sizing_tolerance_vector.
+    :return: True, если сайзинг различается.
+    """
+    numbers1, text1 = canonical_sizing(value1)
+    numbers2, text2 = canonical_sizing(value2)
+    if numbers1 is None or numbers2 is None:
+        return text1 != text2
+    for number1, number2, field_tolerance in zip(numbers1, numbers2, tolerance):
+        missing1, missing2 = math.isnan(number1), math.isnan(number2)
+        if missing1 or missing2:
+            if missing1 != missing2:
+                return True
+        elif abs(number1 - number2) > field_tolerance:
+            return True
+    return False
+
+
+def factorize_values(values: Sequence[Any]) -> Tuple['np.ndarray', List[Any]]:
+    """
+    Кодирует колонку индексами ее уникальных значений, чтобы каждое значение разбиралось один раз.
+
+    :param values: Значения колонки.
+    :return: Коды строк и список уникальных значений; пустым значениям (None/NaN)
+             соответствует последний элемент списка - None.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    uniques = list(uniques) + [None]
+    # Код -1 (пустое значение) указывает на добавленный последним None
+    codes = np.where(codes < 0, len(uniques) - 1, codes)
+    return codes, uniques
+
+
+def canonical_ip_column(values: Sequence[Any]) -> 'np.ndarray':
+    """
+    Приводит колонку IP-адресов к каноническому виду.
+
+    :param values: Значения колонки.
+    :return: Массив канонических строк адресов.
+    """
+    import numpy as np
+
+    codes, uniques = factorize_values(values)
+    canonical = np.array([canonical_ip(value) for value in uniques], dtype=object)
+    return canonical[codes]
+
+
+def canonical_sizing_column(values: Sequence[Any]) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """
+    Разбирает колонку сайзинга в числовую матрицу.
+
+    :param values: Значения колонки.
+    :return: Матрица чисел (строки x SIZING_FIELDS), маска разобранных значений и массив канонического текста.
+    """
+    import numpy as np
+
+    codes, uniques = factorize_values(values)
+    numbers = np.full((len(uniques), len(SIZING_FIELDS)), np.nan)
+    parsed = np.zeros(len(uniques), dtype=bool)
+    texts = np.empty(len(uniques), dtype=object)
+    for idx, value in enumerate(uniques):
+        value_numbers, texts[idx] = canonical_sizing(value)
+        if value_numbers is not None:
+            numbers[idx] = value_numbers
+            parsed[idx] = True
+    return numbers[codes], parsed[codes], texts[codes]
+
+
+def ip_mismatch_mask(values1: Sequence[Any], values2: Sequence[Any]) -> 'np.ndarray':
+    """
+    Сравнивает колонки IP-адресов по каноническому виду.
+
+    :param values1: IP-адреса из паспорта.
+    :param values2: IP-адреса из сайзинга.
+    :return: Булев массив расхождений.
+    """
+    import numpy as np
+
+    if not len(values1):
+        return np.zeros(0, dtype=bool)
+    return np.asarray(canonical_ip_column(values1) != canonical_ip_column(values2), dtype=bool)
+
+
+def sizing_mismatch_mask(values1: Sequence[Any], values2: Sequence[Any],
+                         tolerance: Sequence[float]) -> 'np.ndarray':
+    """
+    Сравнивает колонки сайзинга по полям с учетом допусков; результат совпадает с sizing_differs.
+
+    :param values1: Сайзинг из паспорта.
+    :param values2: Сайзинг из сайзинга.
+    :param tolerance: Вектор допусков из sizing_tolerance_vector.
+    :return: Булев массив расхождений.
+    """
+    import numpy as np
+
+    if not len(values1):
+        return np.zeros(0, dtype=bool)
+    numbers1, parsed1, texts1 = canonical_sizing_column(values1)
+    numbers2, parsed2, texts2 = canonical_sizing_column(values2)
+
+    missing1 = np.isnan(numbers1)
+    missing2 = np.isnan(numbers2)
+    with np.errstate(invalid='ignore'):
+        exceeds = np.abs(numbers1 - numbers2) > np.asarray(tolerance)
+    fields_differ = np.where(missing1 | missing2, missing1 != missing2, exceeds)
+
+    texts_differ = np.asarray(texts1 != texts2, dtype=bool)
+    return np.where(parsed1 & parsed2, fields_differ.any(axis=1), texts_differ)
@@ -2,19 +2,57 @@
 
 import json
 import logging
-from typing import Dict, Any, List, Optional
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font
-from utils import adjust_column_widths
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+from canonical import (ip_differs, ip_mismatch_mask, sizing_differs, sizing_mismatch_mask, sizing_tolerance_vector,
+                       value_text)
+from fuzzy_match import find_name_candidates
+from instrumentation import stage
+from ndjson_io import is_ndjson, iter_records
+from report_writer import ReportSection, write_report_sections
+from run_snapshot import (STATUS_MATCHED, STATUS_MISMATCH, STATUS_MISSING_IN_PASSPORT, STATUS_MISSING_IN_SIZING,
+                          ServerState, load_snapshot, save_snapshot, server_digest)
+from vm_record import VmRecord, records_from_sections
+
+if TYPE_CHECKING:
+    # numpy и pandas нужны только движку 'pandas' и импортируются в его функциях
+    import numpy as np
+    import pandas as pd
+
+# Доступные движки сравнения
+COMPARE_ENGINES = ('python', 'pandas')
+
+# Колонки отчета сравнения
+REPORT_HEADERS = [
+    'Имя сервера',
+    'IP адрес в сайзинге', 'IP адрес в паспорте',
+    'Сайзинг в сайзинге', 'Сайзинг в паспорте',
+    'Источник в паспорте', 'Источник в сайзинге'
+]
+
+# Колонки отчета об изменениях с прошлого запуска
+DELTA_HEADERS = ['Имя сервера', 'Было', 'Стало'] + REPORT_HEADERS[1:]
+
+# Подписи статусов сервера в отчете об изменениях
+STATUS_LABELS = {
+    STATUS_MATCHED: 'Совпадает',
+    STATUS_MISMATCH: 'Расхождения',
+    STATUS_MISSING_IN_PASSPORT: 'Нет в паспорте',
+    STATUS_MISSING_IN_SIZING: 'Нет в сайзинге',
+    None: 'Нет в источниках'
+}
+
+# Разделы отчета об изменениях в порядке вывода
+DELTA_SECTIONS = ['Новые расхождения', 'Исправлены', 'Появились', 'Исчезли', 'Изменились расхождения',
+                  'Изменился статус']
+
+# Источник записи сайзинга, прочитанной с листа 'Support' (без режима всех листов)
+DEFAULT_SIZING_SOURCE = 'Excel файл'
+
+# Количество имен серверов в примере предупреждения о повторах на листах сайзинга
+DUPLICATE_EXAMPLES = 5
+
+# Колонки раздела возможных совпадений имен
+CANDIDATE_HEADERS = ['Имя в паспорте', 'Имя в сайзинге', 'Оценка сходства', 'Признак']
 
 
 def load_json(file_path: str) -> Any:
@@ -42,225 +80,120 @@ def load_json(file_path: str) -> Any:
         raise
 
 
-def build_dict1(data1: Any) -> Dict[str, Dict[str, Any]]:
+def iter_servers(records: Iterable[VmRecord]) -> Iterator[Tuple[str, VmRecord]]:
+    """
+    Обходит серверы паспорта или сайзинга, пропуская записи без имени сервера.
+
+    :param records: Записи ВМ.
+    :return: Генератор пар (имя сервера в нижнем регистре, запись ВМ).
     """
-    Преобразует данные из первого JSON-файла (паспорт) в словарь.
+    for record in records:
+        key = record.key
+        if key:
+            yield key, record
 
-    :param data1: Данные из первого JSON-файла.
+
+def build_dict1(data1: Iterable[VmRecord]) -> Dict[str, VmRecord]:
+    """
+    Преобразует записи паспорта в словарь.
+
+    :param data1: Записи ВМ паспорта.
     :return: Словарь с именами серверов в нижнем регистре в качестве ключей.
     """
-    dict1: Dict[str, Dict[str, Any]] = {}
-    for section in data1:
-        section_name = section.get('Раздел', '')
-        logging.debug(f"Раздел: {section_name}")
-        for item in section.get('Данные', []):
-            for vm in item.get('ВМ', []):
-                server_name = vm.get('Имя сервера', '').strip().lower()
-                if server_name:
-                    dict1[server_name] = {
-                        'IP адрес': vm.get('IP адрес', ''),
-                        'Сайзинг': vm.get('Сайзинг', ''),
-                        'Источник': f"Раздел: {section_name}"
-                    }
-    return dict1
+    return dict(iter_servers(data1))
 
 
-def build_dict2(data2: Any) -> Dict[str, Dict[str, Any]]:
+def build_dict2(data2: Iterable[VmRecord]) -> Dict[str, VmRecord]:
     """
-    Преобразует данные из второго JSON-файла (сайзинг) в словарь.
+    Преобразует записи сайзинга в словарь.
+
+    Если в режиме всех листов сервер есть на нескольких листах, сравнивается запись последнего листа,
+    о таких серверах пишется предупреждение, а в источнике записи перечисляются остальные листы.
 
-    :param data2: Данные из второго JSON-файла.
+    :param data2: Записи сайзинга.
     :return: Словарь с именами серверов в нижнем регистре в качестве ключей.
     """
-    return {
-        item.get('Имя сервера', '').strip().lower(): {
-            'IP адрес': item.get('IP адрес', ''),
-            'Сайзинг': item.get('Сайзинг', ''),
-            'Источник': "Excel файл"
-        }
-        for item in data2
-        if item.get('Имя сервера', '').strip()
-    }
+    dict2: Dict[str, VmRecord] = {}
+    # Листы сервера в порядке появления; заполняется только для записей с листом
+    server_sheets: Dict[str, List[str]] = {}
+    for server, record in iter_servers(data2):
+        dict2[server] = record
+        if record.sheet is not None:
+            sheets = server_sheets.setdefault(server, [])
+            if record.sheet not in sheets:
+                sheets.append(record.sheet)
+
+    repeated = sorted(server for server, sheets in server_sheets.items() if len(sheets) > 1)
+    if repeated:
+        logging.warning(f"Серверов на нескольких листах сайзинга: {len(repeated)} "
+                        f"(например: {', '.join(repeated[:DUPLICATE_EXAMPLES])}). "
+                        f"Сравниваются записи последнего листа, остальные листы указаны в источнике")
+    for server in repeated:
+        record = dict2[server]
+        others = ', '.join(sheet for sheet in server_sheets[server] if sheet != record.sheet)
+        logging.debug(f"Сервер {server} есть на листах сайзинга: {', '.join(server_sheets[server])}")
+        dict2[server] = VmRecord(record.server_name, record.ip, record.sizing, record.section,
+                                 record.naimenovanie, record.role, f"{record.sheet} (также: {others})")
+    return dict2
+
+
+def sizing_source(item: VmRecord) -> str:
+    """
+    :param item: Запись сервера из сайзинга.
+    :return: Источник записи для отчета: лист книги сайзинга или DEFAULT_SIZING_SOURCE.
+    """
+    return f"Лист: {item.sheet}" if item.sheet is not None else DEFAULT_SIZING_SOURCE
 
 
-def compare_json(json_file_1: str, json_file_2: str, output_excel_file: str) -> None:
+def load_passport_data(json_file: str) -> Iterator[VmRecord]:
+    """
+    Загружает записи паспорта из промежуточного файла; .ndjson/.jsonl читаются потоково.
+
+    :param json_file: Путь к JSON- или NDJSON-файлу паспорта.
+    :return: Генератор записей ВМ.
+    """
+    if is_ndjson(json_file):
+        return (VmRecord.from_dict(record) for record in iter_records(json_file))
+    return records_from_sections(load_json(json_file))
+
+
+def load_sizing_data(json_file: str) -> Iterator[VmRecord]:
+    """
+    Загружает записи сайзинга из промежуточного файла; .ndjson/.jsonl читаются потоково.
+
+    :param json_file: Путь к JSON- или NDJSON-файлу сайзинга.
+    :return: Генератор записей сайзинга.
+    """
+    records = iter_records(json_file) if is_ndjson(json_file) else load_json(json_file)
+    return (VmRecord.from_dict(record) for record in records)
+
+
+def compare_json(json_file_1: str, json_file_2: str, output_excel_file: str, engine: str = 'python',
+                 sizing_tolerances: Optional[Dict[str, float]] = None,
+                 fuzzy_min_score: Optional[float] = None, snapshot_file: Optional[str] = None) -> Dict[str, int]:
     """
     Сравнивает два JSON файла и записывает результаты сравнения в Excel файл.
+    Файлы .ndjson/.jsonl читаются потоково по одной записи.
 
     :param json_file_1: Путь к первому JSON файлу (паспорт).
     :param json_file_2: Путь ко второму JSON файлу (сайзинг).
     :param output_excel_file: Путь к выходному Excel файлу.
+    :param engine: Движок сравнения: 'python' или 'pandas'.
+    :param sizing_tolerances: Допуски сравнения по полям сайзинга или None.
+    :param fuzzy_min_score: Порог сходства для поиска похожих имен несопоставленных серверов или None.
+    :param snapshot_file: Файл снимка предыдущего запуска: если задан, вместо полного отчета
+                          записывается отчет об изменениях (compare_delta).
+    :return: Количество строк отчета по категориям.
     """
     try:
         # Загружаем данные из JSON-файлов
-        data1 = load_json(json_file_1)
-        data2 = load_json(json_file_2)
-
-        # Преобразуем данные в словари для быстрого доступа
-        dict1 = build_dict1(data1)
-        dict2 = build_dict2(data2)
-
-        # Получаем множество всех серверов
-        servers1 = set(dict1.keys())
-        servers2 = set(dict2.keys())
-        all_servers = servers1.union(servers2)
-        logging.info(f"Всего серверов в паспорте: {len(servers1)}")
-        logging.info(f"Всего серверов в сайзинге: {len(servers2)}")
-        logging.info(f"Общее количество уникальных серверов для сравнения: {len(all_servers)}")
-
-        # Подготавливаем данные для записи в Excel
-        matched_rows: List[Dict[str, Any]] = []
-        unmatched_rows_red: List[Dict[str, Any]] = []
-        unmatched_rows_blue: List[Dict[str, Any]] = []
-
-        for server in sorted(all_servers):
-            logging.info(f"\nСравнение сервера: {server}")
-            row: Dict[str, Any] = {'Имя сервера': server}
-            red_cells: List[str] = []
-            blue_cells: List[str] = []
-            full_row_color: Optional[str] = None
-
-            item1 = dict1.get(server)
-            item2 = dict2.get(server)
-
-            # Добавляем данные из паспорта
-            if item1:
-                row['IP адрес в паспорте'] = item1.get('IP адрес', '')
-                row['Сайзинг в паспорте'] = item1.get('Сайзинг', '')
-                row['Источник в паспорте'] = item1.get('Источник', '')
-                logging.debug(
-                    f"  Данные из паспорта: IP адрес: {row['IP адрес в паспорте']}, "
-                    f"Сайзинг: {row['Сайзинг в паспорте']}, Источник: {row['Источник в паспорте']}"
-                )
-            else:
-                row['IP адрес в паспорте'] = ''
-                row['Сайзинг в паспорте'] = ''
-                row['Источник в паспорте'] = ''
-                logging.debug("  Сервер отсутствует в паспорте")
-
-            # Добавляем данные из сайзинга
-            if item2:
-                row['IP адрес в сайзинге'] = item2.get('IP адрес', '')
-                row['Сайзинг в сайзинге'] = item2.get('Сайзинг', '')
-                logging.debug(
-                    f"  Данные из сайзинга: IP адрес: {row['IP адрес в сайзинге']}, "
-                    f"Сайзинг: {row['Сайзинг в сайзинге']}, Источник: {item2.get('Источник', '')}"
-                )
-            else:
-                row['IP адрес в сайзинге'] = ''
-                row['Сайзинг в сайзинге'] = ''
-                logging.debug("  Сервер отсутствует в сайзинге")
-
-            # Логика подсветки
-            if item1 and item2:
-                discrepancies = False
-                ip1 = str(row['IP адрес в паспорте']).strip()
-                ip2 = str(row['IP адрес в сайзинге']).strip()
-                if ip1 != ip2:
-                    discrepancies = True
-                    red_cells.append('IP адрес в паспорте')
+        data1 = load_passport_data(json_file_1)
+        data2 = load_sizing_data(json_file_2)
 
-                sizing1 = str(row['Сайзинг в паспорте']).strip()
-                sizing2 = str(row['Сайзинг в сайзинге']).strip()
-                if sizing1 != sizing2:
-                    discrepancies = True
-                    red_cells.append('Сайзинг в паспорте')
-
-                matched_rows.append({
-                    'data': row,
-                    'red_cells': red_cells,
-                    'blue_cells': blue_cells,
-                    'full_row_color': None
-                })
-            else:
-                if not item1:
-                    full_row_color = 'red'
-                    logging.info("  Сервер отсутствует в паспорте")
-                if not item2:
-                    full_row_color = 'blue'
-                    logging.info("  Сервер отсутствует в сайзинге")
-
-                if not item1 and not item2:
-                    full_row_color = 'red'  # При отсутствии в обоих, выделяем красным
-
-                row_entry = {
-                    'data': row,
-                    'red_cells': red_cells,
-                    'blue_cells': blue_cells,
-                    'full_row_color': full_row_color
-                }
-
-                if full_row_color == 'red':
-                    unmatched_rows_red.append(row_entry)
-                elif full_row_color == 'blue':
-                    unmatched_rows_blue.append(row_entry)
-
-        # Объединяем списки: сначала совпадающие, затем отсутствующие в паспорте (красным), затем отсутствующие в сайзинге (синим)
-        all_rows = matched_rows + unmatched_rows_red + unmatched_rows_blue
-
-        # Записываем результаты в Excel-файл
-        wb = Workbook()
-        ws = wb.active
-
-        headers = [
-            'Имя сервера',
-            'IP адрес в сайзинге', 'IP адрес в паспорте',
-            'Сайзинг в сайзинге', 'Сайзинг в паспорте',
-            'Источник в паспорте'
-        ]
-
-        red_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-        blue_fill = PatternFill(start_color='ADD8E6', end_color='ADD8E6', fill_type='solid')  # Светло-синий
-        bold_font = Font(bold=True)
-
-        current_row = 1
-
-        # Пишем совпадающие серверы
-        ws.cell(row=current_row, column=1, value="Совпадающие серверы").font = bold_font
-        current_row += 1
-        ws.append(headers)
-        for entry in matched_rows:
-            row_data = entry['data']
-            ws_row = [row_data.get(header, '') for header in headers]
-            ws.append(ws_row)
-            row_num = ws.max_row
-            for col_name in entry['red_cells']:
-                if col_name in headers:
-                    col_idx = headers.index(col_name) + 1
-                    ws.cell(row=row_num, column=col_idx).fill = red_fill
-        current_row = ws.max_row + 2
-
-        # Пишем серверы отсутствующие в паспорте
-        ws.cell(row=current_row, column=1, value="Серверы отсутствующие в паспорте").font = bold_font
-        current_row += 1
-        ws.append(headers)
-        for entry in unmatched_rows_red:
-            row_data = entry['data']
-            ws_row = [row_data.get(header, '') for header in headers]
-            ws.append(ws_row)
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row_num, column=col).fill = red_fill
-        current_row = ws.max_row + 2
-
-        # Пишем серверы отсутствующие в сайзинге
-        ws.cell(row=current_row, column=1, value="Серверы отсутствующие в сайзинге").font = bold_font
-        current_row += 1
-        ws.append(headers)
-        for entry in unmatched_rows_blue:
-            row_data = entry['data']
-            ws_row = [row_data.get(header, '') for header in headers]
-            ws.append(ws_row)
-            row_num = ws.max_row
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row_num, column=col).fill = blue_fill
-
-        # Настраиваем ширину колонок
-        adjust_column_widths(ws)
-
-        # Сохраняем Excel-файл
-        wb.save(output_excel_file)
-        logging.info(f"\nРезультаты сравнения сохранены в файле {output_excel_file}")
+        if snapshot_file:
+            return compare_delta(data1, data2, snapshot_file, output_excel_file, sizing_tolerances)
+        return compare_data(data1, data2, output_excel_file, engine=engine,
+                            sizing_tolerances=sizing_tolerances, fuzzy_min_score=fuzzy_min_score)
 
     except json.JSONDecodeError as jde:
         logging.error(f"Ошибка декодирования JSON: {jde}")
@@ -271,3 +204,549 @@ def compare_json(json_file_1: str, json_file_2: str, output_excel_file: str) ->
     except Exception as e:
         logging.error(f"Неизвестная ошибка при сравнении JSON-файлов: {e}")
         raise
+
+
+def compare_data(data1: Any, data2: Any, output_excel_file: str, engine: str = 'python',
+                 sizing_tolerances: Optional[Dict[str, float]] = None,
+                 fuzzy_min_score: Optional[float] = None) -> Dict[str, int]:
+    """
+    Сравнивает данные паспорта и сайзинга, уже загруженные в память,
+    и записывает результаты сравнения в Excel файл.
+
+    :param data1: Данные паспорта (результат parse_html_to_json).
+    :param data2: Данные сайзинга (результат excel_to_json).
+    :param output_excel_file: Путь к выходному Excel файлу.
+    :param engine: Движок сравнения: 'python' (словари, по умолчанию) или 'pandas'
+                   (колоночное внешнее соединение по имени сервера).
+    :param sizing_tolerances: Допустимая абсолютная разница по полям сайзинга
+                              ('cpu', 'ram', 'hdd_sys', 'hdd_app'); по умолчанию - точное совпадение.
+    :param fuzzy_min_score: Минимальная оценка сходства для поиска похожих имен среди несопоставленных
+                            серверов (отдельный раздел отчета) или None, чтобы не искать.
+    :return: Итоги сравнения: количество совпадающих серверов, из них с расхождениями,
+             отсутствующих в паспорте и отсутствующих в сайзинге.
+    :raises ValueError: Если указан неизвестный движок сравнения или некорректные допуски.
+    """
+    try:
+        if engine not in COMPARE_ENGINES:
+            raise ValueError(f"Неизвестный движок сравнения: {engine}. Допустимые значения: {COMPARE_ENGINES}")
+        tolerance = sizing_tolerance_vector(sizing_tolerances)
+
+        with stage('compare'):
+            if engine == 'pandas':
+                matched_rows, unmatched_rows_red, unmatched_rows_blue = compare_frames(data1, data2, tolerance)
+            else:
+                matched_rows, unmatched_rows_red, unmatched_rows_blue = compare_dicts(data1, data2, tolerance)
+
+        candidate_rows = None
+        if fuzzy_min_score is not None:
+            # Имена несопоставленных серверов собираются по мере записи их разделов,
+            # раздел кандидатов пишется последним
+            missing_in_passport: List[str] = []
+            missing_in_sizing: List[str] = []
+            unmatched_rows_red = collect_names(unmatched_rows_red, missing_in_passport)
+            unmatched_rows_blue = collect_names(unmatched_rows_blue, missing_in_sizing)
+            candidate_rows = iter_candidate_rows(missing_in_sizing, missing_in_passport, fuzzy_min_score)
+
+        # Строки отчета формируются лениво, поэтому их сравнение входит в этап записи отчета
+        with stage('report_write') as stats:
+            counts = write_report(matched_rows, unmatched_rows_red, unmatched_rows_blue, output_excel_file,
+                                  candidate_rows)
+            stats.count('rows', sum(counts.values()) - counts['С расхождениями'])
+        return counts
+
+    except Exception as e:
+        logging.error(f"Неизвестная ошибка при сравнении данных: {e}")
+        raise
+
+
+def diff_data(data1: Any, data2: Any, engine: str = 'python',
+              sizing_tolerances: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Сравнивает данные паспорта и сайзинга и возвращает только различия в виде, пригодном для JSON:
+    совпадающие по имени серверы с расхождениями (с перечнем различающихся полей),
+    серверы, отсутствующие в паспорте, и серверы, отсутствующие в сайзинге.
+
+    :param data1: Данные паспорта (результат parse_html_to_json).
+    :param data2: Данные сайзинга (результат excel_to_json).
+    :param engine: Движок сравнения: 'python' или 'pandas'.
+    :param sizing_tolerances: Допустимая абсолютная разница по полям сайзинга или None.
+    :return: Словарь с ключами 'Итоги' (как у compare_data), 'С расхождениями',
+             'Отсутствуют в паспорте' и 'Отсутствуют в сайзинге'; значения полей - строки.
+    :raises ValueError: Если указан неизвестный движок сравнения или некорректные допуски.
+    """
+    try:
+        if engine not in COMPARE_ENGINES:
+            raise ValueError(f"Неизвестный движок сравнения: {engine}. Допустимые значения: {COMPARE_ENGINES}")
+        tolerance = sizing_tolerance_vector(sizing_tolerances)
+
+        with stage('compare'):
+            if engine == 'pandas':
+                matched_rows, unmatched_rows_red, unmatched_rows_blue = compare_frames(data1, data2, tolerance)
+            else:
+                matched_rows, unmatched_rows_red, unmatched_rows_blue = compare_dicts(data1, data2, tolerance)
+
+            matched_count = 0
+            mismatched: List[Dict[str, Any]] = []
+            for entry in matched_rows:
+                matched_count += 1
+                if entry['red_cells']:
+                    mismatched.append(dict(diff_values(entry), **{'Различия': entry['red_cells']}))
+            missing_in_passport = [diff_values(entry) for entry in unmatched_rows_red]
+            missing_in_sizing = [diff_values(entry) for entry in unmatched_rows_blue]
+
+        return {
+            'Итоги': {
+                'Совпадающие': matched_count,
+                'С расхождениями': len(mismatched),
+                'Отсутствуют в паспорте': len(missing_in_passport),
+                'Отсутствуют в сайзинге': len(missing_in_sizing)
+            },
+            'С расхождениями': mismatched,
+            'Отсутствуют в паспорте': missing_in_passport,
+            'Отсутствуют в сайзинге': missing_in_sizing
+        }
+
+    except Exception as e:
+        logging.error(f"Неизвестная ошибка при сравнении данных: {e}")
+        raise
+
+
+def diff_values(entry: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Приводит значения строки отчета к строкам (пустые значения и NaN - пустая строка).
+
+    :param entry: Строка отчета compare_dicts/compare_frames.
+    :return: Значения колонок REPORT_HEADERS.
+    """
+    data = entry['data']
+    return {header: value_text(data.get(header)) for header in REPORT_HEADERS}
+
+
+def compare_dicts(data1: Any, data2: Any, tolerance: Optional[Sequence[float]] = None) -> Tuple[Iterator[Dict[str, Any]], Iterator[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """
+    Сравнивает данные паспорта и сайзинга через словари с построчным обходом серверов.
+
+    :param data1: Данные паспорта.
+    :param data2: Данные сайзинга.
+    :param tolerance: Допуски по полям сайзинга (sizing_tolerance_vector) или None для точного совпадения.
+    :return: Генераторы строк отчета: совпадающие, отсутствующие в паспорте, отсутствующие в сайзинге.
+    """
+    if tolerance is None:
+        tolerance = sizing_tolerance_vector()
+
+    # Преобразуем данные в словари для быстрого доступа
+    dict1 = build_dict1(data1)
+    dict2 = build_dict2(data2)
+
+    # Получаем множество всех серверов
+    servers1 = set(dict1.keys())
+    servers2 = set(dict2.keys())
+    all_servers = servers1.union(servers2)
+    logging.info(f"Всего серверов в паспорте: {len(servers1)}")
+    logging.info(f"Всего серверов в сайзинге: {len(servers2)}")
+    logging.info(f"Общее количество уникальных серверов для сравнения: {len(all_servers)}")
+
+    servers = sorted(all_servers)
+
+    # Строки формируются лениво, по мере записи соответствующего раздела отчета
+    matched_rows = (compare_server(server, dict1[server], dict2[server], tolerance)
+                    for server in servers if server in dict1 and server in dict2)
+    unmatched_rows_red = (compare_server(server, None, dict2[server], tolerance)
+                          for server in servers if server not in dict1)
+    unmatched_rows_blue = (compare_server(server, dict1[server], None, tolerance)
+                           for server in servers if server not in dict2)
+    return matched_rows, unmatched_rows_red, unmatched_rows_blue
+
+
+def compare_server(server: str, item1: Optional[VmRecord], item2: Optional[VmRecord],
+                   tolerance: Sequence[float]) -> Dict[str, Any]:
+    """
+    Формирует строку отчета для одного сервера.
+
+    :param server: Нормализованное имя сервера.
+    :param item1: Запись сервера из паспорта или None.
+    :param item2: Запись сервера из сайзинга или None.
+    :param tolerance: Допуски по полям сайзинга (sizing_tolerance_vector).
+    :return: Строка отчета с ключами 'data', 'red_cells', 'blue_cells', 'full_row_color'.
+    """
+    row: Dict[str, Any] = {'Имя сервера': server}
+    red_cells: List[str] = []
+    blue_cells: List[str] = []
+    full_row_color: Optional[str] = None
+
+    # Добавляем данные из паспорта
+    if item1:
+        row['IP адрес в паспорте'] = item1.ip
+        row['Сайзинг в паспорте'] = item1.sizing
+        row['Источник в паспорте'] = f"Раздел: {item1.section}"
+    else:
+        row['IP адрес в паспорте'] = ''
+        row['Сайзинг в паспорте'] = ''
+        row['Источник в паспорте'] = ''
+
+    # Добавляем данные из сайзинга
+    if item2:
+        row['IP адрес в сайзинге'] = item2.ip
+        row['Сайзинг в сайзинге'] = item2.sizing
+        row['Источник в сайзинге'] = sizing_source(item2)
+    else:
+        row['IP адрес в сайзинге'] = ''
+        row['Сайзинг в сайзинге'] = ''
+        row['Источник в сайзинге'] = ''
+
+    # Логика подсветки: значения сравниваются в каноническом виде
+    if item1 and item2:
+        if ip_differs(row['IP адрес в паспорте'], row['IP адрес в сайзинге']):
+            red_cells.append('IP адрес в паспорте')
+
+        if sizing_differs(row['Сайзинг в паспорте'], row['Сайзинг в сайзинге'], tolerance):
+            red_cells.append('Сайзинг в паспорте')
+    elif not item1:
+        full_row_color = 'red'
+    else:
+        full_row_color = 'blue'
+
+    # Сообщение по каждому серверу формируется только при включенном уровне DEBUG
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        if not item1:
+            logging.debug(f"Сервер {server} отсутствует в паспорте")
+        elif not item2:
+            logging.debug(f"Сервер {server} отсутствует в сайзинге")
+        else:
+            logging.debug(
+                f"Сервер {server}: паспорт - IP адрес: {row['IP адрес в паспорте']}, "
+                f"Сайзинг: {row['Сайзинг в паспорте']}, {row['Источник в паспорте']}; "
+                f"сайзинг - IP адрес: {row['IP адрес в сайзинге']}, Сайзинг: {row['Сайзинг в сайзинге']}, "
+                f"{row['Источник в сайзинге']}; "
+                f"расхождения: {red_cells or 'нет'}"
+            )
+
+    return {
+        'data': row,
+        'red_cells': red_cells,
+        'blue_cells': blue_cells,
+        'full_row_color': full_row_color
+    }
+
+
+def build_frame1(data1: Any) -> 'pd.DataFrame':
+    """
+    Преобразует данные паспорта в DataFrame с колонками 'key', 'ip', 'sizing', 'source'.
+
+    Как и в build_dict1, при повторе имени сервера остается последняя запись.
+
+    :param data1: Данные паспорта.
+    :return: DataFrame с уникальными нормализованными именами серверов в колонке 'key'.
+    """
+    import pandas as pd
+
+    names: List[Any] = []
+    ips: List[Any] = []
+    sizings: List[Any] = []
+    sources: List[str] = []
+    for record in data1:
+        names.append(record.server_name)
+        ips.append(record.ip)
+        sizings.append(record.sizing)
+        sources.append(f"Раздел: {record.section}")
+
+    frame = pd.DataFrame({'key': names, 'ip': ips, 'sizing': sizings, 'source': sources}, dtype=object)
+    return normalize_frame_keys(frame)
+
+
+def build_frame2(data2: Any) -> 'pd.DataFrame':
+    """
+    Преобразует данные сайзинга в DataFrame с колонками 'key', 'ip', 'sizing', 'source'.
+
+    Повторы имен сервера разрешаются build_dict2, поэтому серверы с нескольких листов
+    сравниваются и подписываются так же, как в движке 'python'.
+
+    :param data2: Данные сайзинга (список или однократно читаемый генератор записей).
+    :return: DataFrame с уникальными нормализованными именами серверов в колонке 'key'.
+    """
+    import pandas as pd
+
+    names: List[Any] = []
+    ips: List[Any] = []
+    sizings: List[Any] = []
+    sources: List[str] = []
+    for record in build_dict2(data2).values():
+        names.append(record.server_name)
+        ips.append(record.ip)
+        sizings.append(record.sizing)
+        sources.append(sizing_source(record))
+
+    frame = pd.DataFrame({'key': names, 'ip': ips, 'sizing': sizings, 'source': sources}, dtype=object)
+    return normalize_frame_keys(frame)
+
+
+def normalize_frame_keys(frame: 'pd.DataFrame') -> 'pd.DataFrame':
+    """
+    Нормализует имена серверов (strip + lower), удаляет пустые и повторяющиеся (остается последнее).
+
+    :param frame: DataFrame с колонкой 'key'.
+    :return: DataFrame с нормализованной колонкой 'key'.
+    """
+    keys = frame['key']
+    # Нестроковые имена (например, числа из Excel) сравниваются как строки
+    frame['key'] = keys.where(keys.isna(), keys.astype(str)).str.strip().str.lower()
+    frame = frame[frame['key'].notna() & (frame['key'] != '')]
+    return frame.drop_duplicates(subset='key', keep='last')
+
+
+def compare_frames(data1: Any, data2: Any, tolerance: Optional[Sequence[float]] = None) -> Tuple[Iterator[Dict[str, Any]], Iterator[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """
+    Сравнивает данные паспорта и сайзинга внешним соединением DataFrame по имени сервера.
+
+    Расхождения IP-адресов и сайзинга вычисляются масками по колонкам целиком
+    (каждое уникальное значение разбирается один раз), результат совпадает с compare_dicts.
+
+    :param data1: Данные паспорта.
+    :param data2: Данные сайзинга.
+    :param tolerance: Допуски по полям сайзинга (sizing_tolerance_vector) или None для точного совпадения.
+    :return: Генераторы строк отчета: совпадающие, отсутствующие в паспорте, отсутствующие в сайзинге.
+    """
+    import numpy as np
+
+    if tolerance is None:
+        tolerance = sizing_tolerance_vector()
+
+    frame1 = build_frame1(data1)
+    frame2 = build_frame2(data2)
+
+    merged = frame1.merge(frame2, on='key', how='outer', suffixes=('_1', '_2'), indicator=True, sort=True)
+    logging.info(f"Всего серверов в паспорте: {len(frame1)}")
+    logging.info(f"Всего серверов в сайзинге: {len(frame2)}")
+    logging.info(f"Общее количество уникальных серверов для сравнения: {len(merged)}")
+
+    both = (merged['_merge'] == 'both').to_numpy()
+    only_sizing = (merged['_merge'] == 'right_only').to_numpy()
+
+    # Маски расхождений вычисляются только по серверам, найденным в обоих источниках
+    matched = merged[both]
+    ip_mismatch = np.zeros(len(merged), dtype=bool)
+    ip_mismatch[both] = ip_mismatch_mask(matched['ip_1'].tolist(), matched['ip_2'].tolist())
+    sizing_mismatch = np.zeros(len(merged), dtype=bool)
+    sizing_mismatch[both] = sizing_mismatch_mask(matched['sizing_1'].tolist(), matched['sizing_2'].tolist(), tolerance)
+
+    # Значения отсутствующей стороны выводятся пустыми строками
+    in_passport = merged['_merge'] != 'right_only'
+    in_sizing = merged['_merge'] != 'left_only'
+    columns = {
+        'Имя сервера': merged['key'],
+        'IP адрес в паспорте': merged['ip_1'].where(in_passport, ''),
+        'Сайзинг в паспорте': merged['sizing_1'].where(in_passport, ''),
+        'Источник в паспорте': merged['source_1'].where(in_passport, ''),
+        'IP адрес в сайзинге': merged['ip_2'].where(in_sizing, ''),
+        'Сайзинг в сайзинге': merged['sizing_2'].where(in_sizing, ''),
+        'Источник в сайзинге': merged['source_2'].where(in_sizing, '')
+    }
+    names = list(columns)
+    values = [column.tolist() for column in columns.values()]
+
+    def iter_rows(positions: 'np.ndarray', full_row_color: Optional[str]) -> Iterator[Dict[str, Any]]:
+        for idx in positions.tolist():
+            red_cells: List[str] = []
+            if full_row_color is None:
+                if ip_mismatch[idx]:
+                    red_cells.append('IP адрес в паспорте')
+                if sizing_mismatch[idx]:
+                    red_cells.append('Сайзинг в паспорте')
+            yield {
+                'data': {name: column[idx] for name, column in zip(names, values)},
+                'red_cells': red_cells,
+                'blue_cells': [],
+                'full_row_color': full_row_color
+            }
+
+    only_passport = ~(both | only_sizing)
+    return (iter_rows(np.flatnonzero(both), None),
+            iter_rows(np.flatnonzero(only_sizing), 'red'),
+            iter_rows(np.flatnonzero(only_passport), 'blue'))
+
+
+def collect_names(rows: Iterable[Dict[str, Any]], names: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Пропускает строки отчета без изменений, собирая имена серверов.
+
+    :param rows: Строки отчета.
+    :param names: Список, в который добавляются имена серверов.
+    :return: Те же строки отчета.
+    """
+    for entry in rows:
+        names.append(entry['data']['Имя сервера'])
+        yield entry
+
+
+def iter_candidate_rows(missing_in_sizing: List[str], missing_in_passport: List[str],
+                        min_score: float) -> Iterator[Dict[str, Any]]:
+    """
+    Формирует строки раздела возможных совпадений имен среди несопоставленных серверов.
+
+    Поиск выполняется при чтении первой строки, когда списки имен уже заполнены.
+
+    :param missing_in_sizing: Имена из паспорта, отсутствующие в сайзинге.
+    :param missing_in_passport: Имена из сайзинга, отсутствующие в паспорте.
+    :param min_score: Минимальная оценка сходства.
+    :return: Строки отчета с колонками CANDIDATE_HEADERS.
+    """
+    candidates = find_name_candidates(missing_in_sizing, missing_in_passport, min_score)
+    logging.info(f"Найдено возможных совпадений имен: {len(candidates)}")
+    for candidate in candidates:
+        yield {
+            'data': {
+                'Имя в паспорте': candidate.passport_name,
+                'Имя в сайзинге': candidate.sizing_name,
+                'Оценка сходства': candidate.score,
+                'Признак': candidate.reason
+            },
+            'red_cells': [],
+            'blue_cells': [],
+            'full_row_color': None
+        }
+
+
+def write_report(matched_rows: Iterable[Dict[str, Any]], unmatched_rows_red: Iterable[Dict[str, Any]],
+                 unmatched_rows_blue: Iterable[Dict[str, Any]], output_excel_file: str,
+                 candidate_rows: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Записывает результаты сравнения в Excel файл: сначала совпадающие серверы,
+    затем отсутствующие в паспорте (красным), затем отсутствующие в сайзинге (синим)
+    и, если задан, раздел возможных совпадений имен.
+
+    :param matched_rows: Серверы, присутствующие в обоих источниках.
+    :param unmatched_rows_red: Серверы, отсутствующие в паспорте.
+    :param unmatched_rows_blue: Серверы, отсутствующие в сайзинге.
+    :param output_excel_file: Путь к выходному Excel файлу.
+    :param candidate_rows: Возможные совпадения имен несопоставленных серверов или None.
+    :return: Итоги сравнения по разделам отчета.
+    """
+    sections = [
+        ReportSection("Совпадающие серверы", matched_rows),
+        ReportSection("Серверы отсутствующие в паспорте", unmatched_rows_red),
+        ReportSection("Серверы отсутствующие в сайзинге", unmatched_rows_blue)
+    ]
+    if candidate_rows is not None:
+        sections.append(ReportSection("Возможные совпадения имен", candidate_rows, CANDIDATE_HEADERS))
+
+    stats = write_report_sections(output_excel_file, REPORT_HEADERS, sections)
+    logging.info(f"\nРезультаты сравнения сохранены в файле {output_excel_file}")
+
+    counts = {
+        'Совпадающие': stats[0]['rows'],
+        'С расхождениями': stats[0]['highlighted'],
+        'Отсутствуют в паспорте': stats[1]['rows'],
+        'Отсутствуют в сайзинге': stats[2]['rows']
+    }
+    if candidate_rows is not None:
+        counts['Возможные совпадения имен'] = stats[3]['rows']
+    return counts
+
+
+def server_status(entry: Dict[str, Any]) -> str:
+    """
+    Определяет статус сервера по строке отчета compare_server.
+
+    :param entry: Строка отчета.
+    :return: Статус из run_snapshot.
+    """
+    if entry['full_row_color'] == 'red':
+        return STATUS_MISSING_IN_PASSPORT
+    if entry['full_row_color'] == 'blue':
+        return STATUS_MISSING_IN_SIZING
+    return STATUS_MISMATCH if entry['red_cells'] else STATUS_MATCHED
+
+
+def classify_change(previous: Optional[str], current: str, known: bool) -> Optional[str]:
+    """
+    Относит изменение данных сервера, присутствующего хотя бы в одном источнике, к разделу отчета
+    об изменениях. Серверы, исчезнувшие из обоих источников, относятся к разделу 'Исчезли' в compare_delta.
+
+    :param previous: Статус в предыдущем снимке или None, если сервера в нем не было.
+    :param current: Текущий статус.
+    :param known: Был ли сервер в предыдущем снимке.
+    :return: Раздел из DELTA_SECTIONS или None, если изменение не влияет на результат сверки.
+    """
+    if not known:
+        return 'Появились'
+    if current == STATUS_MISMATCH:
+        return 'Изменились расхождения' if previous == STATUS_MISMATCH else 'Новые расхождения'
+    if previous == STATUS_MISMATCH and current == STATUS_MATCHED:
+        return 'Исправлены'
+    if previous != current:
+        return 'Изменился статус'
+    return None
+
+
+def compare_delta(data1: Any, data2: Any, snapshot_file: str, output_excel_file: str,
+                  sizing_tolerances: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """
+    Сравнивает данные паспорта и сайзинга с предыдущим запуском и записывает отчет
+    только об изменениях: новые расхождения, исправленные, появившиеся и исчезнувшие серверы.
+
+    Снимок хранит для каждого сервера статус и отпечатки данных паспорта и сайзинга.
+    Сервер с неизменными отпечатками сохраняет статус из снимка без повторного сравнения,
+    поэтому разбор и сравнение значений выполняются только для изменившихся серверов.
+    После записи отчета снимок заменяется текущим. Без предыдущего снимка все серверы
+    попадают в раздел 'Появились'.
+
+    :param data1: Данные паспорта.
+    :param data2: Данные сайзинга.
+    :param snapshot_file: Путь к файлу снимка предыдущего запуска.
+    :param output_excel_file: Путь к выходному Excel файлу отчета об изменениях.
+    :param sizing_tolerances: Допустимая абсолютная разница по полям сайзинга или None.
+    :return: Количество серверов по разделам DELTA_SECTIONS.
+    :raises ValueError: Если указаны некорректные допуски.
+    """
+    try:
+        tolerance = sizing_tolerance_vector(sizing_tolerances)
+        previous = load_snapshot(snapshot_file, tolerance)
+        if previous is None:
+            logging.info(f"Предыдущий снимок {snapshot_file} не найден, все серверы считаются новыми")
+            previous = {}
+
+        with stage('compare') as stats:
+            dict1 = build_dict1(data1)
+            dict2 = build_dict2(data2)
+            current: Dict[str, ServerState] = {}
+            changed: List[Tuple[str, Optional[str], str, Dict[str, Any]]] = []
+
+            for server in dict1.keys() | dict2.keys():
+                item1, item2 = dict1.get(server), dict2.get(server)
+                digest1, digest2 = server_digest(item1), server_digest(item2)
+                state = previous.get(server)
+                if state is not None and state[1:] == (digest1, digest2):
+                    current[server] = state
+                    continue
+
+                entry = compare_server(server, item1, item2, tolerance)
+                status = server_status(entry)
+                current[server] = (status, digest1, digest2)
+                section = classify_change(state[0] if state else None, status, state is not None)
+                if section:
+                    changed.append((server, state[0] if state else None, section, entry))
+            stats.count('rows', len(changed))
+
+            for server in previous.keys() - current.keys():
+                entry = {'data': {'Имя сервера': server}, 'red_cells': [], 'blue_cells': [], 'full_row_color': None}
+                changed.append((server, previous[server][0], 'Исчезли', entry))
+
+        rows: Dict[str, List[Dict[str, Any]]] = {section: [] for section in DELTA_SECTIONS}
+        for server, previous_status, section, entry in sorted(changed, key=lambda change: change[0]):
+            entry['data']['Было'] = STATUS_LABELS[previous_status]
+            entry['data']['Стало'] = STATUS_LABELS[current.get(server, (None,))[0]]
+            rows[section].append(entry)
+
+        with stage('report_write'):
+            write_report_sections(output_excel_file, DELTA_HEADERS,
+                                  [ReportSection(section, section_rows) for section, section_rows in rows.items()])
+        logging.info(f"Отчет об изменениях с прошлого запуска сохранен в файле {output_excel_file}")
+        save_snapshot(snapshot_file, current, tolerance)
+
+        counts = {section: len(section_rows) for section, section_rows in rows.items()}
+        logging.info(f"Изменения с прошлого запуска: {counts}")
+        return counts
+
+    except Exception as e:
+        logging.error(f"Неизвестная ошибка при построении отчета об изменениях: {e}")
+        raise
@@ -0,0 +1,202 @@
+# compare_sources.py
+
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from canonical import ip_differs, sizing_differs, sizing_tolerance_vector
+from compare_json import iter_servers, load_passport_data, load_sizing_data
+from instrumentation import stage
+from report_writer import ReportSection, write_report_sections
+from vm_record import VmRecord
+
+# Виды источников сверки
+SOURCE_KINDS = ('passport', 'sizing')
+
+
+class Source(NamedTuple):
+    """
+    Источник многосторонней сверки: подпись для колонок отчета и серверы источника.
+
+    servers - пары (имя сервера в нижнем регистре, запись ВМ), например результат iter_servers.
+    """
+    name: str
+    servers: Iterable[Tuple[str, VmRecord]]
+
+
+def source_from_file(name: str, kind: str, json_file: str) -> Source:
+    """
+    Создает источник из промежуточного файла паспорта или сайзинга; файл читается при обходе серверов.
+
+    :param name: Подпись источника в отчете.
+    :param kind: Вид источника: 'passport' или 'sizing'.
+    :param json_file: Путь к JSON- или NDJSON-файлу.
+    :return: Источник сверки.
+    :raises ValueError: Если указан неизвестный вид источника.
+    """
+    if kind == 'passport':
+        return Source(name, iter_servers(load_passport_data(json_file)))
+    if kind == 'sizing':
+        return Source(name, iter_servers(load_sizing_data(json_file)))
+    raise ValueError(f"Неизвестный вид источника: {kind}. Допустимые значения: {SOURCE_KINDS}")
+
+
+def source_names(files: Sequence[str]) -> List[str]:
+    """
+    Подбирает подписи источников по именам файлов; одинаковые имена файлов дополняются номером.
+
+    :param files: Пути к файлам источников в порядке сверки.
+    :return: Подписи источников.
+    """
+    names = [os.path.basename(file) for file in files]
+    return [f"{name} ({idx})" if names.count(name) > 1 else name for idx, name in enumerate(names, start=1)]
+
+
+def source_headers(names: Sequence[str]) -> List[str]:
+    """
+    Формирует колонки отчета многосторонней сверки.
+
+    :param names: Подписи источников.
+    :return: Имя сервера, покрытие и пары колонок IP адреса и сайзинга по каждому источнику.
+    """
+    headers = ['Имя сервера', 'Источников', 'Нет в источниках']
+    for name in names:
+        headers.extend([f"IP адрес: {name}", f"Сайзинг: {name}"])
+    return headers
+
+
+def build_source_index(sources: Sequence[Source]) -> Dict[str, List[Optional[VmRecord]]]:
+    """
+    Строит общий индекс серверов всех источников за один проход по их записям.
+
+    :param sources: Источники сверки.
+    :return: Имя сервера -> записи сервера по позициям источников (None - сервера нет в источнике).
+             При повторе имени внутри источника используется последняя запись, как в build_dict1/build_dict2.
+    """
+    index: Dict[str, List[Optional[VmRecord]]] = {}
+    total = len(sources)
+    for position, source in enumerate(sources):
+        records = 0
+        for server, item in source.servers:
+            items = index.get(server)
+            if items is None:
+                items = index[server] = [None] * total
+            items[position] = item
+            records += 1
+        logging.info(f"Записей серверов в источнике {source.name}: {records}")
+    logging.info(f"Общее количество уникальных серверов для сравнения: {len(index)}")
+    return index
+
+
+def compare_source_server(server: str, items: List[Optional[VmRecord]], names: Sequence[str],
+                          headers: Sequence[str], tolerance: Sequence[float]) -> Dict[str, Any]:
+    """
+    Формирует строку отчета многосторонней сверки для одного сервера.
+
+    Значения сравниваются в каноническом виде со значениями первого источника, содержащего сервер.
+    Если хотя бы один источник расходится с ним, красным подсвечиваются значения первого источника
+    и всех расходящихся.
+
+    :param server: Нормализованное имя сервера.
+    :param items: Записи сервера по позициям источников.
+    :param names: Подписи источников.
+    :param headers: Колонки отчета (source_headers).
+    :param tolerance: Допуски по полям сайзинга (sizing_tolerance_vector).
+    :return: Строка отчета с ключами 'data', 'red_cells', 'blue_cells', 'full_row_color'.
+    """
+    present = [position for position, item in enumerate(items) if item is not None]
+    row: Dict[str, Any] = {
+        'Имя сервера': server,
+        'Источников': len(present),
+        'Нет в источниках': ', '.join(name for name, item in zip(names, items) if item is None)
+    }
+    for position in present:
+        row[headers[3 + 2 * position]] = items[position].ip
+        row[headers[4 + 2 * position]] = items[position].sizing
+
+    red_cells: List[str] = []
+    reference = items[present[0]]
+    ip_differing = [position for position in present[1:] if ip_differs(reference.ip, items[position].ip)]
+    sizing_differing = [position for position in present[1:]
+                        if sizing_differs(reference.sizing, items[position].sizing, tolerance)]
+    if ip_differing:
+        red_cells.extend(headers[3 + 2 * position] for position in [present[0]] + ip_differing)
+    if sizing_differing:
+        red_cells.extend(headers[4 + 2 * position] for position in [present[0]] + sizing_differing)
+
+    return {
+        'data': row,
+        'red_cells': red_cells,
+        'blue_cells': [],
+        'full_row_color': None
+    }
+
+
+def compare_sources(sources: Sequence[Source], output_excel_file: str,
+                    sizing_tolerances: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """
+    Многосторонняя сверка нескольких паспортов и сайзингов: серверы всех источников собираются
+    в один индекс за один проход, поэтому время растет с общим числом записей, а не с числом пар источников.
+    Отчет содержит для каждого сервера источники, в которых он есть, и подсвечивает расходящиеся
+    IP адреса и сайзинг: сначала серверы, присутствующие во всех источниках, затем остальные.
+
+    :param sources: Источники в порядке колонок отчета.
+    :param output_excel_file: Путь к выходному Excel файлу.
+    :param sizing_tolerances: Допустимая абсолютная разница по полям сайзинга или None.
+    :return: Количество серверов во всех источниках, не во всех источниках и серверов с расхождениями.
+    :raises ValueError: Если задано меньше двух источников или некорректные допуски.
+    """
+    try:
+        if len(sources) < 2:
+            raise ValueError(f"Для сверки нужно не меньше двух источников, задано: {len(sources)}")
+        tolerance = sizing_tolerance_vector(sizing_tolerances)
+        names = [source.name for source in sources]
+        headers = source_headers(names)
+
+        with stage('compare') as stats:
+            index = build_source_index(sources)
+            servers = sorted(index)
+            stats.count('rows', len(servers))
+
+        def iter_rows(complete: bool) -> Iterator[Dict[str, Any]]:
+            for server in servers:
+                items = index[server]
+                if (None not in items) == complete:
+                    yield compare_source_server(server, items, names, headers, tolerance)
+
+        # Строки формируются лениво, поэтому их сравнение входит в этап записи отчета
+        with stage('report_write'):
+            section_stats = write_report_sections(output_excel_file, headers, [
+                ReportSection("Серверы во всех источниках", iter_rows(True)),
+                ReportSection("Серверы не во всех источниках", iter_rows(False))
+            ])
+        logging.info(f"Результаты многосторонней сверки сохранены в файле {output_excel_file}")
+
+        counts = {
+            'Во всех источниках': section_stats[0]['rows'],
+            'С расхождениями': section_stats[0]['highlighted'] + section_stats[1]['highlighted'],
+            'Не во всех источниках': section_stats[1]['rows']
+        }
+        logging.info(f"Итоги многосторонней сверки: {counts}")
+        return counts
+
+    except Exception as e:
+        logging.error(f"Неизвестная ошибка при многосторонней сверке: {e}")
+        raise
+
+
+def compare_source_files(passport_files: Sequence[str], sizing_files: Sequence[str], output_excel_file: str,
+                         sizing_tolerances: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """
+    Многосторонняя сверка промежуточных файлов паспортов и сайзингов. Подписи источников -
+    имена файлов; паспорта идут в отчете перед сайзингами.
+
+    :param passport_files: Пути к JSON- или NDJSON-файлам паспортов.
+    :param sizing_files: Пути к JSON- или NDJSON-файлам сайзингов.
+    :param output_excel_file: Путь к выходному Excel файлу.
+    :param sizing_tolerances: Допустимая абсолютная разница по полям сайзинга или None.
+    :return: Итоги сверки (compare_sources).
+    """
+    files = list(passport_files) + list(sizing_files)
+    kinds = ['passport'] * len(passport_files) + ['sizing'] * len(sizing_files)
+    sources = [source_from_file(name, kind, file) for name, kind, file in zip(source_names(files), kinds, files)]
+    return compare_sources(sources, output_excel_file, sizing_tolerances)
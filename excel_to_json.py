@@ -2,47 +2,74 @@
 
 import json
 import logging
-from typing import List, Dict, Any
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import pandas as pd
+from openpyxl import load_workbook
+from instrumentation import stage
+from ndjson_io import is_ndjson, write_records
+from sizing_cache import load_with_cache
+from vm_record import VmRecord
 
 logger = logging.getLogger(__name__)
 
+# Доступные движки чтения Excel
+EXCEL_ENGINES = ('pandas', 'openpyxl')
 
-def excel_to_json(excel_file: str, json_file: str) -> None:
+# Требуемые колонки листа сайзинга и их имена в результирующих записях
+REQUIRED_COLUMNS = {
+    'Имя сервера': 'Имя сервера',
+    'Сайзинг\ncpu/ram/hdd sys/hdd app': 'Сайзинг',
+    'IP адрес': 'IP адрес'
+}
+
+# Сколько первых строк листа просматривается в поиске строки заголовков
+HEADER_SEARCH_ROWS = 20
+
+# Лист сайзинга, читаемый в режиме одного листа
+SIZING_SHEET = 'Support'
+
+
+def excel_to_json(excel_file: str, json_file: Optional[str] = None, engine: str = 'pandas',
+                  cache_dir: Optional[str] = None, all_sheets: bool = False,
+                  workers: Optional[int] = None) -> List[VmRecord]:
     """
-    Преобразует данные из Excel-файла в JSON-файл.
+    Извлекает данные из Excel-файла; при указании json_file сохраняет их в JSON-файл.
+
+    По умолчанию читается лист 'Support'. В режиме all_sheets читаются все листы с требуемыми
+    колонками (например, Prod, Test и DR) параллельно в пуле процессов, а каждая запись
+    помечается названием своего листа (поле 'Лист' промежуточного файла).
 
     :param excel_file: Путь к исходному Excel-файлу.
-    :param json_file: Путь к выходному JSON-файлу.
+    :param json_file: Путь к выходному JSON-файлу или None, если сохранять файл не нужно.
+    :param engine: Движок чтения: 'pandas' (по умолчанию) или 'openpyxl'
+                   (потоковое чтение только требуемых колонок).
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None, чтобы не использовать кэш.
+    :param all_sheets: Читать все листы с требуемыми колонками вместо листа 'Support'.
+    :param workers: Количество процессов для чтения листов; по умолчанию - не больше числа ядер.
+    :return: Записи сайзинга (с листом в режиме all_sheets).
     :raises FileNotFoundError: Если Excel-файл не найден.
-    :raises ValueError: Если отсутствуют требуемые колонки.
+    :raises ValueError: Если отсутствуют требуемые колонки (листы) или указан неизвестный движок.
     :raises Exception: Для остальных ошибок при обработке файла.
     """
     try:
-        logger.info(f"Чтение Excel-файла: {excel_file}")
-        df = load_excel(excel_file, sheet_name='Support')
+        if engine not in EXCEL_ENGINES:
+            raise ValueError(f"Неизвестный движок чтения Excel: {engine}. Допустимые значения: {EXCEL_ENGINES}")
 
-        logger.debug("Убираем лишние пробелы в названиях колонок")
-        df.columns = [col.strip() for col in df.columns]
+        with stage('excel_load') as stats:
+            if all_sheets:
+                data = load_all_sheets(excel_file, engine, cache_dir, workers)
+            else:
+                data = load_sheet(excel_file, SIZING_SHEET, engine, cache_dir)
+            stats.count('rows', len(data))
 
-        logger.info("Проверка наличия необходимых колонок")
-        required_columns = ['Имя сервера', 'Сайзинг\ncpu/ram/hdd sys/hdd app', 'IP адрес']
-        check_required_columns(df, required_columns)
+        if json_file:
+            logger.info(f"Сохранение данных в JSON-файл: {json_file}")
+            save_json(data, json_file)
 
-        logger.debug("Переименование колонок для удобства")
-        df = rename_columns(df)
-
-        logger.debug("Отбор необходимых колонок")
-        df = select_columns(df)
-
-        logger.info("Удаление записей с отсутствующими именами серверов")
-        df = drop_missing_server_names(df)
-
-        logger.info("Преобразование DataFrame в список словарей")
-        data = df.to_dict(orient='records')
-
-        logger.info(f"Сохранение данных в JSON-файл: {json_file}")
-        save_json(data, json_file)
+        return data
 
     except FileNotFoundError as fnfe:
         logger.error(f"Excel-файл не найден: {fnfe}")
@@ -55,6 +82,140 @@ def excel_to_json(excel_file: str, json_file: str) -> None:
         raise
 
 
+def load_sheet(excel_file: str, sheet_name: str, engine: str = 'pandas',
+               cache_dir: Optional[str] = None) -> List[VmRecord]:
+    """
+    Загружает записи одного листа выбранным движком, используя кэш при его наличии.
+
+    :param excel_file: Путь к Excel-файлу.
+    :param sheet_name: Название листа.
+    :param engine: Движок чтения: 'pandas' или 'openpyxl'.
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :return: Записи сайзинга.
+    """
+    def load() -> List[VmRecord]:
+        logger.info(f"Чтение листа '{sheet_name}' Excel-файла: {excel_file}")
+        if engine == 'openpyxl':
+            return list(iter_excel_records(excel_file, sheet_name=sheet_name))
+        return load_excel_records(excel_file, sheet_name=sheet_name)
+
+    if cache_dir:
+        return load_with_cache(excel_file, sheet_name, list(REQUIRED_COLUMNS), engine, load, cache_dir)
+    return load()
+
+
+def find_matching_sheets(excel_file: str, engine: str = 'pandas') -> List[str]:
+    """
+    Находит листы, содержащие все требуемые колонки.
+
+    Просматриваются только первые HEADER_SEARCH_ROWS строк каждого листа в режиме read_only.
+    Движок 'pandas' читает заголовки из первой строки, поэтому для него подходят только такие листы.
+
+    :param excel_file: Путь к Excel-файлу.
+    :param engine: Движок чтения, которым будут загружаться листы.
+    :return: Названия подходящих листов в порядке следования в книге.
+    :raises FileNotFoundError: Если файл не найден.
+    """
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        sheets: List[str] = []
+        for ws in wb.worksheets:
+            try:
+                header_row, _ = find_header_row(
+                    ws.iter_rows(max_row=HEADER_SEARCH_ROWS, values_only=True), list(REQUIRED_COLUMNS)
+                )
+            except ValueError:
+                logger.debug(f"Лист '{ws.title}' не содержит требуемых колонок")
+                continue
+            if engine == 'pandas' and header_row != 1:
+                logger.warning(f"Лист '{ws.title}' пропущен: заголовки не в первой строке (используйте движок 'openpyxl')")
+                continue
+            sheets.append(ws.title)
+        return sheets
+    finally:
+        wb.close()
+
+
+def load_all_sheets(excel_file: str, engine: str = 'pandas', cache_dir: Optional[str] = None,
+                    workers: Optional[int] = None) -> List[VmRecord]:
+    """
+    Загружает все листы с требуемыми колонками, используя кэш при его наличии.
+
+    Записи всех листов хранятся в кэше одной записью с ключом по хэшу содержимого файла,
+    поэтому при попадании в кэш книга не открывается.
+
+    :param excel_file: Путь к Excel-файлу.
+    :param engine: Движок чтения: 'pandas' или 'openpyxl'.
+    :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :param workers: Количество процессов; по умолчанию - не больше числа ядер.
+    :return: Записи всех листов в порядке листов книги, с названием листа.
+    :raises ValueError: Если ни один лист не содержит требуемых колонок.
+    """
+    def load() -> List[VmRecord]:
+        return read_all_sheets(excel_file, engine, workers)
+
+    if cache_dir:
+        return load_with_cache(excel_file, None, list(REQUIRED_COLUMNS), engine, load, cache_dir)
+    return load()
+
+
+def read_all_sheets(excel_file: str, engine: str = 'pandas', workers: Optional[int] = None) -> List[VmRecord]:
+    """
+    Параллельно читает все листы с требуемыми колонками и помечает записи названием листа.
+
+    :param excel_file: Путь к Excel-файлу.
+    :param engine: Движок чтения: 'pandas' или 'openpyxl'.
+    :param workers: Количество процессов; по умолчанию - не больше числа ядер.
+    :return: Записи всех листов в порядке листов книги, с названием листа.
+    :raises ValueError: Если ни один лист не содержит требуемых колонок.
+    """
+    sheets = find_matching_sheets(excel_file, engine)
+    if not sheets:
+        raise ValueError(f"В Excel-файле {excel_file} нет листов с колонками: {list(REQUIRED_COLUMNS)}")
+    logger.info(f"Листы сайзинга: {sheets}")
+
+    workers = min(workers or os.cpu_count() or 1, len(sheets))
+    if workers == 1:
+        sheet_records = [load_sheet(excel_file, sheet, engine) for sheet in sheets]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            count = len(sheets)
+            sheet_records = list(executor.map(load_sheet, [excel_file] * count, sheets, [engine] * count))
+
+    data: List[VmRecord] = []
+    for sheet, records in zip(sheets, sheet_records):
+        logger.info(f"Лист '{sheet}': записей {len(records)}")
+        for record in records:
+            record.sheet = sheet
+            data.append(record)
+    return data
+
+
+def load_excel_records(file_path: str, sheet_name: str = 'Support') -> List[VmRecord]:
+    """
+    Загружает требуемые колонки листа через pandas.
+
+    :param file_path: Путь к Excel-файлу.
+    :param sheet_name: Название листа для чтения.
+    :return: Записи сайзинга.
+    :raises ValueError: Если отсутствуют требуемые колонки.
+    """
+    df = load_excel(file_path, sheet_name=sheet_name)
+
+    logger.info("Проверка наличия и отбор необходимых колонок")
+    df = select_required_columns(df)
+
+    logger.debug("Переименование колонок для удобства")
+    df = rename_columns(df)
+
+    logger.info("Удаление записей с отсутствующими именами серверов")
+    df = drop_missing_server_names(df)
+
+    logger.info("Преобразование DataFrame в записи сайзинга")
+    return [VmRecord(server_name, ip, sizing) for server_name, ip, sizing
+            in zip(df['Имя сервера'].tolist(), df['IP адрес'].tolist(), df['Сайзинг'].tolist())]
+
+
 def load_excel(file_path: str, sheet_name: str = 'Support') -> pd.DataFrame:
     """
     Загружает данные из Excel-файла.
@@ -75,18 +236,22 @@ def load_excel(file_path: str, sheet_name: str = 'Support') -> pd.DataFrame:
         raise
 
 
-def check_required_columns(df: pd.DataFrame, required_columns: List[str]) -> None:
+def select_required_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Проверяет наличие необходимых колонок в DataFrame.
+    Отбирает требуемые колонки DataFrame и приводит их названия к ключам REQUIRED_COLUMNS.
+
+    Колонки ищутся так же, как в движке 'openpyxl' (find_header_row): без учета регистра
+    и лишних пробелов, при повторе названия берется первая колонка.
 
-    :param df: DataFrame для проверки.
-    :param required_columns: Список требуемых колонок.
+    :param df: Исходный DataFrame.
+    :return: DataFrame из требуемых колонок в порядке REQUIRED_COLUMNS.
     :raises ValueError: Если отсутствуют необходимые колонки.
     """
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        raise ValueError(f"Отсутствуют следующие колонки в Excel-файле: {missing_columns}")
+    _, indices = find_header_row([tuple(df.columns)], list(REQUIRED_COLUMNS))
     logger.debug("Все необходимые колонки присутствуют")
+    df = df.iloc[:, [indices[column] for column in REQUIRED_COLUMNS]]
+    df.columns = list(REQUIRED_COLUMNS)
+    return df
 
 
 def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -96,44 +261,121 @@ def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
     :param df: Исходный DataFrame.
     :return: DataFrame с переименованными колонками.
     """
-    return df.rename(columns={
-        'Имя сервера': 'Имя сервера',
-        'Сайзинг\ncpu/ram/hdd sys/hdd app': 'Сайзинг',
-        'IP адрес': 'IP адрес'
-    })
+    return df.rename(columns=REQUIRED_COLUMNS)
 
 
-def select_columns(df: pd.DataFrame) -> pd.DataFrame:
+def drop_missing_server_names(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Отбирает необходимые колонки из DataFrame.
+    Удаляет записи с отсутствующими именами серверов.
 
     :param df: Исходный DataFrame.
-    :return: DataFrame с выбранными колонками.
+    :return: DataFrame без записей с отсутствующими именами серверов.
     """
-    return df[['Имя сервера', 'Сайзинг', 'IP адрес']]
+    return df.dropna(subset=['Имя сервера'])
 
 
-def drop_missing_server_names(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_column_name(name: Any) -> str:
     """
-    Удаляет записи с отсутствующими именами серверов.
+    Нормализует название колонки для сравнения: схлопывает пробелы и переводы строк, приводит к нижнему регистру.
 
-    :param df: Исходный DataFrame.
-    :return: DataFrame без записей с отсутствующими именами серверов.
+    :param name: Значение ячейки заголовка.
+    :return: Нормализованное название колонки.
     """
-    return df.dropna(subset=['Имя сервера'])
+    if name is None:
+        return ''
+    return ' '.join(str(name).split()).lower()
+
+
+def find_header_row(rows: Iterator[Tuple[Any, ...]], required_columns: List[str]) -> Tuple[int, Dict[str, int]]:
+    """
+    Находит строку заголовков, содержащую все требуемые колонки.
+
+    :param rows: Первые строки листа (значения ячеек).
+    :param required_columns: Названия требуемых колонок.
+    :return: Номер строки заголовков (с 1) и индексы требуемых колонок (с 0).
+    :raises ValueError: Если ни одна строка не содержит все требуемые колонки.
+    """
+    wanted = {normalize_column_name(col): col for col in required_columns}
+    best_missing: List[str] = list(required_columns)
 
+    for row_number, row in enumerate(rows, start=1):
+        indices: Dict[str, int] = {}
+        for idx, value in enumerate(row):
+            column = wanted.get(normalize_column_name(value))
+            if column is not None and column not in indices:
+                indices[column] = idx
+        missing = [col for col in required_columns if col not in indices]
+        if not missing:
+            return row_number, indices
+        if len(missing) < len(best_missing):
+            best_missing = missing
 
-def save_json(data: List[Dict[str, Any]], json_file: str) -> None:
+    raise ValueError(f"Отсутствуют следующие колонки в Excel-файле: {best_missing}")
+
+
+def iter_excel_records(file_path: str, sheet_name: str = 'Support') -> Iterator[VmRecord]:
     """
-    Сохраняет данные в формате JSON в файл.
+    Потоково читает требуемые колонки листа через openpyxl в режиме read_only.
+
+    Строка заголовков ищется один раз среди первых HEADER_SEARCH_ROWS строк, после чего
+    читаются только колонки в диапазоне требуемых. Пустые ячейки возвращаются как NaN,
+    как в движке 'pandas'; строки без имени сервера пропускаются.
 
-    :param data: Данные для сохранения.
-    :param json_file: Путь к выходному JSON-файлу.
+    Диапазон min_col..max_col читается одним проходом, а не три отдельные колонки: в режиме
+    read_only openpyxl все равно разбирает XML каждой строки целиком и лишь затем отбрасывает
+    колонки вне диапазона, поэтому чтение колонок по отдельности означало бы три прохода по листу.
+    Промежуточные колонки стоят только элементов кортежа строки.
+
+    :param file_path: Путь к Excel-файлу.
+    :param sheet_name: Название листа для чтения.
+    :return: Итератор записей сайзинга.
+    :raises FileNotFoundError: Если файл не найден.
+    :raises ValueError: Если лист или требуемые колонки отсутствуют.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise ValueError(f"Лист '{sheet_name}' не найден в Excel-файле {file_path}")
+        ws = wb[sheet_name]
+
+        header_row, indices = find_header_row(
+            ws.iter_rows(max_row=HEADER_SEARCH_ROWS, values_only=True), list(REQUIRED_COLUMNS)
+        )
+        logger.debug(f"Строка заголовков: {header_row}, колонки: {indices}")
+
+        # Чтение только диапазона колонок, в котором лежат требуемые (одним проходом по листу)
+        min_col = min(indices.values())
+        max_col = max(indices.values())
+        offsets = {REQUIRED_COLUMNS[source]: indices[source] - min_col for source in REQUIRED_COLUMNS}
+        name_offset = offsets['Имя сервера']
+
+        def cell(row: Tuple[Any, ...], field: str) -> Any:
+            offset = offsets[field]
+            return row[offset] if offset < len(row) and row[offset] is not None else math.nan
+
+        for row in ws.iter_rows(min_row=header_row + 1, min_col=min_col + 1, max_col=max_col + 1, values_only=True):
+            if name_offset >= len(row) or row[name_offset] is None:
+                continue
+            yield VmRecord(row[name_offset], cell(row, 'IP адрес'), cell(row, 'Сайзинг'))
+    finally:
+        wb.close()
+
+
+def save_json(data: List[VmRecord], json_file: str) -> None:
+    """
+    Сохраняет записи сайзинга в формате JSON в файл; файлы .ndjson/.jsonl пишутся по одной записи на строку.
+
+    :param data: Записи сайзинга.
+    :param json_file: Путь к выходному JSON- или NDJSON-файлу.
     :raises Exception: Если не удалось сохранить файл.
     """
+    if is_ndjson(json_file):
+        write_records((record.to_sizing_dict() for record in data), json_file)
+        return
+
     try:
         with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+            json.dump([record.to_sizing_dict() for record in data], f, ensure_ascii=False, indent=4)
         logger.info(f"Данные успешно сохранены в файле {json_file}")
     except Exception as e:
         logger.error(f"Не удалось сохранить JSON-файл {json_file}: {e}")
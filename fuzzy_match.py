@@ -0,0 +1,165 @@
+# fuzzy_match.py
+
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+# Длина n-грамм индекса
+NGRAM_SIZE = 3
+
+# Символ дополнения краев имени, чтобы начало и конец имени давали собственные n-граммы
+NGRAM_PAD = '\x00'
+
+# Минимальная оценка сходства кандидата по умолчанию (1.0 - точное совпадение)
+DEFAULT_MIN_SCORE = 0.8
+
+# Максимальное количество кандидатов на одно имя по умолчанию
+DEFAULT_MAX_CANDIDATES = 3
+
+
+class NameCandidate(NamedTuple):
+    """
+    Кандидат на совпадение имен серверов, не сопоставленных точным сравнением.
+    """
+    passport_name: str
+    sizing_name: str
+    score: float
+    reason: str
+
+
+def short_name(name: str) -> str:
+    """
+    Возвращает короткое имя хоста: первую метку FQDN.
+
+    :param name: Нормализованное имя сервера.
+    :return: Имя до первой точки.
+    """
+    return name.split('.', 1)[0]
+
+
+def ngram_counts(text: str, size: int = NGRAM_SIZE) -> Counter:
+    """
+    Раскладывает строку на n-граммы с дополненными краями.
+
+    :param text: Строка.
+    :param size: Длина n-граммы.
+    :return: Количество вхождений каждой n-граммы (len(text) + size - 1 n-грамм).
+    """
+    padded = NGRAM_PAD * (size - 1) + text + NGRAM_PAD * (size - 1)
+    return Counter(padded[idx:idx + size] for idx in range(len(padded) - size + 1))
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """
+    Расстояние Левенштейна с ранним выходом.
+
+    :param first: Первая строка.
+    :param second: Вторая строка.
+    :param limit: Порог: если расстояние заведомо больше, возвращается limit + 1.
+    :return: Расстояние или limit + 1.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, char1 in enumerate(first, start=1):
+        current = [row]
+        for col, char2 in enumerate(second, start=1):
+            current.append(min(previous[col] + 1, current[col - 1] + 1, previous[col - 1] + (char1 != char2)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Инвертированный индекс n-грамм коротких имен серверов.
+
+    Кандидаты отбираются по числу общих n-грамм (с учетом повторов): при расстоянии
+    Левенштейна k у строк остается не меньше max(|G1|, |G2|) - k * n общих n-грамм,
+    поэтому точное расстояние вычисляется только для прошедших этот фильтр имен.
+    Имена без общих n-грамм не рассматриваются, поэтому поиск полон при min_score > 2/3.
+    """
+
+    def __init__(self, names: Sequence[str]) -> None:
+        """
+        :param names: Нормализованные имена серверов.
+        """
+        self.names = list(names)
+        # Короткое имя -> индексы полных имен
+        self.by_short: Dict[str, List[int]] = defaultdict(list)
+        for idx, name in enumerate(self.names):
+            self.by_short[short_name(name)].append(idx)
+        self.shorts = list(self.by_short)
+        # n-грамма -> (индекс короткого имени, количество вхождений)
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for short_idx, short in enumerate(self.shorts):
+            for gram, count in ngram_counts(short).items():
+                self.postings[gram].append((short_idx, count))
+
+    def search(self, name: str, min_score: float = DEFAULT_MIN_SCORE,
+               max_candidates: int = DEFAULT_MAX_CANDIDATES) -> List[Tuple[str, float, str]]:
+        """
+        Ищет имена, похожие на заданное.
+
+        :param name: Нормализованное имя сервера.
+        :param min_score: Минимальная оценка сходства коротких имен (1 - расстояние / длина).
+        :param max_candidates: Максимальное количество кандидатов.
+        :return: Кандидаты (имя, оценка, признак) по убыванию оценки.
+        """
+        query = short_name(name)
+        query_grams = ngram_counts(query)
+        query_size = len(query) + NGRAM_SIZE - 1
+
+        shared: Dict[int, int] = defaultdict(int)
+        for gram, count in query_grams.items():
+            for short_idx, posting_count in self.postings.get(gram, ()):
+                shared[short_idx] += min(count, posting_count)
+
+        found: List[Tuple[str, float, str]] = []
+        for short_idx, common in shared.items():
+            short = self.shorts[short_idx]
+            longest = max(len(query), len(short))
+            # Допуск на погрешность округления, чтобы оценка, равная min_score, проходила порог
+            limit = int((1 - min_score) * longest + 1e-9)
+            # Фильтр по общим n-граммам
+            if common < max(query_size, len(short) + NGRAM_SIZE - 1) - limit * NGRAM_SIZE:
+                continue
+            distance = edit_distance(query, short, limit)
+            if distance > limit:
+                continue
+            score = round(1 - distance / longest, 3) if longest else 1.0
+            for idx in self.by_short[short]:
+                candidate = self.names[idx]
+                if candidate == name:
+                    continue
+                reason = 'Совпадает короткое имя' if distance == 0 else f'Расстояние правки: {distance}'
+                found.append((candidate, score, reason))
+
+        found.sort(key=lambda item: (-item[1], item[0]))
+        return found[:max_candidates]
+
+
+def find_name_candidates(missing_in_sizing: Sequence[str], missing_in_passport: Sequence[str],
+                         min_score: float = DEFAULT_MIN_SCORE,
+                         max_candidates: int = DEFAULT_MAX_CANDIDATES) -> List[NameCandidate]:
+    """
+    Подбирает пары похожих имен среди серверов, не сопоставленных точным сравнением.
+
+    Сравниваются только несопоставленные остатки: имена из паспорта ищутся
+    в индексе имен из сайзинга, а не перебором всех пар.
+
+    :param missing_in_sizing: Имена из паспорта, отсутствующие в сайзинге.
+    :param missing_in_passport: Имена из сайзинга, отсутствующие в паспорте.
+    :param min_score: Минимальная оценка сходства.
+    :param max_candidates: Максимальное количество кандидатов на одно имя из паспорта.
+    :return: Кандидаты в порядке имен из паспорта.
+    """
+    if not missing_in_sizing or not missing_in_passport:
+        return []
+
+    index = NameIndex(missing_in_passport)
+    return [
+        NameCandidate(name, candidate, score, reason)
+        for name in missing_in_sizing
+        for candidate, score, reason in index.search(name, min_score, max_candidates)
+    ]
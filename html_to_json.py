@@ -1,105 +1,536 @@
 import json
+import mmap
+import os
 import re
 import logging
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from bs4 import BeautifulSoup
+from lxml import etree
+from instrumentation import stage
+from ndjson_io import is_ndjson, write_records
+from section_cache import load_section_cache, save_section_cache, section_cache_path, section_fingerprint
+from table_grid import MAX_COLSPAN, MAX_ROWSPAN, build_grid, parse_span
+from vm_record import VmRecord, count_sections, is_section_marker, section_marker, sections_from_records, vm_records
+
+
+# Доступные движки парсинга HTML
+PARSER_ENGINES = ('bs4', 'lxml')
+
+# Теги, о которых потоковый парсер lxml сообщает события: разделы и крупная служебная разметка
+LXML_EVENT_TAGS = ('div', 'script', 'style', 'svg', 'noscript')
+
+# Лексемы для деления страницы на разделы: комментарии, script/style целиком, теги div.
+# Содержимое комментариев и script/style пропускается развернутым циклом ([^<]* до следующего '<'),
+# а не ленивым .*?, который проверял бы окончание на каждом символе. Открывающий тег div
+# заканчивается первым '>' вне кавычек: значения атрибутов могут содержать '>'
+SECTION_TOKEN_RE = re.compile(
+    r'<!--[^-]*(?:-(?!->)[^-]*)*(?:-->)?'
+    r'|<(script|style)\b[^<]*(?:<(?!/\1\s*>)[^<]*)*(?:</\1\s*>)?'
+    r'|<div\b(?:"[^"]*"|\'[^\']*\'|[^\'">])*>|</div\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+# Те же лексемы для поиска по байтам файла, отображенного в память
+SECTION_TOKEN_BYTES_RE = re.compile(SECTION_TOKEN_RE.pattern.encode('ascii'), re.IGNORECASE | re.DOTALL)
+# Атрибут открывающего тега: имя и необязательное значение в кавычках или без них.
+# Атрибуты разбираются по порядку, поэтому текст 'class=' внутри значения другого атрибута не учитывается
+TAG_ATTR_RE = re.compile(r'([^\s"\'>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+
+# Нормализованные заголовки колонок в порядке приоритета
+SERVER_NAME_HEADERS = ('доменноеимя', 'имясервера')
+IP_HEADERS = ('ipадрес', 'ipaddress', 'ip', 'ip_адрес')
+SIZING_HEADERS = ('сайзинг', 'sizing')
+
+
+class ColumnPlan(NamedTuple):
+    """
+    Индексы колонок таблицы раздела, вычисленные один раз по заголовкам.
+    """
+    naimenovanie: Optional[int]
+    role: Optional[int]
+    server_name: Optional[int]
+    ip: Tuple[int, ...]
+    sizing: Tuple[int, ...]
 
 
-def parse_html_to_json(html_file: str, json_file: str) -> None:
+def parse_html_to_json(html_file: str, json_file: Optional[str] = None, engine: str = 'bs4',
+                       section_cache_dir: Optional[str] = None, workers: int = 1) -> List[VmRecord]:
     """
-    Парсит HTML-файл и сохраняет данные в формате JSON.
+    Парсит HTML-файл и возвращает записи ВМ; при указании json_file сохраняет их в формате JSON.
 
     :param html_file: Путь к HTML-файлу.
-    :param json_file: Путь к выходному JSON-файлу.
+    :param json_file: Путь к выходному JSON-файлу или None, если сохранять файл не нужно.
+    :param engine: Движок парсинга: 'bs4' (BeautifulSoup, по умолчанию) или 'lxml'
+                   (потоковый разбор без построения полного дерева страницы).
+    :param section_cache_dir: Каталог кэша разделов для инкрементального режима или None:
+                              неизмененные разделы берутся из кэша предыдущего запуска.
+    :param workers: Количество процессов для разбора разделов; при значении больше 1 страница
+                    делится на разметку разделов, которые разбираются параллельно.
+    :return: Записи ВМ в порядке документа (внутри раздела - сгруппированные по 'Наименование' и 'Роль');
+             разделы без ВМ сохраняются только в JSON-файл.
     :raises FileNotFoundError: Если HTML-файл не найден.
+    :raises ValueError: Если указан неизвестный движок парсинга.
     :raises Exception: Для остальных ошибок при парсинге.
     """
     try:
-        # Настройка логирования
-        logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+        if engine not in PARSER_ENGINES:
+            raise ValueError(f"Неизвестный движок парсинга HTML: {engine}. Допустимые значения: {PARSER_ENGINES}")
+
+        with stage('parse_html') as stats:
+            if section_cache_dir:
+                # Повторный разбор только новых и измененных разделов
+                result = parse_sections_incremental(html_file, engine, section_cache_dir, workers)
+            elif workers > 1:
+                result = parse_sections_parallel(html_file, engine, workers)
+            elif engine == 'lxml':
+                result = build_sections(iter_sections_lxml(html_file))
+            else:
+                result = build_sections(iter_sections_bs4(html_file))
+            records = vm_records(result)
+            stats.count('sections', count_sections(result))
+            stats.count('vms', len(records))
 
-        # Чтение HTML-кода из файла
-        html_content = load_html(html_file)
+        # Сохранение результата в JSON-файл (необязательный отладочный артефакт)
+        if json_file:
+            save_json(result, json_file)
+            logging.info(f"Данные успешно сохранены в файле {json_file}")
 
-        # Парсинг HTML-кода
-        soup = BeautifulSoup(html_content, 'html.parser')
+        return records
 
-        # Поиск всех <div class='innerCell'>
-        inner_cells = soup.find_all('div', class_='innerCell')
+    except FileNotFoundError as fnfe:
+        logging.error(f"HTML-файл не найден: {fnfe}")
+        raise
+    except Exception as e:
+        logging.exception(f"Ошибка при парсинге HTML файла: {e}")
+        raise
 
-        # Результирующий список
-        result: List[Dict[str, Any]] = []
 
-        for cell in inner_cells:
-            # Извлечение заголовка раздела
-            section_title = get_section_title(cell)
-            if not section_title:
-                logging.warning("Заголовок секции не найден. Пропуск секции.")
-                continue
+def build_sections(sections: Iterable[Tuple[Optional[str], Optional[List[List[str]]]]]) -> List[VmRecord]:
+    """
+    Преобразует разделы страницы в записи ВМ.
+
+    :param sections: Пары (заголовок раздела, матрица таблицы или None, если таблицы нет).
+    :return: Записи ВМ всех разделов; каждый раздел начинается маркером (section_marker).
+    """
+    result: List[VmRecord] = []
+
+    for section_title, table_data in sections:
+        if not section_title:
+            logging.warning("Заголовок секции не найден. Пропуск секции.")
+            continue
+
+        logging.info(f"Обработка раздела: {section_title}")
+
+        if table_data is None:
+            logging.warning(f"Таблица не найдена в разделе: {section_title}")
+            result.append(section_marker(section_title))
+        elif not table_data:
+            # Раздел с пустой таблицей пропускается целиком
+            logging.warning(f"Таблица в разделе '{section_title}' пуста.")
+        else:
+            result.append(section_marker(section_title))
+            result.extend(build_section_data(table_data, section_title))
+
+    return result
+
+
+def parse_section_markup(markup: str, engine: str = 'bs4') -> List[VmRecord]:
+    """
+    Разбирает разметку одного раздела <div class='innerCell'> вместе с вложенными разделами.
+
+    :param markup: HTML-код раздела.
+    :param engine: Движок парсинга: 'bs4' или 'lxml'.
+    :return: Записи ВМ раздела и вложенных разделов.
+    """
+    if engine == 'lxml':
+        return build_sections(iter_lxml_sections([markup.encode('utf-8')]))
+    return build_sections(iter_soup_sections(markup))
+
+
+def parse_section_markups(markups: List[str], engine: str = 'bs4', workers: int = 1) -> List[List[VmRecord]]:
+    """
+    Разбирает разметку разделов, при workers > 1 - в пуле процессов.
+
+    :param markups: HTML-код разделов.
+    :param engine: Движок парсинга: 'bs4' или 'lxml'.
+    :param workers: Количество процессов.
+    :return: Результаты parse_section_markup в порядке входной разметки.
+    """
+    if workers <= 1 or len(markups) < 2:
+        return [parse_section_markup(markup, engine) for markup in markups]
+
+    workers = min(workers, len(markups))
+    # Разделы передаются пачками, чтобы накладные расходы на передачу между процессами не преобладали
+    chunksize = max(1, len(markups) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_section_markup, markups, repeat(engine), chunksize=chunksize))
+
+
+def parse_sections_parallel(html_file: str, engine: str, workers: int) -> List[VmRecord]:
+    """
+    Делит страницу на разметку разделов верхнего уровня и разбирает их в пуле процессов.
+
+    :param html_file: Путь к HTML-файлу.
+    :param engine: Движок парсинга: 'bs4' или 'lxml'.
+    :param workers: Количество процессов.
+    :return: Записи ВМ с маркерами разделов в порядке документа.
+    """
+    markups = list(iter_html_markup(html_file))
+    logging.info(f"Параллельный разбор разделов: {len(markups)}, процессов: {min(workers, len(markups))}")
+
+    result: List[VmRecord] = []
+    for records in parse_section_markups(markups, engine, workers):
+        result.extend(records)
+    return result
+
+
+def parse_sections_incremental(html_file: str, engine: str, cache_dir: str,
+                               workers: int = 1) -> List[VmRecord]:
+    """
+    Разбирает страницу, повторно используя результаты неизмененных разделов.
+
+    Кэш перезаписывается отпечатками текущей страницы, поэтому удаленные разделы в нем не накапливаются.
 
-            logging.info(f"Обработка раздела: {section_title}")
-            data: List[Dict[str, Any]] = []
-
-            # Поиск таблицы внутри текущей ячейки
-            table = cell.find('table')
-            if table:
-                # Парсинг таблицы в матрицу данных
-                table_data = parse_html_table(table)
-
-                if not table_data:
-                    logging.warning(f"Таблица в разделе '{section_title}' пуста.")
-                    continue
-
-                # Извлечение и нормализация заголовков столбцов
-                headers = table_data[0]
-                normalized_headers = [normalize_header(header) for header in headers]
-                logging.debug(f"Исходные заголовки: {headers}")
-                logging.debug(f"Нормализованные заголовки: {normalized_headers}")
-                header_indices = {header: idx for idx, header in enumerate(normalized_headers)}
-
-                current_naimenovanie: str = ''
-                current_role: str = ''
-
-                for row in table_data[1:]:
-                    # Обновление 'Наименование' и 'Роль', если они присутствуют в строке
-                    current_naimenovanie = update_field('наименование', header_indices, row, current_naimenovanie)
-                    current_role = update_field('роль', header_indices, row, current_role)
-
-                    # Извлечение данных ВМ
-                    vm_entry = extract_vm_entry(header_indices, row)
-
-                    # Проверка наличия 'Имя сервера' и добавление в данные
-                    if 'Имя сервера' in vm_entry and vm_entry['Имя сервера']:
-                        existing_entry = find_existing_entry(data, current_naimenovanie, current_role)
-                        if existing_entry:
-                            existing_entry['ВМ'].append(vm_entry)
-                        else:
-                            data.append({
-                                'Наименование': current_naimenovanie,
-                                'Роль': current_role,
-                                'ВМ': [vm_entry]
-                            })
+    :param html_file: Путь к HTML-файлу.
+    :param engine: Движок парсинга: 'bs4' или 'lxml'.
+    :param cache_dir: Каталог кэша разделов.
+    :param workers: Количество процессов для разбора новых и измененных разделов.
+    :return: Записи ВМ с маркерами разделов в порядке документа.
+    """
+    cache_file = section_cache_path(cache_dir, html_file)
+    result, current = parse_sections_cached(iter_html_markup(html_file), engine, load_section_cache(cache_file),
+                                            workers)
+    save_section_cache(cache_file, current)
+    return result
+
+
+def parse_sections_cached(markups: Iterable[str], engine: str, cached: Dict[str, List[VmRecord]],
+                          workers: int = 1) -> Tuple[List[VmRecord], Dict[str, List[VmRecord]]]:
+    """
+    Разбирает разметку разделов страницы, беря из cached результаты разделов с известным отпечатком.
+
+    Для каждого раздела вычисляется отпечаток исходной разметки; заново разбираются
+    только разделы, отпечатка которых нет в cached.
+
+    :param markups: Разметка разделов верхнего уровня (iter_html_markup).
+    :param engine: Движок парсинга: 'bs4' или 'lxml'.
+    :param cached: Результаты разделов предыдущего разбора: отпечаток разметки -> записи ВМ.
+    :param workers: Количество процессов для разбора новых и измененных разделов.
+    :return: Записи ВМ страницы с маркерами разделов и результаты разделов текущей страницы по отпечаткам.
+    """
+    current: Dict[str, List[VmRecord]] = {}
+    fingerprints: List[str] = []
+    missing: Dict[str, str] = {}
+
+    for markup in markups:
+        fingerprint = section_fingerprint(markup, engine)
+        fingerprints.append(fingerprint)
+        if fingerprint in current or fingerprint in missing:
+            continue
+        records = cached.get(fingerprint)
+        if records is None:
+            missing[fingerprint] = markup
+        else:
+            current[fingerprint] = records
+
+    # Разбор только разделов, которых нет в кэше
+    current.update(zip(missing, parse_section_markups(list(missing.values()), engine, workers)))
+
+    result: List[VmRecord] = []
+    for fingerprint in fingerprints:
+        result.extend(current[fingerprint])
+
+    logging.info(f"Разделов разобрано заново: {len(missing)}, взято из кэша: {len(fingerprints) - len(missing)}")
+    return result, current
+
+
+def build_section_data(table_data: List[List[str]], section_title: str = '') -> List[VmRecord]:
+    """
+    Извлекает записи ВМ из таблицы раздела, группируя их по 'Наименование' и 'Роль'.
+
+    Заголовки разрешаются в план колонок один раз на таблицу, а группы ищутся
+    по словарю с ключом ('Наименование', 'Роль'), поэтому обработка раздела
+    линейна по числу строк. Порядок групп совпадает с порядком их появления.
+
+    :param table_data: Матрица значений таблицы, первая строка - заголовки.
+    :param section_title: Заголовок раздела.
+    :return: Записи ВМ раздела: группы подряд, в порядке появления.
+    """
+    # Извлечение и нормализация заголовков столбцов
+    headers = table_data[0]
+    normalized_headers = [normalize_header(header) for header in headers]
+    # Отладочные сообщения по строкам формируются только при включенном уровне DEBUG
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug(f"Исходные заголовки: {headers}")
+        logging.debug(f"Нормализованные заголовки: {normalized_headers}")
+    plan = build_column_plan(normalized_headers)
+
+    # Группы в порядке появления, ключ - ('Наименование', 'Роль')
+    groups: Dict[Tuple[str, str], List[VmRecord]] = {}
+
+    current_naimenovanie: str = ''
+    current_role: str = ''
+
+    for row in table_data[1:]:
+        # Обновление 'Наименование' и 'Роль', если они присутствуют в строке
+        current_naimenovanie = update_field(plan.naimenovanie, row, current_naimenovanie)
+        current_role = update_field(plan.role, row, current_role)
+
+        # Извлечение данных ВМ
+        vm_entry = extract_vm_entry(plan, row, section_title, current_naimenovanie, current_role)
+        if debug:
+            logging.debug(f"'Наименование': {current_naimenovanie}, 'Роль': {current_role}, извлеченная ВМ: {vm_entry}")
+
+        # Проверка наличия 'Имя сервера' и добавление в данные
+        if vm_entry.server_name:
+            key = (current_naimenovanie, current_role)
+            existing_entry = groups.get(key)
+            if existing_entry:
+                existing_entry.append(vm_entry)
             else:
-                logging.warning(f"Таблица не найдена в разделе: {section_title}")
+                groups[key] = [vm_entry]
 
-            # Добавление раздела в результирующий список
-            result.append({
-                'Раздел': section_title,
-                'Данные': data
-            })
+    return [vm_entry for entries in groups.values() for vm_entry in entries]
 
-        # Сохранение результата в JSON-файл
-        save_json(result, json_file)
-        logging.info(f"Данные успешно сохранены в файле {json_file}")
 
-    except FileNotFoundError as fnfe:
-        logging.error(f"HTML-файл не найден: {fnfe}")
-        raise
-    except Exception as e:
-        logging.exception(f"Ошибка при парсинге HTML файла: {e}")
+def iter_sections_bs4(html_file: str) -> Iterator[Tuple[Optional[str], Optional[List[List[str]]]]]:
+    """
+    Обходит разделы страницы с помощью BeautifulSoup. Дерево строится отдельно для разметки
+    каждого раздела верхнего уровня, отобранной iter_html_markup, а не для всей страницы.
+
+    :param html_file: Путь к HTML-файлу.
+    :return: Итератор пар (заголовок раздела, матрица таблицы или None, если таблицы нет).
+    """
+    for markup in iter_html_markup(html_file):
+        yield from iter_soup_sections(markup)
+
+
+def iter_soup_sections(html_content: str) -> Iterator[Tuple[Optional[str], Optional[List[List[str]]]]]:
+    """
+    Обходит разделы HTML-кода с помощью BeautifulSoup.
+
+    :param html_content: HTML-код страницы или ее фрагмента.
+    :return: Итератор пар (заголовок раздела, матрица таблицы или None, если таблицы нет).
+    """
+    # Парсинг HTML-кода
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Поиск всех <div class='innerCell'>
+    for cell in soup.find_all('div', class_='innerCell'):
+        # Извлечение заголовка раздела
+        section_title = get_section_title(cell)
+        if not section_title:
+            yield None, None
+            continue
+
+        # Поиск таблицы внутри текущей ячейки
+        table = cell.find('table')
+        yield section_title, parse_html_table(table) if table else None
+
+
+def iter_sections_lxml(html_file: str) -> Iterator[Tuple[Optional[str], Optional[List[List[str]]]]]:
+    """
+    Потоково обходит разделы страницы с помощью lxml.etree.HTMLPullParser.
+
+    В парсер подается только разметка разделов верхнего уровня, отобранная iter_html_regions,
+    каждый раздел <div class='innerCell'> разбирается сразу после закрывающего тега, после чего
+    его поддерево удаляется из памяти. Порядок разделов совпадает с движком 'bs4'.
+
+    :param html_file: Путь к HTML-файлу.
+    :return: Итератор пар (заголовок раздела, матрица таблицы или None, если таблицы нет).
+    :raises FileNotFoundError: Если файл не найден.
+    """
+    # Переводы строк приводятся к '\n', как в iter_html_markup: текст ячеек не зависит от движка
+    regions = (region.replace(b'\r\n', b'\n').replace(b'\r', b'\n') for region in iter_html_regions(html_file))
+    yield from iter_lxml_sections(regions)
+
+
+def iter_lxml_sections(chunks: Iterable[bytes]) -> Iterator[Tuple[Optional[str], Optional[List[List[str]]]]]:
+    """
+    Обходит разделы HTML-кода, подаваемого блоками в lxml.etree.HTMLPullParser.
+
+    :param chunks: Блоки HTML-кода в кодировке UTF-8.
+    :return: Итератор пар (заголовок раздела, матрица таблицы или None, если таблицы нет).
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8', tag=LXML_EVENT_TAGS)
+    # Разделы в порядке открывающих тегов; вложенные разделы заполняются раньше внешних
+    pending: List[Tuple[Optional[str], Optional[List[List[str]]]]] = []
+    open_cells: List[int] = []
+
+    def drain() -> Iterator[Tuple[Optional[str], Optional[List[List[str]]]]]:
+        for event, element in parser.read_events():
+            if event == 'start':
+                if element.tag == 'div' and is_inner_cell(element):
+                    open_cells.append(len(pending))
+                    pending.append((None, None))
+                continue
+
+            if open_cells and element.tag == 'div' and is_inner_cell(element):
+                pending[open_cells.pop()] = extract_lxml_section(element)
+                if not open_cells:
+                    yield from pending
+                    pending.clear()
+
+            if not open_cells:
+                # Освобождение памяти: поддерево уже обработано, предыдущие соседи не нужны
+                element.clear(keep_tail=True)
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+
+    fed = False
+    for chunk in chunks:
+        parser.feed(chunk)
+        fed = True
+        yield from drain()
+    if not fed:
+        # Страница без разделов: закрытие парсера без данных завершается ошибкой lxml
+        return
+    parser.close()
+    yield from drain()
+
+
+def iter_section_markup(html_content: Union[str, bytes, mmap.mmap]) -> Iterator[Union[str, bytes]]:
+    """
+    Делит HTML-код на разметку разделов <div class='innerCell'> верхнего уровня без построения дерева.
+
+    Учитываются только теги div; комментарии, <script> и <style> пропускаются целиком,
+    чтобы разметка внутри них не влияла на глубину вложенности.
+
+    :param html_content: HTML-код страницы: строка, байты или файл, отображенный в память.
+    :return: Итератор фрагментов HTML-кода разделов в порядке документа (для байтов и mmap - байты).
+    """
+    start: Optional[int] = None
+    depth = 0
+    token_re = SECTION_TOKEN_RE if isinstance(html_content, str) else SECTION_TOKEN_BYTES_RE
+
+    for match in token_re.finditer(html_content):
+        # Второй символ лексемы: '!' у комментария, '/' у закрывающего тега
+        marker = match.group(0)[1:2]
+        if marker in ('!', b'!') or match.group(1):
+            continue
+
+        if marker in ('/', b'/'):
+            if start is not None:
+                depth -= 1
+                if depth == 0:
+                    yield html_content[start:match.end()]
+                    start = None
+        elif start is not None:
+            depth += 1
+        elif has_inner_cell_class(match.group(0)):
+            start = match.start()
+            depth = 1
+
+    if start is not None:
+        # Незакрытый раздел продолжается до конца документа
+        yield html_content[start:]
+
+
+def iter_html_regions(html_file: str) -> Iterator[bytes]:
+    """
+    Предварительный отбор разметки разделов: файл отображается в память (mmap) и просматривается
+    на уровне байтов, наружу отдаются только фрагменты <div class='innerCell'> верхнего уровня.
+    Скрипты, стили, SVG и остальная разметка страницы не копируются, не декодируются и не попадают
+    в парсер, поэтому время и память разбора определяются содержимым паспорта.
+
+    :param html_file: Путь к HTML-файлу.
+    :return: Итератор фрагментов разметки разделов в кодировке файла (UTF-8).
+    :raises FileNotFoundError: Если файл не найден.
+    """
+    logging.info(f"Предварительный отбор разделов HTML-файла: {html_file}")
+    try:
+        with open(html_file, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                regions = iter_section_markup(mapped)
+                selected = 0
+                try:
+                    for region in regions:
+                        selected += len(region)
+                        yield region
+                finally:
+                    # Поиск по mmap держит ссылку на отображение: освобождается до его закрытия
+                    regions.close()
+        logging.info(f"Отобрано разметки разделов: {selected} из {size} байт")
+    except FileNotFoundError:
+        logging.error(f"HTML-файл не найден: {html_file}")
         raise
 
 
+def iter_html_markup(html_file: str) -> Iterator[str]:
+    """
+    Отбирает разметку разделов верхнего уровня (iter_html_regions) и декодирует ее так же, как load_html:
+    UTF-8 с приведением переводов строк к '\n'.
+
+    :param html_file: Путь к HTML-файлу.
+    :return: Итератор HTML-кода разделов в порядке документа.
+    """
+    for region in iter_html_regions(html_file):
+        yield region.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def has_inner_cell_class(start_tag: Union[str, bytes]) -> bool:
+    """
+    Проверяет, что открывающий тег содержит класс 'innerCell'.
+
+    :param start_tag: Текст открывающего тега (строка или байты).
+    :return: True, если среди классов тега есть 'innerCell'.
+    """
+    if isinstance(start_tag, bytes):
+        start_tag = start_tag.decode('utf-8', 'replace')
+    # Разбор атрибутов после имени тега; как и в HTML, учитывается первый атрибут class
+    for match in TAG_ATTR_RE.finditer(start_tag, len('<div')):
+        if match.group(1).lower() == 'class':
+            classes = next((group for group in match.groups()[1:] if group is not None), '')
+            return 'innerCell' in classes.split()
+    return False
+
+
+def is_inner_cell(element: Any) -> bool:
+    """
+    Проверяет, что элемент lxml имеет класс 'innerCell'.
+
+    :param element: Элемент lxml.
+    :return: True, если среди классов элемента есть 'innerCell'.
+    """
+    return 'innerCell' in (element.get('class') or '').split()
+
+
+def get_lxml_text(element: Any) -> str:
+    """
+    Возвращает текст элемента lxml так же, как BeautifulSoup get_text(strip=True).
+
+    :param element: Элемент lxml.
+    :return: Склеенный текст элемента без пробельных символов по краям фрагментов.
+    """
+    if not len(element):
+        # Ячейка без вложенных тегов - текст целиком в element.text
+        return (element.text or '').strip()
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def extract_lxml_section(cell: Any) -> Tuple[Optional[str], Optional[List[List[str]]]]:
+    """
+    Извлекает заголовок и таблицу из раздела, разобранного lxml.
+
+    :param cell: Элемент lxml <div class='innerCell'>.
+    :return: Пара (заголовок раздела или None, матрица таблицы или None).
+    """
+    h3 = cell.find('.//h3')
+    section_title = get_lxml_text(h3) if h3 is not None else None
+    if not section_title:
+        return None, None
+
+    table = cell.find('.//table')
+    return section_title, parse_lxml_table(table) if table is not None else None
+
+
 def load_html(file_path: str) -> str:
     """
     Загружает HTML-контент из файла.
@@ -142,53 +573,39 @@ def parse_html_table(table: Any) -> List[List[str]]:
     :param table: BeautifulSoup объект таблицы.
     :return: Список строк, каждая строка - список значений ячеек.
     """
-    rows = table.find_all('tr')
-    table_data: List[List[str]] = []
-    rowspan_dict: Dict[int, Dict[str, Any]] = {}  # Словарь для отслеживания ячеек с rowspan
-
-    # Определение максимального количества колонок для заполнения пустыми ячейками
-    num_columns = max(len(row.find_all(['td', 'th'])) for row in rows) if rows else 0
-
-    for row in rows:
-        row_cells: List[str] = []
-        cells = row.find_all(['td', 'th'])
-        cell_idx = 0
-
-        while cell_idx < len(cells) or len(row_cells) < num_columns:
-            # Проверка наличия незавершенных rowspan
-            if len(row_cells) in rowspan_dict:
-                cell_info = rowspan_dict[len(row_cells)]
-                row_cells.append(cell_info['value'])
-                cell_info['remaining'] -= 1
-                if cell_info['remaining'] == 0:
-                    del rowspan_dict[len(row_cells) - 1]
-                continue
-
-            if cell_idx >= len(cells):
-                # Если ячеек больше нет, заполняем пустыми значениями
-                row_cells.append('')
-                continue
-
-            cell = cells[cell_idx]
-            cell_text = cell.get_text(strip=True)
-            colspan = int(cell.get('colspan', 1))
-            rowspan = int(cell.get('rowspan', 1))
-
-            # Добавление значения ячейки, учитывая colspan
-            for _ in range(colspan):
-                row_cells.append(cell_text)
-
-            # Обработка rowspan
-            if rowspan > 1:
-                for i in range(colspan):
-                    rowspan_dict[len(row_cells) - colspan + i] = {'value': cell_text, 'remaining': rowspan - 1}
-
-            cell_idx += 1
-
-        logging.debug(f"Обработанная строка: {row_cells}")
-        table_data.append(row_cells)
+    with stage('table_grid') as stats:
+        grid = build_grid(
+            [
+                (cell.get_text(strip=True),
+                 parse_span(cell.get('colspan'), MAX_COLSPAN),
+                 parse_span(cell.get('rowspan'), MAX_ROWSPAN))
+                for cell in row.find_all(['td', 'th'])
+            ]
+            for row in table.find_all('tr')
+        )
+        stats.count('rows', len(grid))
+    return grid
+
+
+def parse_lxml_table(table: Any) -> List[List[str]]:
+    """
+    Парсит таблицу, разобранную lxml, в список строк аналогично parse_html_table.
 
-    return table_data
+    :param table: Элемент lxml <table>.
+    :return: Список строк, каждая строка - список значений ячеек.
+    """
+    with stage('table_grid') as stats:
+        grid = build_grid(
+            [
+                (get_lxml_text(cell),
+                 parse_span(cell.get('colspan'), MAX_COLSPAN),
+                 parse_span(cell.get('rowspan'), MAX_ROWSPAN))
+                for cell in row.iter('td', 'th')
+            ]
+            for row in table.iter('tr')
+        )
+        stats.count('rows', len(grid))
+    return grid
 
 
 def normalize_header(header: str) -> str:
@@ -203,96 +620,91 @@ def normalize_header(header: str) -> str:
     return header
 
 
-def update_field(field_name: str, header_indices: Dict[str, int], row: List[str], current_value: str) -> str:
+def build_column_plan(normalized_headers: List[str]) -> ColumnPlan:
+    """
+    Разрешает нормализованные заголовки таблицы в индексы колонок.
+
+    :param normalized_headers: Нормализованные заголовки таблицы.
+    :return: План колонок, применяемый к каждой строке таблицы.
+    """
+    header_indices = {header: idx for idx, header in enumerate(normalized_headers)}
+
+    # Для 'Имя сервера' используется первый найденный заголовок
+    server_name = next(
+        (header_indices[header] for header in SERVER_NAME_HEADERS if header in header_indices),
+        None
+    )
+
+    return ColumnPlan(
+        naimenovanie=header_indices.get('наименование'),
+        role=header_indices.get('роль'),
+        server_name=server_name,
+        ip=tuple(header_indices[header] for header in IP_HEADERS if header in header_indices),
+        sizing=tuple(header_indices[header] for header in SIZING_HEADERS if header in header_indices)
+    )
+
+
+def update_field(idx: Optional[int], row: List[str], current_value: str) -> str:
     """
     Обновляет значение поля ('Наименование' или 'Роль') на основе текущей строки таблицы.
 
-    :param field_name: Имя поля для обновления.
-    :param header_indices: Словарь индексов заголовков.
+    :param idx: Индекс колонки поля из плана колонок или None, если колонки нет.
     :param row: Текущая строка таблицы.
     :param current_value: Текущее значение поля.
     :return: Обновленное значение поля.
     """
-    if field_name in header_indices:
-        idx = header_indices[field_name]
-        if idx < len(row) and row[idx]:
-            logging.debug(f"Обновление '{field_name}': {row[idx]}")
-            return row[idx]
+    if idx is not None and idx < len(row) and row[idx]:
+        return row[idx]
     return current_value
 
 
-def extract_vm_entry(header_indices: Dict[str, int], row: List[str]) -> Dict[str, str]:
+def extract_vm_entry(plan: ColumnPlan, row: List[str], section_title: str = '', naimenovanie: str = '',
+                     role: str = '') -> VmRecord:
     """
     Извлекает информацию о ВМ из строки таблицы.
 
-    :param header_indices: Словарь индексов заголовков.
+    :param plan: План колонок таблицы.
     :param row: Текущая строка таблицы.
-    :return: Словарь с информацией о ВМ.
-    """
-    vm_entry: Dict[str, str] = {}
-
-    # Унификация ключа 'Имя сервера'
-    if 'доменноеимя' in header_indices:
-        idx = header_indices['доменноеимя']
-        if idx < len(row):
-            vm_entry['Имя сервера'] = row[idx]
-    elif 'имясервера' in header_indices:
-        idx = header_indices['имясервера']
-        if idx < len(row):
-            vm_entry['Имя сервера'] = row[idx]
-
-    # Обработка 'IP адрес'
-    ip_headers = ['ipадрес', 'ipaddress', 'ip', 'ip_адрес']
-    for ip_header in ip_headers:
-        if ip_header in header_indices:
-            idx = header_indices[ip_header]
-            if idx < len(row):
-                vm_entry['IP адрес'] = row[idx]
-                break
-    else:
-        vm_entry['IP адрес'] = ''
-
-    # Обработка 'Сайзинг'
-    sizing_headers = ['сайзинг', 'sizing']
-    for sizing_header in sizing_headers:
-        if sizing_header in header_indices:
-            idx = header_indices[sizing_header]
-            if idx < len(row):
-                vm_entry['Сайзинг'] = row[idx]
-                break
-    else:
-        vm_entry['Сайзинг'] = ''
-
-    logging.debug(f"Извлеченная ВМ: {vm_entry}")
-    return vm_entry
-
-
-def find_existing_entry(data: List[Dict[str, Any]], naimenovanie: str, role: str) -> Optional[Dict[str, Any]]:
-    """
-    Ищет существующую запись с заданным 'Наименование' и 'Роль'.
-
-    :param data: Список данных.
+    :param section_title: Заголовок раздела.
     :param naimenovanie: Текущее 'Наименование'.
     :param role: Текущая 'Роль'.
-    :return: Ссылка на существующую запись или None.
+    :return: Запись ВМ; без имени сервера, если его колонки нет в строке.
     """
-    return next(
-        (item for item in data if item['Наименование'] == naimenovanie and item['Роль'] == role),
-        None
+    row_length = len(row)
+
+    # Унификация ключа 'Имя сервера'
+    server_name = ''
+    if plan.server_name is not None and plan.server_name < row_length:
+        server_name = row[plan.server_name]
+
+    # Значение берется из первой подходящей колонки, которая есть в строке
+    return VmRecord(
+        server_name=server_name,
+        ip=next((row[idx] for idx in plan.ip if idx < row_length), ''),
+        sizing=next((row[idx] for idx in plan.sizing if idx < row_length), ''),
+        section=section_title,
+        naimenovanie=naimenovanie,
+        role=role
     )
 
 
-def save_json(data: List[Dict[str, Any]], json_file: str) -> None:
+def save_json(data: List[VmRecord], json_file: str) -> None:
     """
-    Сохраняет данные в формате JSON в файл.
+    Сохраняет записи ВМ в файл. Для файлов .ndjson/.jsonl каждая ВМ записывается
+    отдельной строкой вместе с разделом, 'Наименование' и 'Роль'; в JSON-файле
+    ВМ сгруппированы по разделам, 'Наименование' и 'Роль'.
 
-    :param data: Данные для сохранения.
-    :param json_file: Путь к выходному JSON-файлу.
+    :param data: Записи ВМ с маркерами разделов (разделы без ВМ сохраняются только в JSON-файле).
+    :param json_file: Путь к выходному JSON- или NDJSON-файлу.
     :raises Exception: Если не удалось сохранить файл.
     """
+    if is_ndjson(json_file):
+        write_records((record.to_passport_dict() for record in data if not is_section_marker(record)), json_file)
+        return
+
     try:
         with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+            json.dump(list(sections_from_records(data)), f, ensure_ascii=False, indent=4)
         logging.info(f"Данные успешно сохранены в файле {json_file}")
     except Exception as e:
         logging.error(f"Не удалось сохранить JSON файл {json_file}: {e}")
@@ -0,0 +1,192 @@
+# instrumentation.py
+
+import cProfile
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# Отчет текущего запуска; None - инструментирование выключено и замеры ничего не стоят
+_active_report: Optional['RunReport'] = None
+
+
+class StageStats:
+    """
+    Накопленные показатели одного этапа: число вызовов, время, пиковая память и счетчики.
+    """
+    __slots__ = ('name', 'calls', 'seconds', 'peak_memory', 'counters')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self.counters: Dict[str, int] = {}
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """
+        Увеличивает счетчик этапа.
+
+        :param counter: Название счетчика (например, 'rows' или 'sections').
+        :param value: Величина приращения.
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def to_dict(self, trace_memory: bool) -> Dict[str, Any]:
+        """
+        :param trace_memory: Замерялась ли память; если нет, пик памяти не выводится.
+        :return: Показатели этапа в виде словаря для JSON-отчета.
+        """
+        return {
+            'stage': self.name,
+            'calls': self.calls,
+            'seconds': round(self.seconds, 6),
+            'peak_memory_bytes': self.peak_memory if trace_memory else None,
+            'counters': dict(self.counters)
+        }
+
+
+class NullStage:
+    """
+    Заглушка этапа при выключенном инструментировании.
+    """
+    __slots__ = ()
+
+    def count(self, counter: str, value: int = 1) -> None:
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class RunReport:
+    """
+    Показатели запуска по этапам. Повторные вызовы этапа с тем же названием суммируются.
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.stages: Dict[str, StageStats] = {}
+        # Открытые этапы и максимум памяти, накопленный каждым из них до вложенных этапов
+        self._stack: List[List[Any]] = []
+        self.start_time = time.perf_counter()
+        self.total_seconds = 0.0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """
+        Замеряет этап: время выполнения и, при трассировке памяти, пик выделенной памяти.
+
+        :param name: Название этапа.
+        :return: Показатели этапа для обновления счетчиков.
+        """
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+
+        if self.trace_memory:
+            # Пик до начала вложенного этапа засчитывается объемлющему этапу
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        frame = [stats, 0]
+        self._stack.append(frame)
+
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            self._stack.pop()
+            if self.trace_memory:
+                peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+                stats.peak_memory = max(stats.peak_memory, peak)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: Отчет о запуске в виде словаря для JSON.
+        """
+        return {
+            'started': self.started,
+            'total_seconds': round(self.total_seconds, 6),
+            'trace_memory': self.trace_memory,
+            'stages': [stats.to_dict(self.trace_memory) for stats in self.stages.values()]
+        }
+
+    def save(self, report_file: str) -> None:
+        """
+        Сохраняет отчет о запуске в JSON-файл.
+
+        :param report_file: Путь к JSON-файлу отчета.
+        :raises Exception: Если не удалось сохранить файл.
+        """
+        try:
+            with open(report_file, 'w', encoding='utf-8') as file:
+                json.dump(self.to_dict(), file, ensure_ascii=False, indent=4)
+            logging.info(f"Отчет о производительности сохранен в файле {report_file}")
+        except Exception as e:
+            logging.error(f"Не удалось сохранить отчет о производительности {report_file}: {e}")
+            raise
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Any]:
+    """
+    Замеряет этап в отчете текущего запуска; без активного отчета ничего не делает.
+
+    :param name: Название этапа: 'parse_html', 'table_grid', 'excel_load', 'compare', 'report_write', 'extract'.
+    :return: Показатели этапа (или заглушка) с методом count для счетчиков.
+    """
+    if _active_report is None:
+        yield NULL_STAGE
+        return
+    with _active_report.stage(name) as stats:
+        yield stats
+
+
+@contextmanager
+def instrument_run(report_file: Optional[str] = None, profile_file: Optional[str] = None,
+                   trace_memory: bool = False) -> Iterator[RunReport]:
+    """
+    Включает инструментирование на время запуска.
+
+    :param report_file: Путь к JSON-отчету по этапам или None.
+    :param profile_file: Путь к дампу cProfile (для pstats/snakeviz) или None.
+    :param trace_memory: Замерять пиковую память этапов через tracemalloc (замедляет выполнение).
+    :return: Отчет о запуске.
+    """
+    global _active_report
+
+    report = RunReport(trace_memory=trace_memory)
+    previous = _active_report
+    _active_report = report
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_file else None
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield report
+    finally:
+        if profiler:
+            profiler.disable()
+        report.total_seconds = time.perf_counter() - report.start_time
+        if started_tracing:
+            tracemalloc.stop()
+        _active_report = previous
+
+        if profiler:
+            profiler.dump_stats(profile_file)
+            logging.info(f"Профиль cProfile сохранен в файле {profile_file}")
+        if report_file:
+            report.save(report_file)
@@ -1,9 +1,24 @@
 # json_extractor.py
 
 import json
-import pandas as pd
 import logging
-from typing import Any, Dict, List
+from array import array
+from itertools import groupby, islice
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List
+from instrumentation import stage
+from ndjson_io import PASSPORT_RECORD_FIELDS, is_ndjson, iter_records
+from vm_record import VmRecord, records_from_sections
+
+if TYPE_CHECKING:
+    # pandas импортируется при построении DataFrame, а не при загрузке модуля
+    import pandas as pd
+
+# Поля с повторяющимися значениями: хранятся кодами уникальных значений (категориальный тип)
+CATEGORICAL_FIELDS = ('Раздел', 'Наименование', 'Роль', 'Сайзинг')
+
+# Количество ВМ в одном DataFrame при выгрузке частями
+DEFAULT_CHUNK_SIZE = 100_000
 
 
 def setup_logger() -> None:
@@ -16,58 +31,125 @@ def setup_logger() -> None:
     )
 
 
-def extract_data_from_json(json_file: str) -> pd.DataFrame:
+class ColumnBuffer:
     """
-    Извлекает данные о виртуальных машинах из JSON-файла и преобразует их в DataFrame.
+    Буфер значений одной колонки. Категориальная колонка хранит каждое уникальное значение
+    один раз и 4-байтовый код на строку, поэтому ее размер определяется числом уникальных значений.
+    """
+    __slots__ = ('categorical', 'values', 'codes', 'categories')
+
+    def __init__(self, categorical: bool) -> None:
+        """
+        :param categorical: Хранить значения кодами уникальных значений.
+        """
+        self.categorical = categorical
+        self.values: List[Any] = []
+        self.codes = array('i')
+        # Уникальное значение -> код (порядок кодов совпадает с порядком появления значений)
+        self.categories: Dict[Any, int] = {}
+
+    def append(self, value: Any) -> None:
+        """
+        Добавляет значение в конец колонки.
+
+        :param value: Значение ячейки.
+        """
+        if not self.categorical:
+            self.values.append(value)
+            return
+        if value is None:
+            # Пустое значение категориальной колонки - код -1 (NaN)
+            self.codes.append(-1)
+            return
+        code = self.categories.get(value)
+        if code is None:
+            code = self.categories[value] = len(self.categories)
+        self.codes.append(code)
+
+    def to_array(self) -> Any:
+        """
+        :return: Значения колонки для DataFrame: pd.Categorical или список.
+        """
+        if not self.categorical:
+            return self.values
+        import numpy as np
+        import pandas as pd
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32), categories=list(self.categories))
+
+
+def iter_vm_records(json_file: str) -> Iterator[VmRecord]:
+    """
+    Обходит записи ВМ JSON- или NDJSON-файла паспорта, пропуская записи без раздела или имени сервера
+    (с одним предупреждением на раздел). Файлы .ndjson/.jsonl читаются потоково.
 
-    :param json_file: Путь к JSON-файлу.
-    :return: DataFrame с информацией о виртуальных машинах.
-    :raises FileNotFoundError: Если JSON-файл не найден.
-    :raises json.JSONDecodeError: Если JSON-файл содержит некорректный JSON.
-    :raises Exception: Для остальных ошибок при обработке файла.
+    :param json_file: Путь к JSON- или NDJSON-файлу.
+    :return: Генератор записей ВМ.
+    :raises FileNotFoundError: Если файл не найден.
+    :raises json.JSONDecodeError: Если файл содержит некорректный JSON.
     """
-    try:
+    if is_ndjson(json_file):
+        # Плоские записи ВМ читаются построчно, файл целиком в память не загружается
+        records = (VmRecord.from_dict(record) for record in iter_records(json_file))
+    else:
         logging.info(f"Загрузка данных из JSON-файла: {json_file}")
         with open(json_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
+        records = records_from_sections(data)
+
+    # Предупреждения о пропущенных записях - одно на раздел, а не на каждую запись
+    for section, section_records in groupby(records, key=attrgetter('section')):
+        if not section:
+            skipped = sum(1 for _ in section_records)
+            logging.warning(f"Отсутствует название раздела. Пропуск раздела (записей ВМ: {skipped}).")
+            continue
+        missing_names = 0
+        for record in section_records:
+            if not record.server_name:
+                missing_names += 1
+                continue
+            yield record
+        if missing_names:
+            logging.warning(f"Отсутствует 'Имя сервера' в разделе '{section}'. Пропущено записей ВМ: {missing_names}.")
 
-        vm_list: List[Dict[str, Any]] = []
 
-        for section in data:
-            section_name = section.get('Раздел', '')
-            if not section_name:
-                logging.warning("Отсутствует название раздела. Пропуск раздела.")
-                continue
+def build_frame(records: Iterable[VmRecord]) -> 'pd.DataFrame':
+    """
+    Заполняет буферы колонок записями и строит из них DataFrame; колонки CATEGORICAL_FIELDS -
+    категориального типа. Записи ВМ не накапливаются.
+
+    :param records: Записи ВМ.
+    :return: DataFrame с колонками PASSPORT_RECORD_FIELDS.
+    """
+    import pandas as pd
+
+    buffers = [ColumnBuffer(field in CATEGORICAL_FIELDS) for field in PASSPORT_RECORD_FIELDS]
+    for record in records:
+        for buffer, value in zip(buffers, record.passport_values()):
+            buffer.append(value)
+    return pd.DataFrame({field: buffer.to_array() for field, buffer in zip(PASSPORT_RECORD_FIELDS, buffers)})
 
-            for item in section.get('Данные', []):
-                naimenovanie = item.get('Наименование', '')
-                role = item.get('Роль', '')
-                for vm in item.get('ВМ', []):
-                    vm_name = vm.get('Имя сервера', '')
-                    ip_address = vm.get('IP адрес', '')
-                    sizing = vm.get('Сайзинг', '')
-
-                    if not vm_name:
-                        logging.warning("Отсутствует 'Имя сервера'. Пропуск записи ВМ.")
-                        continue
-
-                    vm_entry = {
-                        'Раздел': section_name,
-                        'Наименование': naimenovanie,
-                        'Роль': role,
-                        'Имя сервера': vm_name,
-                        'IP адрес': ip_address,
-                        'Сайзинг': sizing
-                    }
-                    vm_list.append(vm_entry)
-
-        if not vm_list:
-            logging.warning("Нет данных для преобразования в DataFrame.")
-
-        # Создаем DataFrame из списка ВМ
-        df_json = pd.DataFrame(vm_list)
-        logging.info("Преобразование данных в DataFrame успешно завершено.")
-        return df_json
+
+def extract_data_from_json(json_file: str) -> 'pd.DataFrame':
+    """
+    Извлекает данные о виртуальных машинах из JSON-файла и преобразует их в DataFrame.
+    Файлы .ndjson/.jsonl с одной записью ВМ на строку читаются потоково, значения сразу
+    раскладываются по колонкам, повторяющиеся 'Раздел', 'Наименование', 'Роль' и 'Сайзинг'
+    хранятся категориальными колонками.
+
+    :param json_file: Путь к JSON- или NDJSON-файлу.
+    :return: DataFrame с информацией о виртуальных машинах.
+    :raises FileNotFoundError: Если JSON-файл не найден.
+    :raises json.JSONDecodeError: Если JSON-файл содержит некорректный JSON.
+    :raises Exception: Для остальных ошибок при обработке файла.
+    """
+    try:
+        with stage('extract') as stats:
+            df_json = build_frame(iter_vm_records(json_file))
+            if df_json.empty:
+                logging.warning("Нет данных для преобразования в DataFrame.")
+            stats.count('rows', len(df_json))
+            logging.info("Преобразование данных в DataFrame успешно завершено.")
+            return df_json
 
     except FileNotFoundError as fnfe:
         logging.error(f"JSON-файл не найден: {json_file}")
@@ -80,17 +162,72 @@ def extract_data_from_json(json_file: str) -> pd.DataFrame:
         raise e
 
 
-def save_dataframe_to_excel(df: pd.DataFrame, excel_file: str) -> None:
+def iter_data_chunks(json_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator['pd.DataFrame']:
+    """
+    Извлекает данные о виртуальных машинах частями: в памяти находится не больше chunk_size ВМ.
+
+    :param json_file: Путь к JSON- или NDJSON-файлу.
+    :param chunk_size: Количество ВМ в одном DataFrame.
+    :return: Генератор DataFrame с колонками PASSPORT_RECORD_FIELDS.
+    """
+    records = iter_vm_records(json_file)
+    while True:
+        chunk = build_frame(islice(records, chunk_size))
+        if chunk.empty:
+            return
+        yield chunk
+
+
+def export_json_to_excel(json_file: str, excel_file: str) -> int:
+    """
+    Выгружает ВМ из JSON- или NDJSON-файла в Excel потоково, без построения DataFrame:
+    записи читаются по одной и сразу пишутся в книгу в режиме write_only.
+
+    :param json_file: Путь к JSON- или NDJSON-файлу.
+    :param excel_file: Путь к выходному Excel-файлу.
+    :return: Количество выгруженных ВМ.
+    :raises Exception: Если не удалось прочитать данные или сохранить файл.
     """
-    Сохраняет DataFrame в Excel-файл.
+    from openpyxl import Workbook
+
+    try:
+        with stage('extract') as stats:
+            logging.info(f"Потоковая выгрузка ВМ в Excel-файл: {excel_file}")
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Sheet1')
+            sheet.append(list(PASSPORT_RECORD_FIELDS))
+            rows = 0
+            for record in iter_vm_records(json_file):
+                sheet.append(list(record.passport_values()))
+                rows += 1
+            workbook.save(excel_file)
+            stats.count('rows', rows)
+        logging.info(f"ВМ выгружено в файл {excel_file}: {rows}")
+        return rows
+    except Exception as e:
+        logging.error(f"Не удалось выгрузить ВМ из {json_file} в Excel-файл {excel_file}: {e}")
+        raise
+
+
+def save_dataframe_to_excel(df: 'pd.DataFrame', excel_file: str) -> None:
+    """
+    Сохраняет DataFrame в Excel-файл. Строки пишутся в книгу в режиме write_only,
+    без создания объектов ячеек для всего листа.
 
     :param df: DataFrame для сохранения.
     :param excel_file: Путь к выходному Excel-файлу.
     :raises Exception: Если не удалось сохранить файл.
     """
+    from openpyxl import Workbook
+
     try:
         logging.info(f"Сохранение DataFrame в Excel-файл: {excel_file}")
-        df.to_excel(excel_file, index=False)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append([str(column) for column in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            sheet.append(list(row))
+        workbook.save(excel_file)
         logging.info(f"DataFrame успешно сохранен в файле {excel_file}")
     except Exception as e:
         logging.error(f"Не удалось сохранить Excel-файл {excel_file}: {e}")
@@ -104,16 +241,12 @@ def main():
     setup_logger()
 
     # Пути к файлам (замените на ваши пути или используйте аргументы командной строки)
-    json_input = 'result.json'  # JSON-файл с данными из HTML
+    json_input = 'result.ndjson'  # JSON- или NDJSON-файл с данными из HTML
     excel_output = 'json_data.xlsx'  # Excel-файл для сохранения данных
 
     try:
-        # Извлечение данных из JSON
-        df = extract_data_from_json(json_input)
-
-        # Сохранение данных в Excel
-        save_dataframe_to_excel(df, excel_output)
+        # Потоковая выгрузка: ВМ не собираются в DataFrame целиком
+        export_json_to_excel(json_input, excel_output)
 
     except Exception as e:
         logging.exception(f"Произошла ошибка при выполнении скрипта: {e}")
-
@@ -1,10 +1,16 @@
 # main.py
 
+import argparse
 import logging
 import sys
-from html_to_json import parse_html_to_json
-from excel_to_json import excel_to_json
-from compare_json import compare_json
+from typing import Dict, List, Optional, Tuple
+from instrumentation import instrument_run
+
+# Версия утилиты сверки
+__version__ = '1.1.0'
+
+# Тяжелые библиотеки (pandas, numpy, bs4, lxml, openpyxl) импортируются внутри обработчиков
+# подкоманд, чтобы --help, --version и сравнение готовых промежуточных файлов запускались быстро
 
 
 def setup_logging() -> None:
@@ -20,36 +26,271 @@ def setup_logging() -> None:
     )
 
 
-def main() -> None:
+def run_pipeline(html_file: str, excel_file: str, output_excel_file: str, html_engine: str = 'bs4',
+                 excel_engine: str = 'pandas', sizing_cache_dir: Optional[str] = None,
+                 section_cache_dir: Optional[str] = None, compare_engine: str = 'python',
+                 html_json_file: Optional[str] = None, excel_json_file: Optional[str] = None,
+                 sizing_tolerances: Optional[Dict[str, float]] = None,
+                 fuzzy_min_score: Optional[float] = None, excel_all_sheets: bool = False,
+                 html_workers: int = 1, snapshot_file: Optional[str] = None) -> None:
     """
-    Основная функция приложения, которая выполняет парсинг HTML, извлечение данных из Excel,
-    сравнение JSON-файлов и генерацию выходного Excel-файла.
+    Выполняет полный цикл сверки в памяти: парсинг HTML, извлечение данных из Excel
+    и сравнение без промежуточной записи и повторного чтения JSON-файлов.
+
+    :param html_file: Путь к HTML-файлу паспорта.
+    :param excel_file: Путь к Excel-файлу с сайзингом.
+    :param output_excel_file: Путь к выходному Excel-файлу с результатами сравнения.
+    :param html_engine: Движок парсинга HTML: 'bs4' или 'lxml'.
+    :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+    :param sizing_cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+    :param section_cache_dir: Каталог кэша разделов паспорта (инкрементальный разбор) или None.
+    :param compare_engine: Движок сравнения: 'python' или 'pandas'.
+    :param html_json_file: Путь для отладочного JSON-файла паспорта или None.
+    :param excel_json_file: Путь для отладочного JSON-файла сайзинга или None.
+    :param sizing_tolerances: Допуски сравнения по полям сайзинга ('cpu', 'ram', 'hdd_sys', 'hdd_app') или None.
+    :param fuzzy_min_score: Порог сходства для поиска похожих имен несопоставленных серверов или None.
+    :param excel_all_sheets: Читать все листы сайзинга с требуемыми колонками вместо листа 'Support'.
+    :param html_workers: Количество процессов для параллельного разбора разделов паспорта.
+    :param snapshot_file: Файл снимка предыдущего запуска: если задан, вместо полного отчета
+                          записывается отчет об изменениях с прошлого запуска.
     """
-    setup_logging()
+    from html_to_json import parse_html_to_json
+    from excel_to_json import excel_to_json
+    from compare_json import compare_data, compare_delta
+
+    # Парсинг HTML
+    logging.info("Парсинг HTML")
+    passport_data = parse_html_to_json(html_file, html_json_file, engine=html_engine,
+                                       section_cache_dir=section_cache_dir, workers=html_workers)
 
-    # Пути к файлам (замените на ваши пути или используйте аргументы командной строки)
-    html_file = 'page.html'  # HTML файл для парсинга
-    html_json_file = 'result.json'  # JSON-файл, генерируемый из HTML
+    # Извлечение данных из Excel
+    logging.info("Извлечение данных из Excel")
+    sizing_data = excel_to_json(excel_file, excel_json_file, engine=excel_engine, cache_dir=sizing_cache_dir,
+                                all_sheets=excel_all_sheets)
 
-    excel_file = 'data.xlsx'  # Excel-файл с данными виртуальных машин
-    excel_json_file = 'excel_data.json'  # JSON-файл, генерируемый из Excel
+    # Сравнение данных и генерация выходного Excel файла
+    logging.info("Сравнение данных и генерация выходного Excel файла")
+    if snapshot_file:
+        compare_delta(passport_data, sizing_data, snapshot_file, output_excel_file, sizing_tolerances)
+        return
+    compare_data(passport_data, sizing_data, output_excel_file, engine=compare_engine,
+                 sizing_tolerances=sizing_tolerances, fuzzy_min_score=fuzzy_min_score)
 
-    output_excel_file = 'comparison_result.xlsx'  # Имя выходного файла
 
+def parse_tolerance(text: str) -> Tuple[str, float]:
+    """
+    Разбирает допуск сайзинга из аргумента командной строки вида 'поле=значение'.
+
+    :param text: Аргумент, например 'hdd_sys=10'.
+    :return: Пара (поле, допуск).
+    :raises argparse.ArgumentTypeError: Если аргумент не в формате 'поле=число'.
+    """
+    field, separator, value = text.partition('=')
     try:
-        # Парсинг HTML и генерация JSON
-        logging.info("Парсинг HTML и генерация JSON файла")
-        parse_html_to_json(html_file, html_json_file)
+        if not separator:
+            raise ValueError(text)
+        return field.strip(), float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Допуск задается как поле=число, например hdd_sys=10: {text}")
+
+
+def tolerances_from_args(tolerances: Optional[List[Tuple[str, float]]]) -> Optional[Dict[str, float]]:
+    """
+    Собирает допуски сайзинга из повторяющегося аргумента --tolerance.
+
+    :param tolerances: Пары (поле, допуск) или None.
+    :return: Допуски по полям или None для точного совпадения.
+    """
+    return dict(tolerances) if tolerances else None
+
+
+def command_parse(args: argparse.Namespace) -> None:
+    """
+    Подкоманда parse: разбор HTML-паспорта в промежуточный файл.
+    """
+    from html_to_json import parse_html_to_json
 
-        # Извлечение данных из Excel и генерация JSON
-        logging.info("Извлечение данных из Excel и генерация JSON файла")
-        excel_to_json(excel_file, excel_json_file)
+    parse_html_to_json(args.html, args.output, engine=args.engine, section_cache_dir=args.section_cache_dir,
+                       workers=args.workers)
 
-        # Сравнение JSON-файлов и генерация выходного Excel файла
-        logging.info("Сравнение данных и генерация выходного Excel файла")
-        compare_json(html_json_file, excel_json_file, output_excel_file)
 
-        logging.info(f"Скрипт успешно выполнен. Результаты сохранены в файле {output_excel_file}")
+def command_ingest(args: argparse.Namespace) -> None:
+    """
+    Подкоманда ingest: чтение Excel-сайзинга в промежуточный файл.
+    """
+    from excel_to_json import excel_to_json
+
+    excel_to_json(args.excel, args.output, engine=args.excel_engine, cache_dir=args.cache_dir,
+                  all_sheets=args.all_sheets)
+
+
+def command_compare(args: argparse.Namespace) -> None:
+    """
+    Подкоманда compare: сравнение готовых промежуточных файлов паспорта и сайзинга.
+    """
+    from compare_json import compare_json
+
+    compare_json(args.passport, args.sizing, args.output, engine=args.compare_engine,
+                 sizing_tolerances=tolerances_from_args(args.tolerance), fuzzy_min_score=args.fuzzy_min_score,
+                 snapshot_file=args.delta)
+
+
+def command_reconcile(args: argparse.Namespace) -> None:
+    """
+    Подкоманда reconcile: многосторонняя сверка нескольких промежуточных файлов паспортов и сайзингов.
+    """
+    from compare_sources import compare_source_files
+
+    compare_source_files(args.passport or [], args.sizing or [], args.output,
+                         sizing_tolerances=tolerances_from_args(args.tolerance))
+
+
+def command_extract(args: argparse.Namespace) -> None:
+    """
+    Подкоманда extract: выгрузка ВМ из промежуточного файла паспорта в Excel.
+    """
+    from json_extractor import export_json_to_excel
+
+    export_json_to_excel(args.passport, args.output)
+
+
+def command_run(args: argparse.Namespace) -> None:
+    """
+    Подкоманда run: полный цикл сверки.
+    """
+    run_pipeline(
+        args.html, args.excel, args.output,
+        html_engine=args.engine,
+        excel_engine=args.excel_engine,
+        sizing_cache_dir=args.cache_dir,
+        section_cache_dir=args.section_cache_dir,
+        compare_engine=args.compare_engine,
+        sizing_tolerances=tolerances_from_args(args.tolerance),
+        fuzzy_min_score=args.fuzzy_min_score,
+        excel_all_sheets=args.all_sheets,
+        html_workers=args.workers,
+        snapshot_file=args.delta,
+        html_json_file=args.html_json,
+        excel_json_file=args.excel_json
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Создает разбор аргументов командной строки с подкомандами.
+
+    :return: Настроенный ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(description="Сверка паспорта ВМ (HTML) с сайзингом (Excel)")
+    parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
+
+    # Общие параметры замеров для всех подкоманд
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--run-report', default=None,
+                        help="JSON-отчет о времени, объеме и памяти по этапам, например run_report.json")
+    common.add_argument('--profile', default=None, help="Дамп cProfile для pstats/snakeviz, например run.prof")
+    common.add_argument('--trace-memory', action='store_true',
+                        help="Замерять пиковую память этапов через tracemalloc (замедляет выполнение)")
+
+    html_options = argparse.ArgumentParser(add_help=False)
+    html_options.add_argument('--engine', choices=['bs4', 'lxml'], default='bs4', help="Движок парсинга HTML")
+    html_options.add_argument('--section-cache-dir', default=None,
+                              help="Каталог кэша разделов паспорта (инкрементальный разбор)")
+    html_options.add_argument('--workers', type=int, default=1,
+                              help="Количество процессов для разбора разделов паспорта")
+
+    excel_options = argparse.ArgumentParser(add_help=False)
+    excel_options.add_argument('--excel-engine', choices=['pandas', 'openpyxl'], default='pandas',
+                               help="Движок чтения Excel")
+    excel_options.add_argument('--cache-dir', default='.sizing_cache',
+                               help="Каталог кэша разобранных файлов сайзинга (пустая строка - не использовать)")
+    excel_options.add_argument('--all-sheets', action='store_true',
+                               help="Читать все листы с требуемыми колонками, а не только 'Support'")
+
+    compare_options = argparse.ArgumentParser(add_help=False)
+    compare_options.add_argument('--compare-engine', choices=['python', 'pandas'], default='python',
+                                 help="Движок сравнения")
+    compare_options.add_argument('--tolerance', type=parse_tolerance, action='append', default=None,
+                                 help="Допуск по полю сайзинга (cpu, ram, hdd_sys, hdd_app), например hdd_sys=10; "
+                                      "можно указать несколько раз")
+    compare_options.add_argument('--fuzzy-min-score', type=float, default=None,
+                                 help="Порог сходства похожих имен несопоставленных серверов, например 0.8")
+    compare_options.add_argument('--delta', default=None, metavar='SNAPSHOT',
+                                 help="Файл снимка предыдущего запуска: записать в --output только изменения "
+                                      "с прошлого запуска и обновить снимок")
+
+    subparsers = parser.add_subparsers(dest='command', metavar='КОМАНДА')
+
+    parse_parser = subparsers.add_parser('parse', parents=[common, html_options],
+                                         help="Разобрать HTML-паспорт в промежуточный файл")
+    parse_parser.add_argument('--html', default='page.html', help="HTML-файл паспорта")
+    parse_parser.add_argument('--output', default='result.ndjson', help="Промежуточный файл паспорта (.ndjson или .json)")
+    parse_parser.set_defaults(handler=command_parse)
+
+    ingest_parser = subparsers.add_parser('ingest', parents=[common, excel_options],
+                                          help="Прочитать Excel-сайзинг в промежуточный файл")
+    ingest_parser.add_argument('--excel', default='data.xlsx', help="Excel-файл сайзинга")
+    ingest_parser.add_argument('--output', default='excel_data.ndjson',
+                               help="Промежуточный файл сайзинга (.ndjson или .json)")
+    ingest_parser.set_defaults(handler=command_ingest)
+
+    compare_parser = subparsers.add_parser('compare', parents=[common, compare_options],
+                                           help="Сравнить готовые промежуточные файлы")
+    compare_parser.add_argument('--passport', default='result.ndjson', help="Промежуточный файл паспорта")
+    compare_parser.add_argument('--sizing', default='excel_data.ndjson', help="Промежуточный файл сайзинга")
+    compare_parser.add_argument('--output', default='comparison_result.xlsx', help="Выходной Excel-файл")
+    compare_parser.set_defaults(handler=command_compare)
+
+    reconcile_parser = subparsers.add_parser('reconcile', parents=[common],
+                                             help="Сверить несколько паспортов и сайзингов за один проход")
+    reconcile_parser.add_argument('--passport', action='append', default=None,
+                                  help="Промежуточный файл паспорта; можно указать несколько раз")
+    reconcile_parser.add_argument('--sizing', action='append', default=None,
+                                  help="Промежуточный файл сайзинга; можно указать несколько раз")
+    reconcile_parser.add_argument('--tolerance', type=parse_tolerance, action='append', default=None,
+                                  help="Допуск по полю сайзинга (cpu, ram, hdd_sys, hdd_app), например hdd_sys=10")
+    reconcile_parser.add_argument('--output', default='reconciliation_result.xlsx', help="Выходной Excel-файл")
+    reconcile_parser.set_defaults(handler=command_reconcile)
+
+    extract_parser = subparsers.add_parser('extract', parents=[common],
+                                           help="Выгрузить ВМ из промежуточного файла паспорта в Excel")
+    extract_parser.add_argument('--passport', default='result.ndjson', help="Промежуточный файл паспорта")
+    extract_parser.add_argument('--output', default='json_data.xlsx', help="Выходной Excel-файл")
+    extract_parser.set_defaults(handler=command_extract)
+
+    run_parser = subparsers.add_parser('run', parents=[common, html_options, excel_options, compare_options],
+                                       help="Полный цикл сверки (по умолчанию)")
+    run_parser.add_argument('--html', default='page.html', help="HTML-файл паспорта")
+    run_parser.add_argument('--excel', default='data.xlsx', help="Excel-файл сайзинга")
+    run_parser.add_argument('--output', default='comparison_result.xlsx', help="Выходной Excel-файл")
+    run_parser.add_argument('--html-json', default=None,
+                            help="Сохранить промежуточный файл паспорта для отладки (.ndjson или .json)")
+    run_parser.add_argument('--excel-json', default=None,
+                            help="Сохранить промежуточный файл сайзинга для отладки (.ndjson или .json)")
+    run_parser.set_defaults(handler=command_run)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Основная функция приложения: разбирает подкоманду и выполняет ее.
+    Без подкоманды выполняется полный цикл сверки (run) с параметрами по умолчанию.
+
+    :param argv: Аргументы командной строки (по умолчанию sys.argv[1:]).
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(['run'])
+
+    setup_logging()
+
+    try:
+        with instrument_run(args.run_report, args.profile, args.trace_memory):
+            args.handler(args)
+
+        logging.info(f"Скрипт успешно выполнен. Результаты сохранены в файле {args.output}")
 
     except Exception as e:
         logging.error(f"Произошла ошибка при выполнении скрипта: {e}")
@@ -0,0 +1,100 @@
+# ndjson_io.py
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+# Расширения файлов промежуточного формата: одна JSON-запись на строку
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+# Поля записи ВМ паспорта в промежуточном формате
+PASSPORT_RECORD_FIELDS = ('Раздел', 'Наименование', 'Роль', 'Имя сервера', 'IP адрес', 'Сайзинг')
+
+
+def is_ndjson(file_path: str) -> bool:
+    """
+    Проверяет по расширению, что файл в построчном формате NDJSON.
+
+    :param file_path: Путь к файлу.
+    :return: True для файлов .ndjson и .jsonl.
+    """
+    return file_path.lower().endswith(NDJSON_EXTENSIONS)
+
+
+class NdjsonWriter:
+    """
+    Потоковая запись NDJSON: каждая запись - одна компактная строка JSON.
+
+    Используется как контекстный менеджер; в режиме append записи добавляются в конец файла.
+    """
+
+    def __init__(self, ndjson_file: str, append: bool = False) -> None:
+        """
+        :param ndjson_file: Путь к выходному NDJSON-файлу.
+        :param append: Дописывать в существующий файл вместо перезаписи.
+        """
+        self.ndjson_file = ndjson_file
+        self.append = append
+        self.count = 0
+        self._file: Optional[TextIO] = None
+
+    def __enter__(self) -> 'NdjsonWriter':
+        self._file = open(self.ndjson_file, 'a' if self.append else 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """
+        Записывает одну запись.
+
+        :param record: Запись для сохранения.
+        """
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+        self._file.write('\n')
+        self.count += 1
+
+
+def write_records(records: Iterable[Dict[str, Any]], ndjson_file: str, append: bool = False) -> int:
+    """
+    Сохраняет записи в NDJSON-файл.
+
+    :param records: Записи (например, строки сайзинга).
+    :param ndjson_file: Путь к выходному NDJSON-файлу.
+    :param append: Дописывать в существующий файл вместо перезаписи.
+    :return: Количество записанных записей.
+    :raises Exception: Если не удалось сохранить файл.
+    """
+    try:
+        with NdjsonWriter(ndjson_file, append) as writer:
+            for record in records:
+                writer.write(record)
+        logging.info(f"Записей сохранено в NDJSON-файл {ndjson_file}: {writer.count}")
+        return writer.count
+    except Exception as e:
+        logging.error(f"Не удалось сохранить NDJSON-файл {ndjson_file}: {e}")
+        raise
+
+
+def iter_records(ndjson_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Читает NDJSON-файл по одной записи, не загружая файл целиком. Пустые строки пропускаются.
+
+    :param ndjson_file: Путь к NDJSON-файлу.
+    :return: Генератор записей.
+    :raises FileNotFoundError: Если файл не найден.
+    :raises json.JSONDecodeError: Если строка содержит некорректный JSON.
+    """
+    logging.info(f"Потоковое чтение NDJSON-файла: {ndjson_file}")
+    with open(ndjson_file, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as jde:
+                logging.error(f"Ошибка декодирования строки {line_number} NDJSON-файла {ndjson_file}: {jde}")
+                raise
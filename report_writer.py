@@ -0,0 +1,152 @@
+# report_writer.py
+
+import logging
+import pickle
+import tempfile
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+# Цвета подсветки отчета
+FILL_COLORS = {
+    'red': 'FFC7CE',
+    'blue': 'ADD8E6'  # Светло-синий
+}
+
+# Запас ширины колонки относительно самого длинного значения
+WIDTH_PADDING = 2
+
+
+class ReportSection(NamedTuple):
+    """
+    Раздел отчета: заголовок и строки сравнения.
+
+    Строка - словарь с ключами 'data' (значения по заголовкам колонок),
+    'red_cells' (колонки, подсвечиваемые красным) и 'full_row_color'
+    ('red'/'blue' для подсветки всей строки или None).
+    Если headers не заданы, раздел использует общие заголовки отчета.
+    """
+    title: str
+    rows: Iterable[Dict[str, Any]]
+    headers: Optional[List[str]] = None
+
+
+def write_report_sections(output_excel_file: str, headers: List[str],
+                          sections: Iterable[ReportSection]) -> List[Dict[str, int]]:
+    """
+    Потоково записывает разделы отчета в Excel-файл через openpyxl в режиме write_only.
+
+    Строки читаются из итераторов разделов один раз: значения сразу сбрасываются во
+    временный файл, а ширина колонок накапливается по мере чтения. Формат XLSX требует
+    ширины колонок до строк листа, поэтому лист пишется вторым проходом по временному
+    файлу. Заливки и шрифты создаются один раз и разделяются всеми ячейками.
+
+    :param output_excel_file: Путь к выходному Excel файлу.
+    :param headers: Заголовки колонок разделов без собственных заголовков.
+    :param sections: Разделы отчета в порядке вывода.
+    :return: Для каждого раздела количество строк ('rows') и строк с подсветкой ячеек ('highlighted').
+    """
+    widths: List[int] = []
+    stats: List[Dict[str, int]] = []
+
+    def track(values: Iterable[Any]) -> None:
+        for idx, value in enumerate(values):
+            if idx == len(widths):
+                widths.append(0)
+            if value is not None:
+                length = len(str(value))
+                if length > widths[idx]:
+                    widths[idx] = length
+
+    with tempfile.TemporaryFile() as spool:
+        pickler = pickle.Pickler(spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Первый проход: сброс строк во временный файл и подсчет ширины колонок
+        for section in sections:
+            section_headers = section.headers or headers
+            column_index = {header: idx for idx, header in enumerate(section_headers)}
+            track([section.title])
+            track(section_headers)
+            pickler.dump((section.title, section_headers))
+            rows = 0
+            highlighted = 0
+            for entry in section.rows:
+                data = entry['data']
+                values = tuple(data.get(header, '') for header in section_headers)
+                track(values)
+                red_cells = tuple(column_index[col] for col in entry.get('red_cells', ()) if col in column_index)
+                pickler.dump((values, entry.get('full_row_color'), red_cells))
+                rows += 1
+                if red_cells:
+                    highlighted += 1
+            # Конец раздела
+            pickler.dump(None)
+            stats.append({'rows': rows, 'highlighted': highlighted})
+
+        # Второй проход: запись листа
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        for idx, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = width + WIDTH_PADDING
+
+        fills = {color: PatternFill(start_color=code, end_color=code, fill_type='solid')
+                 for color, code in FILL_COLORS.items()}
+        bold_font = Font(bold=True)
+
+        spool.seek(0)
+        unpickler = pickle.Unpickler(spool)
+        for section_idx in range(len(stats)):
+            if section_idx:
+                # Пустая строка между разделами
+                ws.append([])
+            title, section_headers = unpickler.load()
+            title_cell = WriteOnlyCell(ws, value=title)
+            title_cell.font = bold_font
+            ws.append([title_cell])
+            ws.append(section_headers)
+
+            entry = unpickler.load()
+            while entry is not None:
+                values, full_row_color, red_cells = entry
+                ws.append(styled_row(ws, values, full_row_color, red_cells, fills))
+                entry = unpickler.load()
+
+        wb.save(output_excel_file)
+
+    logging.info(f"Отчет сохранен в файле {output_excel_file}")
+    return stats
+
+
+def styled_row(ws: Any, values: Tuple[Any, ...], full_row_color: Optional[str],
+               red_cells: Tuple[int, ...], fills: Dict[str, PatternFill]) -> List[Any]:
+    """
+    Формирует строку листа write_only с подсветкой ячеек.
+
+    :param ws: Лист write_only.
+    :param values: Значения строки по колонкам.
+    :param full_row_color: Цвет подсветки всей строки или None.
+    :param red_cells: Индексы колонок, подсвечиваемых красным.
+    :param fills: Общие заливки по цветам.
+    :return: Значения и ячейки WriteOnlyCell для ws.append.
+    """
+    if full_row_color:
+        fill = fills[full_row_color]
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.fill = fill
+            row.append(cell)
+        return row
+
+    if not red_cells:
+        return list(values)
+
+    row = list(values)
+    for idx in red_cells:
+        cell = WriteOnlyCell(ws, value=values[idx])
+        cell.fill = fills['red']
+        row[idx] = cell
+    return row
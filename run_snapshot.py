@@ -0,0 +1,92 @@
+# run_snapshot.py
+
+import hashlib
+import logging
+import os
+import pickle
+from typing import Dict, Optional, Sequence, Tuple
+
+from canonical import value_text
+from vm_record import VmRecord
+
+logger = logging.getLogger(__name__)
+
+# Версия формата снимка; при изменении правил сравнения старые снимки не используются
+SNAPSHOT_VERSION = 1
+
+# Размер отпечатка данных сервера, байт
+DIGEST_SIZE = 8
+
+# Статусы сервера в снимке
+STATUS_MATCHED = 'matched'
+STATUS_MISMATCH = 'mismatch'
+STATUS_MISSING_IN_PASSPORT = 'missing_in_passport'
+STATUS_MISSING_IN_SIZING = 'missing_in_sizing'
+
+# Статус сервера в снимке: (статус, отпечаток данных паспорта, отпечаток данных сайзинга)
+ServerState = Tuple[str, Optional[bytes], Optional[bytes]]
+
+
+def server_digest(item: Optional[VmRecord]) -> Optional[bytes]:
+    """
+    Вычисляет отпечаток сравниваемых данных сервера: IP-адреса и сайзинга.
+
+    :param item: Запись сервера из build_dict1/build_dict2 или None, если сервера нет в источнике.
+    :return: Отпечаток или None.
+    """
+    if item is None:
+        return None
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    digest.update(value_text(item.ip).encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(value_text(item.sizing).encode('utf-8'))
+    return digest.digest()
+
+
+def load_snapshot(snapshot_file: str, tolerance: Sequence[float]) -> Optional[Dict[str, ServerState]]:
+    """
+    Загружает снимок предыдущего запуска.
+
+    :param snapshot_file: Путь к файлу снимка.
+    :param tolerance: Допуски текущего сравнения; снимок с другими допусками не используется.
+    :return: Статусы серверов по нормализованным именам или None, если снимка нет или он не подходит.
+    """
+    try:
+        with open(snapshot_file, 'rb') as file:
+            payload = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Поврежденный снимок {snapshot_file} будет пересоздан: {e}")
+        return None
+
+    if (not isinstance(payload, dict) or payload.get('version') != SNAPSHOT_VERSION
+            or not isinstance(payload.get('servers'), dict)):
+        logger.warning(f"Снимок {snapshot_file} сохранен в другом формате и не используется")
+        return None
+    if tuple(payload.get('tolerance', ())) != tuple(tolerance):
+        logger.warning(f"Снимок {snapshot_file} построен с другими допусками сайзинга и не используется")
+        return None
+    return payload['servers']
+
+
+def save_snapshot(snapshot_file: str, servers: Dict[str, ServerState], tolerance: Sequence[float]) -> None:
+    """
+    Сохраняет снимок текущего запуска.
+
+    :param snapshot_file: Путь к файлу снимка.
+    :param servers: Статусы серверов по нормализованным именам.
+    :param tolerance: Допуски сравнения, с которыми вычислены статусы.
+    :raises OSError: Если не удалось сохранить файл.
+    """
+    try:
+        os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+        tmp_path = f'{snapshot_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'tolerance': tuple(tolerance), 'servers': servers}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_file)
+        logger.info(f"Снимок сверки сохранен в файле {snapshot_file}: серверов {len(servers)}")
+    except OSError as e:
+        logger.error(f"Не удалось сохранить снимок сверки {snapshot_file}: {e}")
+        raise
@@ -0,0 +1,86 @@
+# section_cache.py
+
+import hashlib
+import logging
+import os
+import pickle
+from typing import Dict, List
+from vm_record import VmRecord
+
+logger = logging.getLogger(__name__)
+
+# Каталог кэша разделов по умолчанию
+DEFAULT_SECTION_CACHE_DIR = '.section_cache'
+
+# Версия формата кэша; при изменении разбора разделов старые записи не используются
+SECTION_CACHE_VERSION = 3
+
+
+def section_fingerprint(markup: str, engine: str) -> str:
+    """
+    Вычисляет отпечаток исходной разметки раздела.
+
+    :param markup: HTML-код раздела.
+    :param engine: Движок парсинга, которым разбирается раздел.
+    :return: Шестнадцатеричный отпечаток.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{SECTION_CACHE_VERSION}:{engine}:'.encode('utf-8'))
+    digest.update(markup.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def section_cache_path(cache_dir: str, html_file: str) -> str:
+    """
+    Возвращает путь к файлу кэша разделов для HTML-файла.
+
+    :param cache_dir: Каталог кэша разделов.
+    :param html_file: Путь к HTML-файлу.
+    :return: Путь к файлу кэша.
+    """
+    name = hashlib.sha256(os.path.abspath(html_file).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{name}.pkl')
+
+
+def load_section_cache(cache_file: str) -> Dict[str, List[VmRecord]]:
+    """
+    Загружает кэш разделов: отпечаток разметки -> записи ВМ раздела.
+
+    :param cache_file: Путь к файлу кэша.
+    :return: Словарь кэша; пустой, если файла нет или он поврежден.
+    """
+    try:
+        with open(cache_file, 'rb') as file:
+            payload = pickle.load(file)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Поврежденный кэш разделов {cache_file} будет пересоздан: {e}")
+        return {}
+
+    # Кэш старого или чужого формата считается промахом, как и в кэше сайзинга
+    sections = None
+    if isinstance(payload, dict) and payload.get('version') == SECTION_CACHE_VERSION:
+        sections = payload.get('sections')
+    if not isinstance(sections, dict):
+        logger.warning(f"Кэш разделов {cache_file} сохранен в другом формате и будет пересоздан")
+        return {}
+    return sections
+
+
+def save_section_cache(cache_file: str, sections: Dict[str, List[VmRecord]]) -> None:
+    """
+    Сохраняет кэш разделов.
+
+    :param cache_file: Путь к файлу кэша.
+    :param sections: Словарь кэша: отпечаток разметки -> записи ВМ раздела.
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        tmp_path = f'{cache_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'version': SECTION_CACHE_VERSION, 'sections': sections}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш разделов {cache_file}: {e}")
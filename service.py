@@ -0,0 +1,534 @@
+# service.py
+
+import argparse
+import asyncio
+import email.policy
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from instrumentation import instrument_run
+from main import setup_logging
+
+# Сервис принимает соединения только с локальной машины
+HOST = '127.0.0.1'
+
+# Порт по умолчанию
+DEFAULT_PORT = 8765
+
+# Запросов, ожидающих свободного процесса, сверх числа процессов; остальным отвечает 503
+DEFAULT_QUEUE_SIZE = 8
+
+# Максимальный размер тела запроса, МБ
+DEFAULT_MAX_UPLOAD_MB = 100
+
+# Каталог загруженных файлов сайзинга, на которые можно ссылаться по имени
+DEFAULT_SIZING_DIR = 'sizing'
+
+# Максимальное время чтения запроса от клиента, с
+REQUEST_READ_TIMEOUT = 60
+
+# Максимальный размер строки запроса и заголовков, байт
+MAX_HEADER_SIZE = 64 * 1024
+
+# Допустимое имя загруженного файла сайзинга
+SIZING_NAME_RE = re.compile(r'^[\w][\w.-]{0,127}$')
+
+# Форматы результата сверки
+REPORT_FORMATS = ('xlsx', 'json')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HTTP_REASONS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+
+class HttpError(Exception):
+    """
+    Ошибка обработки запроса, возвращаемая клиенту с кодом статуса.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class HttpRequest(NamedTuple):
+    """
+    Разобранный HTTP-запрос.
+    """
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes
+
+
+class HttpResponse(NamedTuple):
+    """
+    Ответ на HTTP-запрос.
+    """
+    status: int
+    body: bytes
+    content_type: str = 'application/json; charset=utf-8'
+    headers: Dict[str, str] = {}
+
+
+def json_response(status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+    """
+    :param status: Код статуса.
+    :param data: Данные для JSON.
+    :param headers: Дополнительные заголовки.
+    :return: Ответ с JSON-телом.
+    """
+    return HttpResponse(status, json.dumps(data, ensure_ascii=False).encode('utf-8'), headers=headers or {})
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    Формирует заголовок Server-Timing.
+
+    :param timings: Время этапов, с.
+    :return: Значение заголовка, например 'queue;dur=1.2, parse_html;dur=350.0'.
+    """
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+async def read_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, max_body: int,
+                       admit: Optional[Callable[[str, str], None]] = None) -> HttpRequest:
+    """
+    Читает HTTP/1.1-запрос с телом фиксированной длины.
+
+    :param reader: Поток чтения соединения.
+    :param writer: Поток записи соединения (для ответа 100 Continue).
+    :param max_body: Максимальный размер тела, байт.
+    :param admit: Проверка метода и пути после чтения заголовков, до чтения тела;
+                  отклоняет запрос исключением HttpError.
+    :return: Разобранный запрос.
+    :raises HttpError: Если запрос некорректен, тело слишком велико или запрос отклонен admit.
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "Слишком длинные заголовки запроса")
+    except asyncio.IncompleteReadError:
+        raise HttpError(400, "Соединение закрыто до окончания заголовков")
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, f"Некорректная строка запроса: {lines[0]!r}")
+
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise HttpError(411, "Требуется заголовок Content-Length")
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        raise HttpError(400, "Некорректный заголовок Content-Length")
+    if length > max_body:
+        raise HttpError(413, f"Размер запроса превышает {max_body // (1024 * 1024)} МБ")
+
+    url = urlsplit(target)
+    if admit is not None:
+        admit(method.upper(), url.path)
+
+    if length and headers.get('expect', '').lower() == '100-continue':
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        await writer.drain()
+    try:
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise HttpError(400, "Соединение закрыто до окончания тела запроса")
+
+    return HttpRequest(method.upper(), url.path, dict(parse_qsl(url.query)), headers, body)
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """
+    Разбирает тело multipart/form-data.
+
+    :param content_type: Заголовок Content-Type запроса (с параметром boundary).
+    :param body: Тело запроса.
+    :return: Содержимое полей по именам.
+    :raises HttpError: Если тело не является multipart.
+    """
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    if not message.is_multipart():
+        raise HttpError(400, "Ожидается multipart/form-data")
+    fields: Dict[str, bytes] = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True) or b''
+    return fields
+
+
+def input_errors() -> Tuple[type, ...]:
+    """
+    :return: Исключения, которыми чтение входных файлов сообщает о некорректном содержимом
+             (ошибка в данных, поврежденный или не Excel-файл, отсутствующий элемент книги);
+             на них отвечает 400, а не 500.
+    """
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    return ValueError, KeyError, zipfile.BadZipFile, InvalidFileException
+
+
+def write_temp_file(directory: str, name: str, content: bytes) -> str:
+    """
+    :param directory: Каталог.
+    :param name: Имя файла.
+    :param content: Содержимое.
+    :return: Путь к записанному файлу.
+    """
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as file:
+        file.write(content)
+    return path
+
+
+def reconcile_job(html_content: bytes, sizing_file: Optional[str], sizing_content: Optional[bytes],
+                  report_format: str, settings: Dict[str, Any]) -> Tuple[bytes, Dict[str, float]]:
+    """
+    Выполняет сверку в процессе пула: разбор паспорта, чтение сайзинга и сравнение.
+
+    :param html_content: HTML-код паспорта.
+    :param sizing_file: Путь к сохраненному файлу сайзинга или None, если сайзинг загружен с запросом.
+    :param sizing_content: Содержимое загруженного с запросом файла сайзинга или None.
+    :param report_format: 'xlsx' - Excel-отчет, 'json' - различия в JSON.
+    :param settings: Движки и каталог кэша сайзинга.
+    :return: Тело ответа и время этапов, с.
+    """
+    from html_to_json import parse_html_to_json
+    from excel_to_json import excel_to_json
+    from compare_json import compare_data, diff_data
+
+    with tempfile.TemporaryDirectory() as work_dir, instrument_run() as report:
+        html_file = write_temp_file(work_dir, 'page.html', html_content)
+        if sizing_content is not None:
+            sizing_file = write_temp_file(work_dir, 'data.xlsx', sizing_content)
+
+        passport_data = parse_html_to_json(html_file, engine=settings['engine'])
+        # Кэш сайзинга адресуется содержимым файла, поэтому повторная загрузка того же файла его не перечитывает
+        sizing_data = excel_to_json(sizing_file, engine=settings['excel_engine'], cache_dir=settings['cache_dir'])
+
+        if report_format == 'json':
+            diff = diff_data(passport_data, sizing_data, engine=settings['compare_engine'])
+            body = json.dumps(diff, ensure_ascii=False).encode('utf-8')
+        else:
+            output_file = os.path.join(work_dir, 'comparison_result.xlsx')
+            compare_data(passport_data, sizing_data, output_file, engine=settings['compare_engine'])
+            with open(output_file, 'rb') as file:
+                body = file.read()
+
+    return body, {name: stats.seconds for name, stats in report.stages.items()}
+
+
+def load_sizing_job(sizing_file: str, settings: Dict[str, Any]) -> int:
+    """
+    Читает сохраненный файл сайзинга в процессе пула, заполняя кэш сайзинга.
+
+    :param sizing_file: Путь к файлу сайзинга.
+    :param settings: Движки и каталог кэша сайзинга.
+    :return: Количество записей сайзинга.
+    """
+    from excel_to_json import excel_to_json
+
+    return len(excel_to_json(sizing_file, engine=settings['excel_engine'], cache_dir=settings['cache_dir']))
+
+
+class ReconcileService:
+    """
+    HTTP-сервис сверки на asyncio.
+
+    Разбор и сравнение выполняются в пуле из workers процессов, поэтому цикл событий
+    не блокируется. Одновременно выполняется не больше workers сверок, еще queue_size
+    запросов ожидают свободного процесса; остальным сразу отвечает 503 с Retry-After.
+    """
+
+    def __init__(self, workers: int, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB, sizing_dir: str = DEFAULT_SIZING_DIR,
+                 cache_dir: Optional[str] = '.sizing_cache', engine: str = 'bs4', excel_engine: str = 'pandas',
+                 compare_engine: str = 'python') -> None:
+        """
+        :param workers: Количество процессов сверки.
+        :param queue_size: Количество запросов, ожидающих свободного процесса.
+        :param max_upload_mb: Максимальный размер тела запроса, МБ.
+        :param sizing_dir: Каталог загруженных файлов сайзинга.
+        :param cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+        :param engine: Движок парсинга HTML: 'bs4' или 'lxml'.
+        :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+        :param compare_engine: Движок сравнения: 'python' или 'pandas'.
+        """
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.max_body = max_upload_mb * 1024 * 1024
+        self.sizing_dir = sizing_dir
+        self.settings = {'engine': engine, 'excel_engine': excel_engine, 'compare_engine': compare_engine,
+                         'cache_dir': cache_dir}
+        self.pending = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+
+    async def run_job(self, func: Any, *args: Any) -> Tuple[Any, float]:
+        """
+        Выполняет функцию в пуле процессов с ограничением очереди.
+
+        :param func: Функция уровня модуля.
+        :param args: Аргументы функции.
+        :return: Результат функции и время ожидания свободного процесса, с.
+        :raises HttpError: Если очередь заполнена, входные файлы некорректны (input_errors)
+                           или процесс пула аварийно завершился.
+        """
+        self.check_queue()
+        self.pending += 1
+        try:
+            start = time.perf_counter()
+            async with self.slots:
+                queued = time.perf_counter() - start
+                executor = self.executor
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+                except BrokenProcessPool as e:
+                    self.restart_executor(executor)
+                    raise HttpError(500, f"Процесс сверки аварийно завершился: {e}")
+            return result, queued
+        except input_errors() as e:
+            raise HttpError(400, str(e) if isinstance(e, ValueError) else f"Некорректный входной файл: {e}")
+        finally:
+            self.pending -= 1
+
+    def check_queue(self) -> None:
+        """
+        :raises HttpError: 503, если очередь запросов заполнена.
+        """
+        if self.pending >= self.max_pending:
+            raise HttpError(503, "Сервис занят, повторите запрос позже")
+
+    def admit(self, method: str, path: str) -> None:
+        """
+        Отклоняет запрос сверки или загрузки сайзинга при заполненной очереди до чтения тела,
+        чтобы не принимать впустую загрузку размером до max_upload_mb.
+
+        :param method: Метод запроса.
+        :param path: Путь запроса.
+        :raises HttpError: 503, если очередь запросов заполнена.
+        """
+        if path == '/reconcile' or path.startswith('/sizing/'):
+            self.check_queue()
+
+    def restart_executor(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Заменяет пул процессов, в котором процесс аварийно завершился (например, из-за нехватки памяти):
+        такой пул отклоняет все следующие задачи.
+
+        :param broken: Пул, в котором выполнялась задача; если он уже заменен, ничего не делается.
+        """
+        if self.executor is not broken:
+            return
+        logging.error("Пул процессов сверки поврежден, создается новый пул")
+        broken.shutdown(wait=False)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def sizing_path(self, name: str) -> str:
+        """
+        :param name: Имя загруженного файла сайзинга.
+        :return: Путь к файлу в каталоге сайзинга.
+        :raises HttpError: Если имя недопустимо.
+        """
+        if not SIZING_NAME_RE.match(name) or '..' in name:
+            raise HttpError(400, f"Недопустимое имя сайзинга: {name}")
+        return os.path.join(self.sizing_dir, name if name.endswith('.xlsx') else name + '.xlsx')
+
+    async def handle_reconcile(self, request: HttpRequest) -> HttpResponse:
+        """
+        POST /reconcile: сверка загруженного паспорта.
+
+        Тело - multipart/form-data с полем passport (HTML) и необязательным полем sizing (Excel)
+        или HTML-код паспорта целиком. Без поля sizing используется сохраненный сайзинг
+        из параметра ?sizing=имя. Параметр ?format=xlsx|json выбирает Excel-отчет или JSON с различиями.
+        """
+        report_format = request.query.get('format', 'xlsx')
+        if report_format not in REPORT_FORMATS:
+            raise HttpError(400, f"Неизвестный формат: {report_format}. Допустимые значения: {REPORT_FORMATS}")
+
+        content_type = request.headers.get('content-type', '')
+        if content_type.lower().startswith('multipart/form-data'):
+            fields = parse_multipart(content_type, request.body)
+            html_content = fields.get('passport')
+            sizing_content = fields.get('sizing')
+        else:
+            html_content, sizing_content = request.body, None
+        if not html_content:
+            raise HttpError(400, "Не передан HTML-код паспорта")
+
+        sizing_file = None
+        if sizing_content is None:
+            name = request.query.get('sizing')
+            if not name:
+                raise HttpError(400, "Не передан сайзинг: поле sizing или параметр ?sizing=имя")
+            sizing_file = self.sizing_path(name)
+            if not os.path.exists(sizing_file):
+                raise HttpError(404, f"Сайзинг не найден: {name}")
+
+        (body, timings), queued = await self.run_job(reconcile_job, html_content, sizing_file, sizing_content,
+                                                     report_format, self.settings)
+        timings = {'queue': queued, **timings}
+        if report_format == 'json':
+            return HttpResponse(200, body, headers={'Server-Timing': server_timing(timings)})
+        return HttpResponse(200, body, XLSX_CONTENT_TYPE, {
+            'Server-Timing': server_timing(timings),
+            'Content-Disposition': 'attachment; filename="comparison_result.xlsx"'
+        })
+
+    async def handle_sizing_upload(self, request: HttpRequest, name: str) -> HttpResponse:
+        """
+        PUT /sizing/<имя>: сохраняет файл сайзинга для ссылок из /reconcile и разбирает его в кэш.
+        """
+        if not request.body:
+            raise HttpError(400, "Пустой файл сайзинга")
+        path = self.sizing_path(name)
+        os.makedirs(self.sizing_dir, exist_ok=True)
+        # Файл заменяется атомарно, чтобы параллельная сверка не прочитала его частично
+        handle, temp_path = tempfile.mkstemp(suffix='.xlsx', prefix='.upload-', dir=self.sizing_dir)
+        with os.fdopen(handle, 'wb') as file:
+            file.write(request.body)
+        try:
+            records, queued = await self.run_job(load_sizing_job, temp_path, self.settings)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        os.replace(temp_path, path)
+        return json_response(201, {'sizing': name, 'records': records},
+                             {'Server-Timing': server_timing({'queue': queued})})
+
+    async def dispatch(self, request: HttpRequest) -> HttpResponse:
+        """
+        Направляет запрос обработчику по методу и пути.
+        """
+        if request.path == '/health':
+            return json_response(200, {'status': 'ok', 'workers': self.workers, 'pending': self.pending})
+        if request.path == '/reconcile':
+            if request.method != 'POST':
+                raise HttpError(405, "Ожидается метод POST")
+            return await self.handle_reconcile(request)
+        if request.path.startswith('/sizing/'):
+            if request.method != 'PUT':
+                raise HttpError(405, "Ожидается метод PUT")
+            return await self.handle_sizing_upload(request, request.path[len('/sizing/'):])
+        raise HttpError(404, f"Неизвестный путь: {request.path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Обрабатывает одно соединение: один запрос и ответ, после чего соединение закрывается.
+        """
+        start = time.perf_counter()
+        method, path = '-', '-'
+        try:
+            request = await asyncio.wait_for(read_request(reader, writer, self.max_body, self.admit),
+                                             REQUEST_READ_TIMEOUT)
+            method, path = request.method, request.path
+            response = await self.dispatch(request)
+        except HttpError as e:
+            response = json_response(e.status, {'error': e.message},
+                                     {'Retry-After': '1'} if e.status == 503 else None)
+        except asyncio.TimeoutError:
+            response = json_response(408, {'error': "Превышено время чтения запроса"})
+        except Exception as e:
+            logging.exception(f"Ошибка обработки запроса {method} {path}: {e}")
+            response = json_response(500, {'error': str(e)})
+
+        elapsed = time.perf_counter() - start
+        headers = {
+            'Content-Type': response.content_type,
+            'Content-Length': str(len(response.body)),
+            'Connection': 'close',
+            **response.headers
+        }
+        headers['Server-Timing'] = ', '.join(filter(None, [headers.get('Server-Timing'),
+                                                           server_timing({'total': elapsed})]))
+        head = f"HTTP/1.1 {response.status} {HTTP_REASONS.get(response.status, '')}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + '\r\n'
+        try:
+            writer.write(head.encode('latin-1') + response.body)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError as e:
+            logging.warning(f"Клиент закрыл соединение до получения ответа: {e}")
+        logging.info(f"{method} {path} {response.status} за {elapsed:.2f} с")
+
+    async def serve(self, port: int = DEFAULT_PORT) -> None:
+        """
+        Запускает сервис и обслуживает запросы до прерывания.
+
+        :param port: Порт на локальном адресе HOST.
+        """
+        self.slots = asyncio.Semaphore(self.workers)
+        # Пул создается и закрывается вручную: restart_executor может заменить его во время работы
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            server = await asyncio.start_server(self.handle_connection, HOST, port, limit=MAX_HEADER_SIZE)
+            logging.info(f"Сервис сверки запущен: http://{HOST}:{port} (процессов: {self.workers}, "
+                         f"очередь: {self.max_pending - self.workers})")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown()
+
+
+def main() -> None:
+    """
+    Точка входа HTTP-сервиса сверки.
+    """
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервис сверки паспорта с сайзингом")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Порт на {HOST}")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Количество процессов сверки")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Запросов, ожидающих свободного процесса; остальным отвечает 503")
+    parser.add_argument('--max-upload-mb', type=int, default=DEFAULT_MAX_UPLOAD_MB, help="Максимальный размер запроса, МБ")
+    parser.add_argument('--sizing-dir', default=DEFAULT_SIZING_DIR, help="Каталог загруженных файлов сайзинга")
+    parser.add_argument('--cache-dir', default='.sizing_cache',
+                        help="Каталог кэша разобранных файлов сайзинга (пустая строка - не использовать)")
+    parser.add_argument('--engine', choices=['bs4', 'lxml'], default='bs4', help="Движок парсинга HTML")
+    parser.add_argument('--excel-engine', choices=['pandas', 'openpyxl'], default='pandas', help="Движок чтения Excel")
+    parser.add_argument('--compare-engine', choices=['python', 'pandas'], default='python', help="Движок сравнения")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    service = ReconcileService(args.workers, args.queue_size, args.max_upload_mb, args.sizing_dir,
+                               args.cache_dir or None, args.engine, args.excel_engine, args.compare_engine)
+    try:
+        asyncio.run(service.serve(args.port))
+    except KeyboardInterrupt:
+        logging.info("Сервис остановлен")
+    except Exception as e:
+        logging.error(f"Произошла ошибка в сервисе сверки: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
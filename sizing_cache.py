@@ -0,0 +1,244 @@
+# sizing_cache.py
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+from typing import Callable, List, Optional
+from vm_record import VmRecord
+
+logger = logging.getLogger(__name__)
+
+# Каталог кэша по умолчанию
+DEFAULT_CACHE_DIR = '.sizing_cache'
+
+# Максимальный суммарный размер кэша по умолчанию, байт
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Версия формата записей кэша; при изменении формата старые записи не используются
+CACHE_FORMAT_VERSION = 3
+
+# Расширение файлов записей кэша
+CACHE_SUFFIX = '.pkl'
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Вычисляет SHA-256 содержимого файла.
+
+    :param file_path: Путь к файлу.
+    :param chunk_size: Размер блока чтения в байтах.
+    :return: Шестнадцатеричный хэш содержимого.
+    :raises FileNotFoundError: Если файл не найден.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_entry_path(cache_dir: str, source_digest: str, sheet_name: Optional[str], columns: List[str],
+                     engine: str) -> str:
+    """
+    Возвращает путь записи кэша для содержимого файла, листа, набора колонок и движка чтения.
+
+    :param cache_dir: Каталог кэша.
+    :param source_digest: Хэш содержимого Excel-файла.
+    :param sheet_name: Название листа или None для записей всех листов книги.
+    :param columns: Набор извлекаемых колонок.
+    :param engine: Движок чтения Excel.
+    :return: Путь к файлу записи кэша.
+    """
+    params = json.dumps([CACHE_FORMAT_VERSION, sheet_name, sorted(columns), engine], ensure_ascii=False)
+    params_digest = hashlib.sha256(params.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{source_digest}_{params_digest}{CACHE_SUFFIX}')
+
+
+def save_records(entry_path: str, records: List[VmRecord]) -> None:
+    """
+    Сохраняет записи в кэш в колоночном двоичном виде (pickle): имена серверов, IP адреса, сайзинг и листы.
+
+    :param entry_path: Путь к файлу записи кэша.
+    :param records: Записи сайзинга.
+    """
+    payload = {
+        'version': CACHE_FORMAT_VERSION,
+        'columns': [[record.server_name for record in records],
+                    [record.ip for record in records],
+                    [record.sizing for record in records],
+                    [record.sheet for record in records]]
+    }
+    tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, entry_path)
+
+
+def load_records(entry_path: str) -> Optional[List[VmRecord]]:
+    """
+    Загружает записи из кэша.
+
+    :param entry_path: Путь к файлу записи кэша.
+    :return: Записи сайзинга или None, если записи нет, она повреждена или сохранена в другом формате
+             (такая запись удаляется).
+    """
+    try:
+        with open(entry_path, 'rb') as file:
+            payload = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Поврежденная запись кэша {entry_path} будет пересоздана: {e}")
+        discard_entry(entry_path)
+        return None
+
+    # Запись старого или чужого формата (например, список записей) считается промахом кэша
+    columns = None
+    if isinstance(payload, dict) and payload.get('version') == CACHE_FORMAT_VERSION:
+        columns = payload.get('columns')
+    if not isinstance(columns, list) or len(columns) != 4:
+        logger.warning(f"Запись кэша {entry_path} сохранена в другом формате и будет пересоздана")
+        discard_entry(entry_path)
+        return None
+
+    # Отметка использования для вытеснения давно не используемых записей; запись, уже удаленная
+    # вытеснением в другом процессе, прочитана целиком и остается пригодной
+    try:
+        os.utime(entry_path)
+    except OSError as e:
+        logger.debug(f"Не удалось отметить использование записи кэша {entry_path}: {e}")
+    return [VmRecord(server_name, ip, sizing, sheet=sheet) for server_name, ip, sizing, sheet in zip(*columns)]
+
+
+def discard_entry(entry_path: str) -> None:
+    """
+    Удаляет непригодную запись кэша; ошибка удаления не мешает чтению сайзинга.
+
+    :param entry_path: Путь к файлу записи кэша.
+    """
+    try:
+        os.remove(entry_path)
+    except OSError as e:
+        logger.warning(f"Не удалось удалить запись кэша {entry_path}: {e}")
+
+
+def evict(cache_dir: str, max_bytes: int = DEFAULT_MAX_CACHE_BYTES) -> int:
+    """
+    Удаляет давно не используемые записи, пока размер кэша превышает лимит.
+
+    :param cache_dir: Каталог кэша.
+    :param max_bytes: Максимальный суммарный размер записей, байт.
+    :return: Количество удаленных записей.
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+        removed += 1
+
+    if removed:
+        logger.info(f"Из кэша сайзинга вытеснено записей: {removed}")
+    return removed
+
+
+def invalidate(cache_dir: str = DEFAULT_CACHE_DIR, excel_file: Optional[str] = None) -> int:
+    """
+    Удаляет записи кэша: все или только для текущего содержимого указанного файла.
+
+    :param cache_dir: Каталог кэша.
+    :param excel_file: Excel-файл, записи которого нужно удалить, или None для очистки всего кэша.
+    :return: Количество удаленных записей.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    prefix = f'{file_digest(excel_file)}_' if excel_file else ''
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX) and name.startswith(prefix):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+
+    logger.info(f"Из кэша сайзинга удалено записей: {removed}")
+    return removed
+
+
+def load_with_cache(excel_file: str, sheet_name: Optional[str], columns: List[str], engine: str,
+                    loader: Callable[[], List[VmRecord]], cache_dir: str = DEFAULT_CACHE_DIR,
+                    max_bytes: int = DEFAULT_MAX_CACHE_BYTES) -> List[VmRecord]:
+    """
+    Возвращает записи сайзинга из кэша или загружает их и сохраняет в кэш.
+
+    Ключ записи - хэш содержимого файла, лист, набор колонок и движок чтения,
+    поэтому измененный файл никогда не получит устаревшие данные.
+
+    :param excel_file: Путь к Excel-файлу.
+    :param sheet_name: Название листа или None для записей всех листов книги.
+    :param columns: Набор извлекаемых колонок.
+    :param engine: Движок чтения Excel.
+    :param loader: Функция загрузки записей из Excel-файла при промахе кэша.
+    :param cache_dir: Каталог кэша.
+    :param max_bytes: Максимальный суммарный размер кэша, байт.
+    :return: Записи сайзинга.
+    """
+    entry_path = cache_entry_path(cache_dir, file_digest(excel_file), sheet_name, columns, engine)
+
+    records = load_records(entry_path)
+    if records is not None:
+        logger.info(f"Данные сайзинга загружены из кэша: {entry_path}")
+        return records
+
+    records = loader()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_records(entry_path, records)
+        evict(cache_dir, max_bytes)
+        logger.info(f"Данные сайзинга сохранены в кэш: {entry_path}")
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить данные сайзинга в кэш {cache_dir}: {e}")
+    return records
+
+
+def main() -> None:
+    """
+    Команды обслуживания кэша сайзинга.
+    """
+    parser = argparse.ArgumentParser(description="Обслуживание кэша разобранных файлов сайзинга")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Каталог кэша")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    invalidate_parser = subparsers.add_parser('invalidate', help="Удалить записи кэша")
+    invalidate_parser.add_argument('excel_file', nargs='?', help="Excel-файл (по умолчанию - весь кэш)")
+
+    evict_parser = subparsers.add_parser('evict', help="Сократить кэш до заданного размера")
+    evict_parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_CACHE_BYTES // (1024 * 1024),
+                              help="Максимальный размер кэша, МБ")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        if args.command == 'invalidate':
+            invalidate(args.cache_dir, args.excel_file)
+        elif os.path.isdir(args.cache_dir):
+            evict(args.cache_dir, args.max_mb * 1024 * 1024)
+    except Exception as e:
+        logger.error(f"Ошибка при обслуживании кэша сайзинга: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# table_grid.py
+
+from typing import Any, Iterable, List, Sequence, Tuple
+
+# Ячейка таблицы до раскрытия объединений: (текст, colspan, rowspan)
+RawCell = Tuple[str, int, int]
+
+# Ограничения объединений, как в модели таблиц HTML
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+
+
+def parse_span(value: Any, limit: int) -> int:
+    """
+    Преобразует значение атрибута colspan/rowspan в число.
+
+    :param value: Значение атрибута (строка, число или None).
+    :param limit: Максимально допустимое значение.
+    :return: Число от 1 до limit; некорректные значения считаются равными 1.
+    """
+    if value is None:
+        return 1
+    try:
+        span = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return min(max(span, 1), limit)
+
+
+def build_grid(rows: Iterable[Sequence[RawCell]]) -> List[List[str]]:
+    """
+    Строит прямоугольную матрицу значений таблицы за один проход по строкам.
+
+    Ячейки размещаются по модели таблиц HTML: позиции, занятые незавершенными
+    rowspan из предыдущих строк, пропускаются, а ячейка с colspan и rowspan
+    одновременно занимает прямоугольник colspan x rowspan. Незавершенные
+    объединения хранятся в двух массивах по номеру колонки.
+
+    :param rows: Строки таблицы, каждая - последовательность ячеек (текст, colspan, rowspan).
+    :return: Список строк одинаковой длины, каждая строка - список значений ячеек.
+    """
+    grid: List[List[str]] = []
+    span_left: List[int] = []  # Сколько строк еще занимает объединение в колонке
+    span_text: List[str] = []  # Значение объединенной ячейки в колонке
+    active_spans = 0  # Количество колонок с незавершенным rowspan
+    width = 0
+
+    for cells in rows:
+        row = [''] * width
+        col = 0
+
+        for text, colspan, rowspan in cells:
+            # Пропуск колонок, занятых rowspan из предыдущих строк
+            if active_spans:
+                while col < len(span_left) and span_left[col]:
+                    row[col] = span_text[col]
+                    span_left[col] -= 1
+                    if not span_left[col]:
+                        active_spans -= 1
+                    col += 1
+
+            end = col + colspan
+            if end > len(row):
+                row.extend([''] * (end - len(row)))
+
+            if colspan == 1 and rowspan == 1:
+                row[col] = text
+                col = end
+                continue
+
+            if end > len(span_left):
+                span_left.extend([0] * (end - len(span_left)))
+                span_text.extend([''] * (end - len(span_text)))
+
+            for idx in range(col, end):
+                row[idx] = text
+                # Ячейка перекрывает незавершенный rowspan колонки - он прерывается
+                if span_left[idx]:
+                    active_spans -= 1
+                span_left[idx] = rowspan - 1
+                if rowspan > 1:
+                    span_text[idx] = text
+                    active_spans += 1
+            col = end
+
+        # Колонки справа от последней ячейки строки, занятые rowspan
+        if active_spans:
+            if len(span_left) > len(row):
+                row.extend([''] * (len(span_left) - len(row)))
+            for idx in range(col, len(span_left)):
+                if span_left[idx]:
+                    row[idx] = span_text[idx]
+                    span_left[idx] -= 1
+                    if not span_left[idx]:
+                        active_spans -= 1
+
+        if len(row) > width:
+            width = len(row)
+        grid.append(row)
+
+    # Выравнивание строк, начатых до того, как таблица достигла полной ширины
+    for row in grid:
+        if len(row) < width:
+            row.extend([''] * (width - len(row)))
+
+    return grid
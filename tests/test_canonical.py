@@ -0,0 +1,115 @@
+# test_canonical.py
+
+import math
+
+import pytest
+
+from canonical import (canonical_ip, canonical_sizing, ip_differs, ip_mismatch_mask, sizing_differs,
+                       sizing_mismatch_mask, sizing_tolerance_vector, value_text)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, ''),
+    (math.nan, ''),
+    (2.0, '2'),
+    (2.5, '2.5'),
+    ('  vm1 ', 'vm1'),
+])
+def test_value_text(value, expected):
+    assert value_text(value) == expected
+
+
+@pytest.mark.parametrize('value1, value2', [
+    (' 10.0.0.1 ', '10.0.0.1'),
+    ('10.0.0.1\t10.0.0.2', '10.0.0.2 10.0.0.1'),
+    ('10.0.0.1, 10.0.0.2', '10.0.0.2;10.0.0.1'),
+    ('10.0.0.1;;10.0.0.1', '10.0.0.1'),
+    ('10.0.0.1\n10.0.0.2', '10.0.0.1,10.0.0.2'),
+    ('010.000.000.001', '10.0.0.1'),
+    ('192.168.001.010', '192.168.1.10'),
+    ('2001:DB8:0:0::1', '2001:db8::1'),
+    ('10.0.0.5/24', '10.0.0.5/255.255.255.0'),
+    ('2001:DB8::1/64', '2001:db8::1/64'),
+    ('DHCP', 'dhcp'),
+    (None, ''),
+    (math.nan, ''),
+])
+def test_equal_ips(value1, value2):
+    assert not ip_differs(value1, value2)
+
+
+@pytest.mark.parametrize('value1, value2', [
+    ('10.0.0.1', '10.0.0.2'),
+    ('10.0.0.1', '10.0.0.1 10.0.0.2'),
+    ('10.0.0.1', ''),
+    ('999.0.0.1', '99.0.0.1'),
+    ('10.0.0.0/24', '10.0.0.0/25'),
+    ('10.0.0.1/24', '10.0.0.2/24'),
+    ('10.0.0.5/24', '10.0.0.0/24'),
+])
+def test_different_ips(value1, value2):
+    assert ip_differs(value1, value2)
+
+
+def test_canonical_ip_sorts_and_deduplicates():
+    assert canonical_ip('10.0.0.2, 010.0.0.1 10.0.0.2') == '10.0.0.1 10.0.0.2'
+
+
+def sizing_fields(numbers):
+    # NaN не равен сам себе, поэтому отсутствующие поля сравниваются как None
+    return None if numbers is None else [None if math.isnan(number) else number for number in numbers]
+
+
+@pytest.mark.parametrize('value, fields, text', [
+    ('4 / 16 / 50 / 100', [4, 16, 50, 100], '4/16/50/100'),
+    ('0,5/1', [0.5, 1, None, None], '0,5/1'),
+    (2.0, [2, None, None, None], '2'),
+    ('По  запросу', None, 'позапросу'),
+    ('1/2/3/4/5', None, '1/2/3/4/5'),
+    (math.nan, None, ''),
+])
+def test_canonical_sizing(value, fields, text):
+    numbers, canonical_text = canonical_sizing(value)
+    assert sizing_fields(numbers) == fields
+    assert canonical_text == text
+
+
+EXACT = sizing_tolerance_vector()
+HDD_TOLERANCE = sizing_tolerance_vector({'hdd_sys': 10, 'hdd_app': 10})
+
+
+@pytest.mark.parametrize('value1, value2, tolerance, differs', [
+    ('4/16/50/100', '4 / 16 / 50 / 100', EXACT, False),
+    ('4/16/50/100', '4/16/51/100', EXACT, True),
+    ('4/16/50/100', '4/16/55/100', HDD_TOLERANCE, False),
+    ('4/16/50/100', '4/16/60/90', HDD_TOLERANCE, False),
+    ('4/16/50/100', '4/16/61/100', HDD_TOLERANCE, True),
+    ('4/16/50/100', '4/17/50/100', HDD_TOLERANCE, True),
+    ('4/16', '4/16', EXACT, False),
+    ('4/16', '4/16/50', HDD_TOLERANCE, True),
+    ('2', 2.0, EXACT, False),
+    ('0,5/1', '0.5/1', EXACT, False),
+    ('По запросу', 'по  ЗАПРОСУ', EXACT, False),
+    ('По запросу', '4/16', EXACT, True),
+    (math.nan, '', EXACT, False),
+])
+def test_sizing_differs(value1, value2, tolerance, differs):
+    assert sizing_differs(value1, value2, tolerance) is differs
+
+
+def test_masks_match_row_comparison():
+    ips1 = [' 10.0.0.1 ', '10.0.0.1', '010.000.000.001', None, 'DHCP', '10.0.0.1,10.0.0.2']
+    ips2 = ['10.0.0.1', '10.0.0.2', '10.0.0.1', math.nan, 'dhcp', '10.0.0.2 10.0.0.1']
+    assert ip_mismatch_mask(ips1, ips2).tolist() == [ip_differs(a, b) for a, b in zip(ips1, ips2)]
+
+    sizings1 = ['4/16/50/100', '4/16/50/100', '4/16', 'По запросу', math.nan, '2']
+    sizings2 = ['4/16/60/100', '4/16/61/100', '4/16/50', 'по запросу', '', 2.0]
+    expected = [sizing_differs(a, b, HDD_TOLERANCE) for a, b in zip(sizings1, sizings2)]
+    assert expected == [False, True, True, False, False, False]
+    assert sizing_mismatch_mask(sizings1, sizings2, HDD_TOLERANCE).tolist() == expected
+
+
+@pytest.mark.parametrize('tolerances', [{'disk': 1}, {'ram': -1}])
+def test_invalid_tolerances(tolerances):
+    with pytest.raises(ValueError):
+        sizing_tolerance_vector(tolerances)
@@ -0,0 +1,119 @@
+# test_compare_delta.py
+
+import pickle
+
+import pytest
+from openpyxl import load_workbook
+
+from canonical import sizing_tolerance_vector
+from compare_json import DELTA_SECTIONS, classify_change, compare_delta
+from run_snapshot import (STATUS_MATCHED, STATUS_MISMATCH, STATUS_MISSING_IN_PASSPORT, STATUS_MISSING_IN_SIZING,
+                          load_snapshot)
+from vm_record import VmRecord
+
+
+def passport(*servers):
+    return [VmRecord(name, ip, sizing, 'Раздел') for name, ip, sizing in servers]
+
+
+def sizing(*servers):
+    return [VmRecord(name, ip, sizing) for name, ip, sizing in servers]
+
+
+def report_rows(report_file):
+    # Строки серверов по разделам отчета: заголовок раздела, строка колонок, затем строки серверов
+    sections = {}
+    current = None
+    for row in load_workbook(report_file).active.iter_rows(values_only=True):
+        if row[0] in DELTA_SECTIONS:
+            current = sections.setdefault(row[0], [])
+        elif row[0] not in (None, 'Имя сервера') and current is not None:
+            current.append(row[:3])
+    return sections
+
+
+@pytest.mark.parametrize('previous, current, known, section', [
+    (None, STATUS_MATCHED, False, 'Появились'),
+    (STATUS_MATCHED, STATUS_MISMATCH, True, 'Новые расхождения'),
+    (STATUS_MISSING_IN_SIZING, STATUS_MISMATCH, True, 'Новые расхождения'),
+    (STATUS_MISMATCH, STATUS_MISMATCH, True, 'Изменились расхождения'),
+    (STATUS_MISMATCH, STATUS_MATCHED, True, 'Исправлены'),
+    (STATUS_MATCHED, STATUS_MISSING_IN_SIZING, True, 'Изменился статус'),
+    (STATUS_MISSING_IN_PASSPORT, STATUS_MATCHED, True, 'Изменился статус'),
+    (STATUS_MATCHED, STATUS_MATCHED, True, None),
+])
+def test_classify_change(previous, current, known, section):
+    assert classify_change(previous, current, known) == section
+
+
+def test_delta_between_runs(tmp_path):
+    snapshot_file = str(tmp_path / 'snapshot.pkl')
+    report_file = str(tmp_path / 'delta.xlsx')
+
+    first = compare_delta(
+        passport(('fixed', '10.0.0.1', '2/8'), ('broken', '10.0.0.2', '2/8'), ('gone', '10.0.0.3', '2/8'),
+                 ('same', '10.0.0.4', '2/8'), ('drift', '10.0.0.5', '2/8')),
+        sizing(('fixed', '10.0.0.9', '2/8'), ('broken', '10.0.0.2', '2/8'), ('same', '10.0.0.4', '2/8'),
+               ('drift', '10.0.0.5', '4/16')),
+        snapshot_file, report_file)
+    assert first['Появились'] == 5
+    assert sum(first.values()) == 5
+
+    second = compare_delta(
+        passport(('fixed', '10.0.0.9', '2/8'), ('broken', '10.0.0.2', '4/16'), ('same', '10.0.0.4', '2/8'),
+                 ('drift', '10.0.0.5', '2/16'), ('new', '10.0.0.6', '2/8')),
+        sizing(('fixed', '10.0.0.9', '2/8'), ('broken', '10.0.0.2', '2/8'), ('same', '10.0.0.4', '2/8'),
+               ('drift', '10.0.0.5', '4/16'), ('new', '10.0.0.6', '2/8')),
+        snapshot_file, report_file)
+
+    assert second == {'Новые расхождения': 1, 'Исправлены': 1, 'Появились': 1, 'Исчезли': 1,
+                      'Изменились расхождения': 1, 'Изменился статус': 0}
+    assert report_rows(report_file) == {
+        'Новые расхождения': [('broken', 'Совпадает', 'Расхождения')],
+        'Исправлены': [('fixed', 'Расхождения', 'Совпадает')],
+        'Появились': [('new', 'Нет в источниках', 'Совпадает')],
+        'Исчезли': [('gone', 'Нет в сайзинге', 'Нет в источниках')],
+        'Изменились расхождения': [('drift', 'Расхождения', 'Расхождения')],
+        'Изменился статус': [],
+    }
+
+
+def test_unchanged_data_has_no_changes(tmp_path):
+    snapshot_file = str(tmp_path / 'snapshot.pkl')
+    data1 = passport(('vm1', '10.0.0.1', '2/8'), ('vm2', '10.0.0.2', '2/8'))
+    data2 = sizing(('vm1', '10.0.0.1', '2/8'), ('vm3', '10.0.0.3', '2/8'))
+
+    compare_delta(data1, data2, snapshot_file, str(tmp_path / 'first.xlsx'))
+    counts = compare_delta(data1, data2, snapshot_file, str(tmp_path / 'second.xlsx'))
+
+    assert sum(counts.values()) == 0
+
+
+def test_snapshot_keeps_tolerance(tmp_path):
+    snapshot_file = str(tmp_path / 'snapshot.pkl')
+    data1 = passport(('vm1', '10.0.0.1', '2/8/50/0'))
+    data2 = sizing(('vm1', '10.0.0.1', '2/8/55/0'))
+    tolerances = {'hdd_sys': 10}
+
+    first = compare_delta(data1, data2, snapshot_file, str(tmp_path / 'first.xlsx'), tolerances)
+    assert first['Появились'] == 1
+
+    # Снимок с теми же допусками используется: изменений нет
+    assert sum(compare_delta(data1, data2, snapshot_file, str(tmp_path / 'second.xlsx'), tolerances).values()) == 0
+
+    # Снимок с другими допусками не используется: все серверы снова новые, статус пересчитан без допуска
+    third = compare_delta(data1, data2, snapshot_file, str(tmp_path / 'third.xlsx'))
+    assert third['Появились'] == 1
+    assert report_rows(str(tmp_path / 'third.xlsx'))['Появились'] == [('vm1', 'Нет в источниках', 'Расхождения')]
+    assert load_snapshot(snapshot_file, sizing_tolerance_vector())['vm1'][0] == STATUS_MISMATCH
+    assert load_snapshot(snapshot_file, sizing_tolerance_vector(tolerances)) is None
+
+
+@pytest.mark.parametrize('payload', [['vm1'], {'version': 0, 'servers': {}}, {'version': 1, 'servers': None}])
+def test_foreign_snapshot_is_ignored(tmp_path, payload):
+    snapshot_file = tmp_path / 'snapshot.pkl'
+    snapshot_file.write_bytes(pickle.dumps(payload))
+
+    counts = compare_delta(passport(('vm1', '10.0.0.1', '2/8')), sizing(('vm1', '10.0.0.1', '2/8')),
+                           str(snapshot_file), str(tmp_path / 'delta.xlsx'))
+    assert counts['Появились'] == 1
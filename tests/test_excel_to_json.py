@@ -0,0 +1,37 @@
+# test_excel_to_json.py
+
+import pytest
+from openpyxl import Workbook
+
+from excel_to_json import excel_to_json
+from vm_record import VmRecord
+
+
+def write_sheet(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Support'
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+@pytest.mark.parametrize('engine', ['pandas', 'openpyxl'])
+def test_header_variants_match_in_both_engines(tmp_path, engine):
+    excel_file = tmp_path / 'data.xlsx'
+    write_sheet(excel_file, [
+        ['ip адрес', 5, '  ИМЯ  СЕРВЕРА ', 'сайзинг cpu/ram/hdd sys/hdd app', 'IP адрес'],
+        ['10.0.0.1', 1, 'vm1', '2/8', '10.9.9.9'],
+        [None, 2, None, '4/16', None],
+    ])
+
+    assert excel_to_json(str(excel_file), engine=engine) == [VmRecord('vm1', '10.0.0.1', '2/8')]
+
+
+@pytest.mark.parametrize('engine', ['pandas', 'openpyxl'])
+def test_missing_column(tmp_path, engine):
+    excel_file = tmp_path / 'data.xlsx'
+    write_sheet(excel_file, [['Имя сервера', 'IP адрес'], ['vm1', '10.0.0.1']])
+
+    with pytest.raises(ValueError, match='Сайзинг'):
+        excel_to_json(str(excel_file), engine=engine)
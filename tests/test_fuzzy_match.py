@@ -0,0 +1,93 @@
+# test_fuzzy_match.py
+
+import random
+
+import pytest
+
+from fuzzy_match import NameIndex, edit_distance, find_name_candidates, short_name
+
+
+@pytest.mark.parametrize('first, second, distance', [
+    ('kitten', 'sitting', 3),
+    ('app-db01', 'app-db02', 1),
+    ('app-db01', 'app-db01', 0),
+    ('', 'abc', 3),
+    ('abc', '', 3),
+    ('web01', 'web001', 1),
+])
+def test_edit_distance(first, second, distance):
+    assert edit_distance(first, second, 10) == distance
+
+
+def test_edit_distance_stops_above_limit():
+    assert edit_distance('kitten', 'sitting', 2) == 3
+    assert edit_distance('a', 'abcdef', 2) == 3
+    assert edit_distance('abcdef', 'ghijkl', 1) == 2
+
+
+@pytest.mark.parametrize('min_score, found', [
+    (0.8, True),
+    (0.875, True),
+    (0.876, False),
+])
+def test_min_score_boundary(min_score, found):
+    # Одна правка в имени из 8 символов - оценка 0.875
+    result = NameIndex(['app-db02']).search('app-db01', min_score)
+    assert result == ([('app-db02', 0.875, 'Расстояние правки: 1')] if found else [])
+
+
+def test_score_equal_to_threshold_passes():
+    # (1 - 0.8) * 5 в двоичной арифметике чуть меньше 1; кандидат с оценкой, равной порогу, не теряется
+    assert NameIndex(['abcdx']).search('abcde', 0.8) == [('abcdx', 0.8, 'Расстояние правки: 1')]
+    assert NameIndex(['abcxy']).search('abcde', 0.8) == []
+
+
+def test_short_name_match():
+    result = NameIndex(['vm1.other.ru', 'vm2.example.ru']).search('vm1.example.ru')
+    assert result == [('vm1.other.ru', 1.0, 'Совпадает короткое имя')]
+
+
+def test_same_name_is_not_a_candidate():
+    assert NameIndex(['vm1.example.ru']).search('vm1.example.ru') == []
+
+
+def test_candidates_sorted_and_limited():
+    index = NameIndex(['srv-app10', 'srv-app01', 'srv-app02', 'srv-app03', 'other'])
+    result = index.search('srv-app00', 0.8, max_candidates=2)
+    assert result == [('srv-app01', 0.889, 'Расстояние правки: 1'), ('srv-app02', 0.889, 'Расстояние правки: 1')]
+
+
+def test_find_name_candidates():
+    candidates = find_name_candidates(['web01.example.ru', 'db01'], ['web01.test.ru', 'db-01', 'cache'], 0.75)
+    assert [(c.passport_name, c.sizing_name, c.score) for c in candidates] == [
+        ('web01.example.ru', 'web01.test.ru', 1.0),
+        ('db01', 'db-01', 0.8),
+    ]
+    assert find_name_candidates([], ['db01']) == []
+    assert find_name_candidates(['db01'], []) == []
+
+
+@pytest.mark.parametrize('min_score', [0.7, 0.75, 0.8, 0.9])
+def test_index_matches_exhaustive_search(min_score):
+    # Фильтр по n-граммам не должен терять кандидатов, найденных полным перебором
+    rng = random.Random(min_score)
+    alphabet = 'abc-01'
+    names = sorted({''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 9))) for _ in range(300)})
+    index = NameIndex(names)
+
+    for query in names[::7]:
+        expected = []
+        for name in names:
+            longest = max(len(query), len(name))
+            distance = edit_distance(query, name, longest)
+            if name != query and distance <= (1 - min_score) * longest + 1e-9:
+                expected.append((name, round(1 - distance / longest, 3)))
+        expected.sort(key=lambda item: (-item[1], item[0]))
+
+        found = index.search(query, min_score, max_candidates=len(names))
+        assert [(name, score) for name, score, _ in found] == expected
+
+
+def test_short_name():
+    assert short_name('vm1.example.ru') == 'vm1'
+    assert short_name('vm1') == 'vm1'
@@ -0,0 +1,72 @@
+# test_html_to_json.py
+
+import pytest
+
+from html_to_json import build_sections, has_inner_cell_class, iter_soup_sections, parse_html_to_json
+from vm_record import vm_records
+
+HEADER_ROW = '<tr><th>Наименование</th><th>Роль</th><th>Имя сервера</th><th>IP address</th><th>Sizing</th></tr>'
+
+
+def section(start_tag: str, title: str, server: str) -> str:
+    return (f'{start_tag}<h3>{title}</h3><table>{HEADER_ROW}'
+            f'<tr><td>Сист</td><td>Роль</td><td>{server}</td><td>10.0.0.1</td><td>2/8/50/0</td></tr>'
+            '</table></div>')
+
+
+TRICKY_PAGE = (
+    '<html><head><script>var s = \'<div class="innerCell"><h3>script</h3>\';</script></head><body>'
+    '<!-- <div class="innerCell"><h3>comment</h3></div> -->'
+    + section('<div data-x="a>b" class="innerCell">', 'Кавычки', 'vm-quoted')
+    + section('<div title=\'class="innerCell"\'>', 'Не раздел', 'vm-fake')
+    + section("<div class='cell innerCell'>", 'Одинарные', 'vm-single')
+    + section('<div\nclass=innerCell>', 'Без кавычек', 'vm-bare')
+    + '<div class="innerCell"><h3>Внешний</h3>'
+    + section('<div class="innerCell">', 'Вложенный', 'vm-nested')
+    + '</div></body></html>'
+)
+
+
+@pytest.mark.parametrize('start_tag, expected', [
+    ('<div class="innerCell">', True),
+    ('<div data-x="a>b" class="innerCell">', True),
+    ("<div class='x innerCell'>", True),
+    ('<div\tclass=innerCell>', True),
+    ('<div CLASS="innerCell">', True),
+    ('<div title=" class=innerCell" class="x">', False),
+    ('<div class="innerCells">', False),
+    ('<div>', False),
+    (b'<div class="innerCell">', True),
+])
+def test_has_inner_cell_class(start_tag, expected):
+    assert has_inner_cell_class(start_tag) == expected
+
+
+@pytest.mark.parametrize('engine', ['bs4', 'lxml'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_prefilter_matches_full_parse(tmp_path, engine, workers):
+    html_file = tmp_path / 'page.html'
+    html_file.write_text(TRICKY_PAGE, encoding='utf-8')
+    expected = vm_records(build_sections(iter_soup_sections(TRICKY_PAGE)))
+
+    # Внешний раздел находит таблицу вложенного, как и при разборе всей страницы
+    assert [record.server_name for record in expected] == ['vm-quoted', 'vm-single', 'vm-bare', 'vm-nested',
+                                                           'vm-nested']
+    assert parse_html_to_json(str(html_file), engine=engine, workers=workers) == expected
+
+
+@pytest.mark.parametrize('engine', ['bs4', 'lxml'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_crlf_cell_text_matches_across_engines(tmp_path, engine, workers):
+    page = ('<html><body>\r\n<div class="innerCell"><h3>Раздел</h3><table>' + HEADER_ROW + '\r\n'
+            '<tr><td>Сист\r\nпервая</td><td>Роль\rвторая</td><td>vm-crlf</td><td>10.0.0.1</td>'
+            '<td>2/8/\r\n50/0</td></tr>\r\n</table></div>\r\n</body></html>')
+    html_file = tmp_path / 'crlf.html'
+    html_file.write_bytes(page.encode('utf-8'))
+
+    records = parse_html_to_json(str(html_file), engine=engine, workers=workers)
+
+    assert records == parse_html_to_json(str(html_file), engine='bs4')
+    assert [(record.naimenovanie, record.role, record.sizing) for record in records] == [
+        ('Сист\nпервая', 'Роль\nвторая', '2/8/\n50/0')
+    ]
@@ -0,0 +1,28 @@
+# test_json_extractor.py
+
+import json
+import logging
+
+from json_extractor import iter_vm_records
+
+SECTIONS = [
+    {'Раздел': '', 'Данные': [{'Наименование': 'Сист', 'Роль': 'Роль', 'ВМ': [{'Имя сервера': 'vm1'},
+                                                                            {'Имя сервера': 'vm2'}]}]},
+    {'Раздел': 'Раздел', 'Данные': [{'Наименование': 'Сист', 'Роль': 'Роль', 'ВМ': [{'Имя сервера': ''},
+                                                                                  {'Имя сервера': 'vm3'},
+                                                                                  {'Имя сервера': ''}]}]},
+]
+
+
+def test_skipped_records_are_reported_once_per_section(tmp_path, caplog):
+    json_file = tmp_path / 'result.json'
+    json_file.write_text(json.dumps(SECTIONS, ensure_ascii=False), encoding='utf-8')
+
+    with caplog.at_level(logging.WARNING):
+        records = list(iter_vm_records(str(json_file)))
+
+    assert [record.server_name for record in records] == ['vm3']
+    assert [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING] == [
+        "Отсутствует название раздела. Пропуск раздела (записей ВМ: 2).",
+        "Отсутствует 'Имя сервера' в разделе 'Раздел'. Пропущено записей ВМ: 2.",
+    ]
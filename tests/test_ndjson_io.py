@@ -0,0 +1,54 @@
+# test_ndjson_io.py
+
+import math
+
+from compare_json import load_passport_data, load_sizing_data
+from excel_to_json import save_json as save_sizing_json
+from html_to_json import save_json as save_passport_json
+from ndjson_io import iter_records, write_records
+from vm_record import VmRecord, records_from_sections, section_marker, sections_from_records, vm_records
+
+PASSPORT = [
+    section_marker('Раздел 1'),
+    VmRecord('vm1', '10.0.0.1', '2/8/50/0', 'Раздел 1', 'Сист', 'Роль'),
+    VmRecord('vm2', math.nan, math.nan, 'Раздел 1', 'Сист', 'Роль'),
+    VmRecord('vm3', '10.0.0.3', '4/16', 'Раздел 1', 'Сист', 'Другая роль'),
+    # Раздел без ВМ и повтор заголовка раздела
+    section_marker('Пустой'),
+    section_marker('Раздел 1'),
+    VmRecord('vm4', '10.0.0.4', '', 'Раздел 1', 'Сист 2', 'Роль'),
+]
+
+
+def test_sections_round_trip_through_ndjson(tmp_path):
+    ndjson_file = str(tmp_path / 'sections.ndjson')
+    sections = list(sections_from_records(PASSPORT))
+    assert [section['Раздел'] for section in sections] == ['Раздел 1', 'Пустой', 'Раздел 1']
+    assert sections[1]['Данные'] == []
+
+    assert write_records(sections, ndjson_file) == 3
+    loaded = list(iter_records(ndjson_file))
+
+    assert [section['Раздел'] for section in loaded] == ['Раздел 1', 'Пустой', 'Раздел 1']
+    assert math.isnan(loaded[0]['Данные'][0]['ВМ'][1]['IP адрес'])
+    assert list(records_from_sections(loaded)) == vm_records(PASSPORT)
+
+
+def test_append_and_blank_lines(tmp_path):
+    ndjson_file = tmp_path / 'records.ndjson'
+    write_records([{'a': 1}], str(ndjson_file))
+    write_records([{'a': 2}], str(ndjson_file), append=True)
+    ndjson_file.write_text(ndjson_file.read_text(encoding='utf-8') + '\n\n', encoding='utf-8')
+
+    assert list(iter_records(str(ndjson_file))) == [{'a': 1}, {'a': 2}]
+
+
+def test_passport_and_sizing_files_round_trip(tmp_path):
+    passport_file = str(tmp_path / 'passport.ndjson')
+    save_passport_json(PASSPORT, passport_file)
+    assert list(load_passport_data(passport_file)) == vm_records(PASSPORT)
+
+    sizing = [VmRecord('vm1', '10.0.0.1', '2/8/50/0'), VmRecord('vm2', math.nan, '4/16', sheet='DR')]
+    sizing_file = str(tmp_path / 'sizing.jsonl')
+    save_sizing_json(sizing, sizing_file)
+    assert list(load_sizing_data(sizing_file)) == sizing
@@ -0,0 +1,48 @@
+# test_section_cache.py
+
+import pickle
+
+import pytest
+
+from html_to_json import parse_html_to_json
+from section_cache import SECTION_CACHE_VERSION, load_section_cache, save_section_cache, section_cache_path
+from vm_record import VmRecord
+
+PAGE = ('<html><body><div class="innerCell"><h3>Раздел</h3><table>'
+        '<tr><th>Наименование</th><th>Роль</th><th>Имя сервера</th><th>IP address</th><th>Sizing</th></tr>'
+        '<tr><td>Сист</td><td>Роль</td><td>vm1</td><td>10.0.0.1</td><td>2/8/50/0</td></tr>'
+        '</table></div></body></html>')
+
+
+def test_round_trip(tmp_path):
+    cache_file = str(tmp_path / 'cache' / 'page.pkl')
+    sections = {'abc': [VmRecord('vm1', '10.0.0.1', '2/8', 'Раздел')]}
+    save_section_cache(cache_file, sections)
+    assert load_section_cache(cache_file) == sections
+
+
+@pytest.mark.parametrize('payload', [
+    [('abc', [])],
+    {'version': SECTION_CACHE_VERSION - 1, 'sections': {}},
+    {'version': SECTION_CACHE_VERSION},
+    {'version': SECTION_CACHE_VERSION, 'sections': ['abc']},
+])
+def test_foreign_payload_is_a_miss(tmp_path, payload):
+    cache_file = tmp_path / 'page.pkl'
+    cache_file.write_bytes(pickle.dumps(payload))
+    assert load_section_cache(str(cache_file)) == {}
+
+
+def test_incremental_parse_recovers_from_foreign_cache(tmp_path):
+    html_file = tmp_path / 'page.html'
+    html_file.write_text(PAGE, encoding='utf-8')
+    cache_dir = str(tmp_path / 'cache')
+    expected = parse_html_to_json(str(html_file))
+
+    # Файл кэша с данными чужого формата
+    save_section_cache(section_cache_path(cache_dir, str(html_file)), {})
+    with open(section_cache_path(cache_dir, str(html_file)), 'wb') as file:
+        pickle.dump(['не кэш'], file)
+
+    assert parse_html_to_json(str(html_file), section_cache_dir=cache_dir) == expected
+    assert parse_html_to_json(str(html_file), section_cache_dir=cache_dir) == expected
@@ -0,0 +1,69 @@
+# test_sizing_cache.py
+
+import os
+import pickle
+
+import pytest
+from openpyxl import Workbook
+
+import excel_to_json
+import sizing_cache
+from excel_to_json import excel_to_json as read_sizing
+
+
+@pytest.fixture
+def excel_file(tmp_path):
+    wb = Workbook()
+    for title, server in (('Prod', 'vm1'), ('DR', 'vm2')):
+        ws = wb.create_sheet(title)
+        ws.append(['Имя сервера', 'Сайзинг\ncpu/ram/hdd sys/hdd app', 'IP адрес'])
+        ws.append([server, '2/8/50/0', None])
+    wb.remove(wb.worksheets[0])
+    path = tmp_path / 'data.xlsx'
+    wb.save(path)
+    return str(path)
+
+
+def cache_entries(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(sizing_cache.CACHE_SUFFIX))
+
+
+def test_all_sheets_hit_does_not_open_workbook(tmp_path, excel_file, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    expected = read_sizing(excel_file, engine='openpyxl', cache_dir=cache_dir, all_sheets=True, workers=1)
+    assert [(record.server_name, record.sheet) for record in expected] == [('vm1', 'Prod'), ('vm2', 'DR')]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("книга не должна открываться при попадании в кэш")
+
+    monkeypatch.setattr(excel_to_json, 'load_workbook', fail)
+    assert read_sizing(excel_file, engine='openpyxl', cache_dir=cache_dir, all_sheets=True, workers=1) == expected
+
+
+@pytest.mark.parametrize('payload', [
+    [('vm1', '10.0.0.1', '2/8/50/0')],
+    {'version': sizing_cache.CACHE_FORMAT_VERSION - 1, 'columns': [[], [], []]},
+    {'version': sizing_cache.CACHE_FORMAT_VERSION, 'columns': None},
+])
+def test_foreign_entry_is_a_miss(tmp_path, excel_file, payload):
+    cache_dir = str(tmp_path / 'cache')
+    expected = read_sizing(excel_file, engine='openpyxl', cache_dir=cache_dir, all_sheets=True, workers=1)
+    [entry] = cache_entries(cache_dir)
+    with open(os.path.join(cache_dir, entry), 'wb') as file:
+        pickle.dump(payload, file)
+
+    assert read_sizing(excel_file, engine='openpyxl', cache_dir=cache_dir, all_sheets=True, workers=1) == expected
+    assert cache_entries(cache_dir) == [entry]
+
+
+def test_entry_removed_after_read_is_still_used(tmp_path, excel_file, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    expected = read_sizing(excel_file, engine='pandas', cache_dir=cache_dir, all_sheets=True, workers=1)
+
+    def evicted(path, *args, **kwargs):
+        # Запись удалена вытеснением в другом процессе сразу после чтения
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(sizing_cache.os, 'utime', evicted)
+    assert read_sizing(excel_file, engine='pandas', cache_dir=cache_dir, all_sheets=True, workers=1) == expected
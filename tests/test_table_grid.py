@@ -0,0 +1,83 @@
+# test_table_grid.py
+
+import pytest
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from html_to_json import parse_html_table, parse_lxml_table
+from table_grid import MAX_COLSPAN, MAX_ROWSPAN, build_grid, parse_span
+
+
+def test_plain_rows():
+    assert build_grid([[('a', 1, 1), ('b', 1, 1)], [('c', 1, 1), ('d', 1, 1)]]) == [['a', 'b'], ['c', 'd']]
+
+
+def test_empty_table():
+    assert build_grid([]) == []
+
+
+def test_rowspan_fills_following_rows():
+    grid = build_grid([[('a', 1, 3), ('b', 1, 1)], [('c', 1, 1)], [('d', 1, 1)], [('e', 1, 1), ('f', 1, 1)]])
+    assert grid == [['a', 'b'], ['a', 'c'], ['a', 'd'], ['e', 'f']]
+
+
+def test_rowspan_right_of_last_cell():
+    assert build_grid([[('a', 1, 1), ('b', 1, 2)], [('c', 1, 1)]]) == [['a', 'b'], ['c', 'b']]
+
+
+def test_colspan_and_rowspan_cover_rectangle():
+    grid = build_grid([[('x', 2, 2), ('y', 1, 1)], [('z', 1, 1)], [('a', 1, 1), ('b', 1, 1), ('c', 1, 1)]])
+    assert grid == [['x', 'x', 'y'], ['x', 'x', 'z'], ['a', 'b', 'c']]
+
+
+def test_rowspans_on_both_sides_of_new_cell():
+    grid = build_grid([[('a', 1, 2), ('b', 2, 3), ('c', 1, 1)], [('d', 1, 1)], [('e', 1, 1), ('f', 1, 1)]])
+    assert grid == [['a', 'b', 'b', 'c'], ['a', 'b', 'b', 'd'], ['e', 'b', 'b', 'f']]
+
+
+def test_colspan_overlapping_rowspan_interrupts_it():
+    # Ячейка второй строки с colspan перекрывает rowspan 'q': объединение прерывается
+    grid = build_grid([[('p', 1, 1), ('q', 1, 3)], [('r', 2, 1)], [('s', 1, 1), ('t', 1, 1)]])
+    assert grid == [['p', 'q'], ['r', 'r'], ['s', 't']]
+
+
+def test_short_rows_are_padded():
+    assert build_grid([[('a', 1, 1)], [('b', 1, 1), ('c', 2, 1)]]) == [['a', '', ''], ['b', 'c', 'c']]
+
+
+@pytest.mark.parametrize('value, limit, expected', [
+    (None, MAX_COLSPAN, 1),
+    ('3', MAX_COLSPAN, 3),
+    (2, MAX_COLSPAN, 2),
+    ('0', MAX_COLSPAN, 1),
+    ('-2', MAX_ROWSPAN, 1),
+    ('abc', MAX_ROWSPAN, 1),
+    ('99999', MAX_ROWSPAN, MAX_ROWSPAN),
+    ('5000', MAX_COLSPAN, MAX_COLSPAN),
+])
+def test_parse_span(value, limit, expected):
+    assert parse_span(value, limit) == expected
+
+
+SPAN_TABLE = """
+<table>
+  <tr><th>Наименование</th><th>Имя сервера</th><th colspan="2">Сайзинг</th></tr>
+  <tr><td rowspan="2">web</td><td>vm1</td><td colspan="2" rowspan="2">2/4/50</td></tr>
+  <tr><td>vm2</td></tr>
+  <tr><td>db</td><td> vm3 </td><td>4/8</td><td rowspan="x">100</td></tr>
+</table>
+"""
+
+SPAN_GRID = [
+    ['Наименование', 'Имя сервера', 'Сайзинг', 'Сайзинг'],
+    ['web', 'vm1', '2/4/50', '2/4/50'],
+    ['web', 'vm2', '2/4/50', '2/4/50'],
+    ['db', 'vm3', '4/8', '100'],
+]
+
+
+def test_bs4_and_lxml_tables_match():
+    soup_table = BeautifulSoup(SPAN_TABLE, 'html.parser').find('table')
+    lxml_table = etree.HTML(SPAN_TABLE).find('.//table')
+    assert parse_html_table(soup_table) == SPAN_GRID
+    assert parse_lxml_table(lxml_table) == SPAN_GRID
@@ -0,0 +1,57 @@
+# test_watch.py
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from watch import WatchSession
+
+PAGE = ('<html><body><div class="innerCell"><h3>Раздел</h3><table>'
+        '<tr><th>Наименование</th><th>Роль</th><th>Имя сервера</th><th>IP address</th><th>Sizing</th></tr>'
+        '<tr><td>Сист</td><td>Роль</td><td>vm1</td><td>{ip}</td><td>2/8/50/0</td></tr>'
+        '<tr><td>Сист</td><td>Роль</td><td>vm2</td><td>10.0.0.2</td><td>2/8/50/0</td></tr>'
+        '</table></div></body></html>')
+
+
+def write_sizing(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Support'
+    ws.append(['Имя сервера', 'Сайзинг\ncpu/ram/hdd sys/hdd app', 'IP адрес'])
+    # Пустые ячейки читаются как NaN
+    ws.append(['vm1', None, '10.0.0.1'])
+    ws.append(['vm2', '2/8/50/0', None])
+    ws.append(['vm3', '4/16/50/0', '10.0.0.3'])
+    wb.save(path)
+
+
+@pytest.fixture
+def session(tmp_path):
+    html_file = tmp_path / 'page.html'
+    html_file.write_text(PAGE.format(ip='10.0.0.1'), encoding='utf-8')
+    excel_file = tmp_path / 'data.xlsx'
+    write_sizing(excel_file)
+    return WatchSession(str(html_file), str(excel_file), str(tmp_path / 'result.xlsx'))
+
+
+@pytest.mark.parametrize('excel_engine', ['pandas', 'openpyxl'])
+def test_rereading_empty_cells_is_not_a_change(session, tmp_path, excel_engine):
+    session.excel_engine = excel_engine
+    # Записи из кэша восстанавливаются с новыми объектами NaN
+    session.sizing_cache_dir = str(tmp_path / 'cache')
+    assert session.refresh_sizing()
+    assert not session.refresh_sizing()
+
+
+def test_update_compares_only_changed_servers(session):
+    assert session.update([session.html_file, session.excel_file]) == []
+    rows = {server: row for server, (_, _, row) in session.rows.items()}
+
+    with open(session.html_file, 'w', encoding='utf-8') as file:
+        file.write(PAGE.format(ip='10.0.0.9'))
+    assert session.update([session.html_file]) == []
+
+    assert session.rows['vm1'][2] is not rows['vm1']
+    assert session.rows['vm2'][2] is rows['vm2']
+    assert session.rows['vm3'][2] is rows['vm3']
+    values = [[cell.value for cell in row] for row in load_workbook(session.output_excel_file).active.iter_rows()]
+    assert '10.0.0.9' in next(row for row in values if row[0] == 'vm1')
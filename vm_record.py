@@ -0,0 +1,221 @@
+# vm_record.py
+
+import math
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from ndjson_io import PASSPORT_RECORD_FIELDS
+
+# Поля записи сайзинга в промежуточном формате
+SIZING_RECORD_FIELDS = ('Имя сервера', 'Сайзинг', 'IP адрес')
+
+# Поле записи сайзинга с названием листа (в режиме чтения всех листов)
+SHEET_RECORD_FIELD = 'Лист'
+
+
+def intern_text(value: Any) -> Any:
+    """
+    Возвращает единственный экземпляр строки с таким значением (sys.intern); нестроковые значения - без изменений.
+
+    :param value: Значение поля.
+    :return: Интернированная строка или исходное значение.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+def is_nan(value: Any) -> bool:
+    """
+    :param value: Значение поля.
+    :return: True, если значение - NaN (пустая ячейка Excel).
+    """
+    return isinstance(value, float) and math.isnan(value)
+
+
+class VmRecord:
+    """
+    Запись ВМ паспорта или сайзинга. Хранит значения в слотах вместо словаря с ключами-строками;
+    раздел, 'Наименование', 'Роль' и лист интернируются, поэтому повторяющиеся значения
+    хранятся в памяти один раз. Словари и JSON формируются только при записи промежуточных файлов.
+
+    Значения 'IP адрес' и 'Сайзинг' хранятся как прочитаны: строки или NaN из Excel.
+    """
+    __slots__ = ('section', 'naimenovanie', 'role', 'server_name', 'ip', 'sizing', 'sheet')
+
+    def __init__(self, server_name: Any = '', ip: Any = '', sizing: Any = '', section: str = '',
+                 naimenovanie: str = '', role: str = '', sheet: Optional[str] = None) -> None:
+        """
+        :param server_name: Имя сервера как в источнике.
+        :param ip: IP адрес.
+        :param sizing: Сайзинг.
+        :param section: Раздел паспорта.
+        :param naimenovanie: 'Наименование' группы ВМ в паспорте.
+        :param role: 'Роль' группы ВМ в паспорте.
+        :param sheet: Лист книги сайзинга или None.
+        """
+        self.server_name = server_name
+        self.ip = ip
+        self.sizing = sizing
+        self.section = intern_text(section)
+        self.naimenovanie = intern_text(naimenovanie)
+        self.role = intern_text(role)
+        self.sheet = intern_text(sheet)
+
+    @property
+    def key(self) -> str:
+        """
+        :return: Нормализованное имя сервера (strip + lower) - ключ сопоставления источников.
+        """
+        name = self.server_name
+        return (name if type(name) is str else str(name)).strip().lower()
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> 'VmRecord':
+        """
+        Создает запись из словаря промежуточного формата (паспорта или сайзинга).
+
+        :param record: Запись с полями PASSPORT_RECORD_FIELDS или SIZING_RECORD_FIELDS.
+        :return: Запись ВМ.
+        """
+        return cls(
+            server_name=record.get('Имя сервера', ''),
+            ip=record.get('IP адрес', ''),
+            sizing=record.get('Сайзинг', ''),
+            section=record.get('Раздел', ''),
+            naimenovanie=record.get('Наименование', ''),
+            role=record.get('Роль', ''),
+            sheet=record.get(SHEET_RECORD_FIELD)
+        )
+
+    def passport_values(self) -> Tuple[Any, ...]:
+        """
+        :return: Значения полей PASSPORT_RECORD_FIELDS.
+        """
+        return self.section, self.naimenovanie, self.role, self.server_name, self.ip, self.sizing
+
+    def to_passport_dict(self) -> Dict[str, Any]:
+        """
+        :return: Запись паспорта в промежуточном формате.
+        """
+        return dict(zip(PASSPORT_RECORD_FIELDS, self.passport_values()))
+
+    def to_sizing_dict(self) -> Dict[str, Any]:
+        """
+        :return: Запись сайзинга в промежуточном формате (поле 'Лист' - только в режиме всех листов).
+        """
+        record = dict(zip(SIZING_RECORD_FIELDS, (self.server_name, self.sizing, self.ip)))
+        if self.sheet is not None:
+            record[SHEET_RECORD_FIELD] = self.sheet
+        return record
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        # После загрузки из кэша или другого процесса повторяющиеся строки снова разделяются
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+        self.section = intern_text(self.section)
+        self.naimenovanie = intern_text(self.naimenovanie)
+        self.role = intern_text(self.role)
+        self.sheet = intern_text(self.sheet)
+
+    def __eq__(self, other: Any) -> bool:
+        # Сравнение по значениям, как у словарей, которые заменяет запись (например, в watch.py).
+        # NaN не равен сам себе, поэтому пустые ячейки Excel при каждом чтении давали бы новую запись
+        if not isinstance(other, VmRecord):
+            return NotImplemented
+        return all(value == other_value or (is_nan(value) and is_nan(other_value))
+                   for value, other_value in zip(self.__getstate__(), other.__getstate__()))
+
+    # Записи изменяемы и не используются как ключи
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"VmRecord({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+def section_marker(section: str) -> VmRecord:
+    """
+    Создает маркер начала раздела паспорта: запись без имени сервера. Маркеры сохраняют в результате разбора
+    разделы без ВМ и границы разделов с одинаковыми заголовками, чтобы JSON-файл содержал все разделы страницы.
+
+    :param section: Заголовок раздела.
+    :return: Маркер раздела.
+    """
+    return VmRecord(section=section)
+
+
+def is_section_marker(record: VmRecord) -> bool:
+    """
+    :param record: Запись результата разбора паспорта.
+    :return: True, если запись - маркер раздела (записи ВМ паспорта всегда содержат имя сервера).
+    """
+    return record.server_name == ''
+
+
+def vm_records(records: Iterable[VmRecord]) -> List[VmRecord]:
+    """
+    :param records: Записи результата разбора паспорта вместе с маркерами разделов.
+    :return: Только записи ВМ.
+    """
+    return [record for record in records if not is_section_marker(record)]
+
+
+def records_from_sections(sections: Iterable[Dict[str, Any]]) -> Iterator[VmRecord]:
+    """
+    Разворачивает разделы паспорта в формате JSON (ключи 'Раздел', 'Данные', 'ВМ') в записи ВМ.
+
+    :param sections: Разделы с ключами 'Раздел' и 'Данные'.
+    :return: Генератор записей ВМ в порядке документа.
+    """
+    for section in sections:
+        section_name = section.get('Раздел', '')
+        for item in section.get('Данные', []):
+            naimenovanie = item.get('Наименование', '')
+            role = item.get('Роль', '')
+            for vm in item.get('ВМ', []):
+                yield VmRecord(vm.get('Имя сервера', ''), vm.get('IP адрес', ''), vm.get('Сайзинг', ''),
+                               section_name, naimenovanie, role)
+
+
+def sections_from_records(records: Iterable[VmRecord]) -> Iterator[Dict[str, Any]]:
+    """
+    Собирает записи ВМ в разделы паспорта формата JSON.
+
+    Раздел начинается маркером раздела (section_marker) или записью с другим разделом; раздел без ВМ
+    выводится с пустыми 'Данные'. Внутри раздела ВМ группируются по 'Наименование' и 'Роль' в порядке
+    появления групп. В памяти одновременно находится только текущий раздел.
+
+    :param records: Записи ВМ паспорта, в том числе с маркерами разделов.
+    :return: Генератор разделов с ключами 'Раздел' и 'Данные'.
+    """
+    section_name: Optional[str] = None
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    for record in records:
+        marker = is_section_marker(record)
+        if marker or record.section != section_name:
+            if section_name is not None:
+                yield {'Раздел': section_name, 'Данные': list(groups.values())}
+            section_name = record.section
+            groups = {}
+        if marker:
+            continue
+
+        key = (record.naimenovanie, record.role)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {'Наименование': key[0], 'Роль': key[1], 'ВМ': []}
+        group['ВМ'].append({'Имя сервера': record.server_name, 'IP адрес': record.ip, 'Сайзинг': record.sizing})
+
+    if section_name is not None:
+        yield {'Раздел': section_name, 'Данные': list(groups.values())}
+
+
+def count_sections(records: List[VmRecord]) -> int:
+    """
+    Подсчитывает разделы паспорта по маркерам разделов.
+
+    :param records: Записи результата разбора паспорта вместе с маркерами разделов.
+    :return: Количество разделов.
+    """
+    return sum(1 for record in records if is_section_marker(record))
@@ -0,0 +1,253 @@
+# watch.py
+
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from html_to_json import PARSER_ENGINES, iter_html_markup, parse_sections_cached
+from excel_to_json import EXCEL_ENGINES, excel_to_json
+from canonical import sizing_tolerance_vector
+from compare_json import COMPARE_ENGINES, build_dict1, build_dict2, compare_data, compare_server, write_report
+from main import setup_logging
+from vm_record import VmRecord, vm_records
+
+# Интервал опроса входных файлов, с
+DEFAULT_POLL_INTERVAL = 0.3
+
+# Сколько файл должен оставаться неизменным после последней записи перед пересчетом, с
+DEFAULT_DEBOUNCE = 0.5
+
+# Пауза перед повторным чтением файла, который не удалось прочитать, с
+DEFAULT_RETRY_INTERVAL = 2.0
+
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Возвращает признак версии файла: время изменения и размер.
+
+    :param file_path: Путь к файлу.
+    :return: (mtime в наносекундах, размер) или None, если файла нет.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WatchSession:
+    """
+    Сеанс наблюдения: держит в памяти разобранные разделы паспорта, данные сайзинга
+    и строки отчета по серверам. При изменении входных файлов заново разбираются только
+    измененные разделы паспорта и заново сравниваются только серверы, записи которых изменились;
+    файл отчета XLSX перезаписывается целиком из строк в памяти.
+    """
+
+    def __init__(self, html_file: str, excel_file: str, output_excel_file: str, html_engine: str = 'bs4',
+                 excel_engine: str = 'pandas', compare_engine: str = 'python',
+                 sizing_cache_dir: Optional[str] = None) -> None:
+        """
+        :param html_file: Путь к HTML-файлу паспорта.
+        :param excel_file: Путь к Excel-файлу с сайзингом.
+        :param output_excel_file: Путь к выходному Excel-файлу с результатами сравнения.
+        :param html_engine: Движок парсинга HTML: 'bs4' или 'lxml'.
+        :param excel_engine: Движок чтения Excel: 'pandas' или 'openpyxl'.
+        :param compare_engine: Движок сравнения: 'python' или 'pandas'.
+        :param sizing_cache_dir: Каталог кэша разобранных файлов сайзинга или None.
+        """
+        self.html_file = html_file
+        self.excel_file = excel_file
+        self.output_excel_file = output_excel_file
+        self.html_engine = html_engine
+        self.excel_engine = excel_engine
+        self.compare_engine = compare_engine
+        self.sizing_cache_dir = sizing_cache_dir
+
+        # Записи ВМ разобранных разделов паспорта по отпечатку разметки
+        self.sections: Dict[str, List[VmRecord]] = {}
+        self.passport_data: Optional[List[VmRecord]] = None
+        self.sizing_data: Optional[List[VmRecord]] = None
+        # Строки отчета по серверам вместе с записями паспорта и сайзинга, по которым они построены
+        self.rows: Dict[str, Tuple[Optional[VmRecord], Optional[VmRecord], Dict[str, Any]]] = {}
+        self.tolerance = sizing_tolerance_vector()
+        # Данные в памяти изменились, а отчет по ним еще не записан
+        self.report_stale = False
+        # Версии файлов, по которым построены данные в памяти
+        self.signatures: Dict[str, Optional[Tuple[int, int]]] = {html_file: None, excel_file: None}
+
+    def refresh_passport(self) -> bool:
+        """
+        Перечитывает паспорт, разбирая только новые и измененные разделы.
+
+        :return: True, если данные паспорта изменились.
+        """
+        passport_data, self.sections = parse_sections_cached(iter_html_markup(self.html_file), self.html_engine,
+                                                             self.sections)
+        passport_data = vm_records(passport_data)
+        changed = passport_data != self.passport_data
+        self.passport_data = passport_data
+        return changed
+
+    def refresh_sizing(self) -> bool:
+        """
+        Перечитывает сайзинг.
+
+        :return: True, если данные сайзинга изменились.
+        """
+        sizing_data = excel_to_json(self.excel_file, engine=self.excel_engine, cache_dir=self.sizing_cache_dir)
+        changed = sizing_data != self.sizing_data
+        self.sizing_data = sizing_data
+        return changed
+
+    def update(self, changed_files: List[str]) -> List[str]:
+        """
+        Обновляет данные измененных файлов и, если данные изменились, перезаписывает отчет.
+
+        Ошибка чтения одного файла не мешает обновить данные другого: в памяти остаются
+        последние успешно прочитанные данные файла.
+
+        :param changed_files: Измененные входные файлы.
+        :return: Файлы, которые не удалось прочитать.
+        :raises Exception: Если не удалось записать отчет (данные остаются помеченными для записи).
+        """
+        start = time.perf_counter()
+        failed: List[str] = []
+        for path, refresh in ((self.html_file, self.refresh_passport), (self.excel_file, self.refresh_sizing)):
+            if path not in changed_files:
+                continue
+            try:
+                self.report_stale |= refresh()
+            except Exception as e:
+                logging.error(f"Не удалось прочитать файл {path}: {e}")
+                failed.append(path)
+
+        if self.passport_data is None or self.sizing_data is None:
+            logging.info("Ожидание второго входного файла")
+            return failed
+        if not self.report_stale:
+            logging.info("Данные не изменились, отчет не перезаписывается")
+            return failed
+
+        self.write_report()
+        self.report_stale = False
+        logging.info(f"Отчет {self.output_excel_file} обновлен за {time.perf_counter() - start:.2f} с")
+        return failed
+
+    def write_report(self) -> None:
+        """
+        Записывает отчет по данным в памяти. Движок 'python' сравнивает заново только серверы,
+        записи которых изменились с прошлого отчета, остальные строки берутся из памяти;
+        движок 'pandas' сравнивает все серверы.
+        """
+        if self.compare_engine != 'python':
+            compare_data(self.passport_data, self.sizing_data, self.output_excel_file, engine=self.compare_engine)
+            return
+
+        dict1 = build_dict1(self.passport_data)
+        dict2 = build_dict2(self.sizing_data)
+        rows: Dict[str, Tuple[Optional[VmRecord], Optional[VmRecord], Dict[str, Any]]] = {}
+        compared = 0
+        for server in sorted(dict1.keys() | dict2.keys()):
+            item1, item2 = dict1.get(server), dict2.get(server)
+            cached = self.rows.get(server)
+            if cached is None or cached[0] != item1 or cached[1] != item2:
+                cached = (item1, item2, compare_server(server, item1, item2, self.tolerance))
+                compared += 1
+            rows[server] = cached
+        self.rows = rows
+        logging.info(f"Заново сравнено серверов: {compared} из {len(rows)}")
+
+        write_report((row for item1, item2, row in rows.values() if item1 and item2),
+                     (row for item1, item2, row in rows.values() if not item1),
+                     (row for item1, item2, row in rows.values() if not item2),
+                     self.output_excel_file)
+
+    def poll(self) -> List[str]:
+        """
+        Возвращает входные файлы, версия которых отличается от обработанной.
+
+        :return: Измененные файлы.
+        """
+        return [path for path, signature in self.signatures.items()
+                if file_signature(path) not in (None, signature)]
+
+    def watch(self, poll_interval: float = DEFAULT_POLL_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+              retry_interval: float = DEFAULT_RETRY_INTERVAL) -> None:
+        """
+        Следит за входными файлами до прерывания (Ctrl+C).
+
+        Серия быстрых сохранений обрабатывается один раз: пересчет начинается, когда
+        файлы не менялись в течение debounce секунд. Ошибка чтения (например, файл
+        сохранен не полностью) или записи отчета не прерывает наблюдение: версия такого файла
+        не считается обработанной, и пересчет повторяется через retry_interval секунд,
+        даже если файл больше не изменится.
+
+        :param poll_interval: Интервал опроса файлов, с.
+        :param debounce: Пауза после последнего изменения перед пересчетом, с.
+        :param retry_interval: Пауза перед повторной попыткой после ошибки, с.
+        """
+        logging.info(f"Наблюдение за файлами {self.html_file} и {self.excel_file} (Ctrl+C - выход)")
+        pending: Dict[str, Optional[Tuple[int, int]]] = {}
+        next_update = 0.0
+
+        while True:
+            for path in self.poll():
+                signature = file_signature(path)
+                if pending.get(path) != signature:
+                    pending[path] = signature
+                    next_update = time.monotonic() + debounce
+
+            if pending and time.monotonic() >= next_update:
+                try:
+                    failed = self.update(list(pending))
+                except Exception as e:
+                    logging.error(f"Не удалось обновить отчет: {e}")
+                    failed = list(pending)
+                # Фиксируются только версии успешно обработанных файлов, остальные обрабатываются повторно
+                self.signatures.update((path, signature) for path, signature in pending.items() if path not in failed)
+                pending = {path: pending[path] for path in failed}
+                if pending:
+                    logging.info(f"Повторная попытка через {retry_interval} с")
+                    next_update = time.monotonic() + retry_interval
+
+            time.sleep(poll_interval)
+
+
+def main() -> None:
+    """
+    Точка входа режима наблюдения.
+    """
+    parser = argparse.ArgumentParser(description="Пересчет отчета сверки при изменении паспорта или сайзинга")
+    parser.add_argument('--html', default='page.html', help="HTML-файл паспорта")
+    parser.add_argument('--excel', default='data.xlsx', help="Excel-файл сайзинга")
+    parser.add_argument('--output', default='comparison_result.xlsx', help="Выходной Excel-файл")
+    parser.add_argument('--engine', choices=PARSER_ENGINES, default='bs4', help="Движок парсинга HTML")
+    parser.add_argument('--excel-engine', choices=EXCEL_ENGINES, default='pandas', help="Движок чтения Excel")
+    parser.add_argument('--compare-engine', choices=COMPARE_ENGINES, default='python', help="Движок сравнения")
+    parser.add_argument('--cache-dir', default=None, help="Каталог кэша разобранных файлов сайзинга")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL, help="Интервал опроса файлов, с")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help="Пауза после последнего изменения перед пересчетом, с")
+    parser.add_argument('--retry-interval', type=float, default=DEFAULT_RETRY_INTERVAL,
+                        help="Пауза перед повторной попыткой после ошибки чтения, с")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    session = WatchSession(args.html, args.excel, args.output, html_engine=args.engine,
+                           excel_engine=args.excel_engine, compare_engine=args.compare_engine,
+                           sizing_cache_dir=args.cache_dir)
+    try:
+        session.watch(args.interval, args.debounce, args.retry_interval)
+    except KeyboardInterrupt:
+        logging.info("Наблюдение остановлено")
+    except Exception as e:
+        logging.error(f"Произошла ошибка в режиме наблюдения: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()